@@ -58,7 +58,11 @@ class UserPublicSerializer(serializers.ModelSerializer):
         ]
 
     def get_profile_picture(self, obj):
-        user_profile = UserProfile.objects.get(user=obj)
-        if user_profile and user_profile.profile_picture:
-            return MediaSerializer(user_profile.profile_picture).data
+        # Usa el perfil precargado con select_related("user__userprofile__profile_picture"), si existe
+        try:
+            user_profile = obj.userprofile
+        except UserProfile.DoesNotExist:
+            return None
+        if user_profile.profile_picture:
+            return MediaSerializer(user_profile.profile_picture, context=self.context).data
         return None
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+Deteccion de abuso en las interacciones con los posts (vistas, likes,
+comentarios, shares, beacons y lotes de eventos) con contadores de ventana deslizante en Redis.
+
+Cada accion tiene limites por usuario, por IP y por API key: (maximo, ventana en
+segundos). Cada contador guarda dos ventanas fijas, la actual y la anterior, y
+estima las peticiones de la ultima ventana como
+`actual + anterior * (parte de la ventana anterior que sigue dentro)`, asi un
+cliente no puede duplicar el limite concentrando peticiones en el cambio de
+ventana. Todos los contadores de una peticion se actualizan con un solo script
+Lua, en un viaje a Redis y antes de tocar la base de datos.
+
+Con BLOG_ABUSE_MODE = "shadow" los excesos solo se registran en el log, para
+ajustar los limites con trafico real antes de activar "enforce", que responde
+429 (o, en las vistas, descarta la vista sin dejar de servir el post). Si Redis
+no responde las peticiones pasan.
+"""
+import hashlib
+import logging
+import time
+
+import redis
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+
+from utils.ip_utils import get_client_ip
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+PREFIX = "abuse"
+
+OFF = "off"
+SHADOW = "shadow"
+ENFORCE = "enforce"
+
+MODE = getattr(settings, "BLOG_ABUSE_MODE", SHADOW)
+
+# {accion: {"user" | "ip" | "api_key": (maximo de peticiones, ventana en segundos)}}
+# La API key la comparte todo el frontend: su limite solo corta inundaciones
+DEFAULT_LIMITS = {
+    "view": {"user": (120, 60), "ip": (300, 60), "api_key": (60000, 60)},
+    "like": {"user": (30, 60), "ip": (60, 60), "api_key": (6000, 60)},
+    "comment": {"user": (10, 60), "ip": (30, 60), "api_key": (3000, 60)},
+    "share": {"user": (20, 60), "ip": (60, 60), "api_key": (6000, 60)},
+    "beacon": {"ip": (120, 60), "api_key": (120000, 60)},
+    # Lotes de eventos del cliente (cada peticion trae hasta cientos de eventos)
+    "events": {"user": (30, 60), "ip": (60, 60), "api_key": (60000, 60)},
+}
+LIMITS = {**DEFAULT_LIMITS, **getattr(settings, "BLOG_ABUSE_LIMITS", {})}
+
+# KEYS = prefijo de cada contador, ARGV[1] = ahora, ARGV[i + 1] = ventana del contador i.
+# Devuelve la estimacion de peticiones en la ultima ventana de cada contador
+_hit_script = redis_client.register_script("""
+local now = tonumber(ARGV[1])
+local estimates = {}
+for i, prefix in ipairs(KEYS) do
+    local window = tonumber(ARGV[i + 1])
+    local index = math.floor(now / window)
+    local key = prefix .. ':' .. index
+    local current = redis.call('INCR', key)
+    if current == 1 then
+        redis.call('EXPIRE', key, window * 2)
+    end
+    local previous = tonumber(redis.call('GET', prefix .. ':' .. (index - 1)) or '0')
+    local elapsed = (now - index * window) / window
+    estimates[i] = tostring(current + previous * (1 - elapsed))
+end
+return estimates
+""")
+
+
+def _subjects(request):
+    """
+    Identidades de quien hace la peticion: {"user" | "ip" | "api_key": id}.
+    """
+    subjects = {}
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        subjects["user"] = str(user.pk)
+    ip_address = get_client_ip(request)
+    if ip_address:
+        subjects["ip"] = ip_address
+    api_key = request.headers.get("API-Key")
+    if api_key:
+        # La API key no se guarda en claro en Redis
+        subjects["api_key"] = hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
+    return subjects
+
+
+def check(request, action, mode=None):
+    """
+    Cuenta la peticion en los contadores de la accion. Devuelve los segundos que
+    hay que esperar si supera algun limite en modo "enforce", o None si pasa.
+    """
+    mode = mode or MODE
+    limits = LIMITS.get(action)
+    if mode == OFF or not limits:
+        return None
+
+    counters = [
+        (kind, subject, *limits[kind])
+        for kind, subject in _subjects(request).items()
+        if kind in limits
+    ]
+    if not counters:
+        return None
+
+    try:
+        estimates = _hit_script(
+            keys=[f"{PREFIX}:{action}:{kind}:{subject}" for kind, subject, _, _ in counters],
+            args=[time.time(), *[window for _, _, _, window in counters]],
+        )
+    except redis.RedisError as e:
+        logger.warning(f"Could not check abuse counters for {action}: {str(e)}")
+        return None
+
+    exceeded = [
+        (kind, subject, limit, window)
+        for (kind, subject, limit, window), estimate in zip(counters, estimates)
+        if float(estimate) > limit
+    ]
+    if not exceeded:
+        return None
+
+    details = ", ".join(f"{kind} {subject} over {limit}/{window}s" for kind, subject, limit, window in exceeded)
+    logger.warning(f"Abusive {action} traffic ({mode}): {details}")
+    if mode != ENFORCE:
+        return None
+    return max(window for _, _, _, window in exceeded)
+
+
+def enforce(request, action):
+    """
+    Rechaza la peticion con 429 si supera algun limite de la accion.
+    """
+    wait = check(request, action)
+    if wait is not None:
+        raise Throttled(wait=wait)
@@ -28,7 +28,7 @@ class CategoryAdmin(admin.ModelAdmin):
 class CategoryAnalyticsAdmin(admin.ModelAdmin):
     list_display = ('category_name', 'views', 'impressions', 'clicks', 'click_through_rate', 'avg_time_on_page')
     search_fields = ('category__name',)
-    readonly_fields = ('category','views','impressions','clicks','click_through_rate','avg_time_on_page')
+    readonly_fields = ('category','views','impressions','clicks','click_through_rate','avg_time_on_page', 'time_on_page_samples')
 
     def category_name(self, obj):
         return obj.category.name
@@ -67,7 +67,7 @@ class PostAdmin(admin.ModelAdmin):
 class PostAnalyticsAdmin(admin.ModelAdmin):
     list_display = ('post_title', 'views', 'impressions', 'clicks', 'click_through_rate', 'avg_time_on_page', 'likes', 'comments', 'shares')
     search_fields = ('post__title', 'post__slug')
-    readonly_fields = ('post','views','impressions','clicks','click_through_rate','avg_time_on_page', 'likes', 'comments', 'shares')
+    readonly_fields = ('post','views','impressions','clicks','click_through_rate','avg_time_on_page', 'time_on_page_samples', 'avg_scroll_depth', 'likes', 'comments', 'shares')
 
     def post_title(self, obj):
         return obj.post.title
@@ -0,0 +1,174 @@
+"""
+Invalidacion del cache del blog por etiquetas versionadas.
+
+Cada entrada de cache declara las etiquetas de las que depende: colecciones
+("posts", "categories") u objetos ("post:<id>", "category:<id>", "author:<id>",
+"thread:<post_id>" para los comentarios de un post). Cada etiqueta tiene una
+generacion en Redis, `cache_tag:<etiqueta>`, y la entrada guarda las generaciones
+que leyo antes de consultar la base de datos. Al leer la entrada se comparan con
+las actuales en un solo MGET y, si alguna cambio, la entrada se descarta.
+
+Invalidar es un INCR por etiqueta, O(1) sin importar cuantas claves dependan de
+ella: sin SCAN ni indices de claves. Los signals de los modelos invalidan las
+etiquetas cuando se confirma la transaccion que modifico los datos.
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+POSTS = "posts"
+CATEGORIES = "categories"
+
+# Las generaciones deben durar mas que cualquier entrada que dependa de ellas:
+# si una generacion expirara antes, una entrada vieja volveria a parecer vigente
+TAG_TIMEOUT = 60 * 60 * 24
+
+
+def post(post_id):
+    return f"post:{post_id}"
+
+
+def category(category_id):
+    return f"category:{category_id}"
+
+
+def author(user_id):
+    return f"author:{user_id}"
+
+
+def thread(post_id):
+    return f"thread:{post_id}"
+
+
+def _tag_key(tag):
+    return f"cache_tag:{tag}"
+
+
+def _read_generations(tags):
+    """
+    Generaciones actuales de las etiquetas, o None si Redis no responde.
+    """
+    try:
+        values = redis_client.mget([_tag_key(tag) for tag in tags])
+    except redis.RedisError as e:
+        logger.warning(f"Could not read cache tag generations: {str(e)}")
+        return None
+    return [int(value) if value is not None else 0 for value in values]
+
+
+class Dependencies:
+    """
+    Etiquetas de las que depende una entrada, con la generacion leida de cada una.
+
+    Las etiquetas conocidas de antemano se pasan al crearla, antes de consultar la
+    base de datos. Las que se descubren al armar la respuesta (p. ej. los autores
+    de la pagina) se agregan con `add`; una escritura concurrente entre la consulta
+    y esa lectura solo puede dejar la entrada desactualizada hasta su timeout.
+    """
+
+    def __init__(self, *tags):
+        self.generations = {}
+        self.valid = True
+        self.add(*tags)
+
+    def add(self, *tags):
+        tags = [tag for tag in dict.fromkeys(tags) if tag not in self.generations]
+        if not tags or not self.valid:
+            return self
+
+        generations = _read_generations(tags)
+        if generations is None:
+            # Sin generaciones no se puede validar la entrada despues: no se cachea
+            self.valid = False
+        else:
+            self.generations.update(zip(tags, generations))
+        return self
+
+    def snapshot(self):
+        """
+        Pares [etiqueta, generacion] que se guardan con la entrada, o None si
+        la entrada no debe cachearse.
+        """
+        if not self.valid:
+            return None
+        return [[tag, generation] for tag, generation in sorted(self.generations.items())]
+
+
+def is_current(snapshot):
+    """
+    Indica si ninguna de las etiquetas de la entrada se invalido desde que se guardo.
+    """
+    if not snapshot:
+        return True
+    tags = [tag for tag, _ in snapshot]
+    generations = _read_generations(tags)
+    if generations is None:
+        return False
+    return generations == [generation for _, generation in snapshot]
+
+
+def invalidate(*tags):
+    """
+    Incrementa la generacion de las etiquetas cuando se confirma la transaccion
+    actual (de inmediato si no hay una), asi ninguna peticion vuelve a cachear
+    datos anteriores a la escritura con la generacion nueva.
+    """
+    tags = list(dict.fromkeys(tags))
+    if tags:
+        transaction.on_commit(lambda: _bump(tags))
+
+
+def _bump(tags):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for tag in tags:
+            pipe.incr(_tag_key(tag))
+            pipe.expire(_tag_key(tag), TAG_TIMEOUT)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Could not invalidate cache tags {tags}: {str(e)}")
+
+
+def fetch(key):
+    """
+    Lee una entrada del cache de Django guardada con `store`. Devuelve None si no
+    existe o si alguna de sus etiquetas se invalido.
+    """
+    value = _fetch(key)
+    # La familia es el prefijo de la clave: "post_detail", "post_comments", ...
+    metrics.record_cache_lookup(key.split(":", 1)[0], value is not None)
+    return value
+
+
+def _fetch(key):
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    try:
+        snapshot, value = entry
+    except (TypeError, ValueError):
+        return None
+
+    if not is_current(snapshot):
+        return None
+    return value
+
+
+def store(key, value, dependencies, timeout):
+    """
+    Guarda una entrada en el cache de Django junto con las generaciones de sus etiquetas.
+    """
+    snapshot = dependencies.snapshot()
+    if snapshot is None:
+        return
+    cache.set(key, (snapshot, value), timeout=timeout)
@@ -0,0 +1,133 @@
+"""
+Arbol de categorias con ruta materializada.
+
+Cada categoria guarda en `path` la ruta desde la categoria raiz, un segmento de
+ancho fijo por nivel (parte de su id). Los descendientes de una categoria son un
+rango de `path` (prefijo) y sus ancestros son los prefijos de su propia ruta, asi
+ambas consultas, y filtrar los posts de todo un subarbol, se hacen en una sola
+consulta sin recorrer el arbol en Python.
+
+Cada categoria tambien guarda sus conteos acumulados a lo largo de la ruta: los
+posts publicados directamente en ella (`post_count`) y en todo su subarbol
+(`subtree_post_count`), y en CategoryAnalytics las vistas y clicks del subarbol.
+"""
+from collections import defaultdict
+
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Concat, Greatest, Substr
+
+SEGMENT_LENGTH = 12
+
+# 21 niveles caben en el max_length=255 de Category.path
+MAX_DEPTH = 20
+
+
+def make_segment(category):
+    return category.id.hex[:SEGMENT_LENGTH]
+
+
+def ancestor_paths(path, include_self=False):
+    """
+    Rutas de los ancestros de una categoria, de la raiz hacia abajo.
+    """
+    end = len(path) if include_self else len(path) - SEGMENT_LENGTH
+    return [path[:length] for length in range(SEGMENT_LENGTH, end + 1, SEGMENT_LENGTH)]
+
+
+def assign_path(category):
+    """
+    Calcula `path` y `depth` de una categoria a partir de su padre.
+    """
+    if category.parent_id is None:
+        category.depth = 0
+        category.path = make_segment(category)
+        return
+
+    parent = category.parent
+    if category.path and parent.path.startswith(category.path):
+        raise ValueError("A category can't be moved under itself or one of its subcategories")
+    if parent.depth >= MAX_DEPTH:
+        raise ValueError(f"Categories can't be nested more than {MAX_DEPTH} levels deep")
+    category.depth = parent.depth + 1
+    category.path = parent.path + make_segment(category)
+
+
+def move_subtree(category_model, old_path, new_path, depth_delta, subtree_post_count):
+    """
+    Mueve las subcategorias de una categoria que cambio de padre y traslada su
+    conteo de posts de los ancestros anteriores a los nuevos.
+    """
+    category_model.objects.filter(path__startswith=old_path).exclude(path=old_path).update(
+        path=Concat(Value(new_path), Substr("path", len(old_path) + 1)),
+        depth=F("depth") + depth_delta,
+    )
+    if subtree_post_count:
+        category_model.objects.filter(path__in=ancestor_paths(old_path)).update(
+            subtree_post_count=Greatest(F("subtree_post_count") - subtree_post_count, Value(0), output_field=IntegerField())
+        )
+        category_model.objects.filter(path__in=ancestor_paths(new_path)).update(
+            subtree_post_count=F("subtree_post_count") + subtree_post_count
+        )
+
+
+def apply_post_count_delta(category_model, category_id, delta):
+    """
+    Suma `delta` posts publicados a una categoria y a todos sus ancestros con un solo UPDATE.
+    """
+    path = category_model.objects.filter(pk=category_id).values_list("path", flat=True).first()
+    if not path:
+        return
+    category_model.objects.filter(path__in=ancestor_paths(path, include_self=True)).update(
+        post_count=Case(
+            When(pk=category_id, then=Greatest(F("post_count") + delta, Value(0), output_field=IntegerField())),
+            default=F("post_count"),
+            output_field=IntegerField(),
+        ),
+        subtree_post_count=Greatest(F("subtree_post_count") + delta, Value(0), output_field=IntegerField()),
+    )
+
+
+def subtree_filter(paths, field="category__path"):
+    """
+    Condicion que selecciona los objetos de los subarboles de las rutas indicadas.
+    """
+    condition = Q(pk__in=[])
+    for path in paths:
+        condition |= Q(**{f"{field}__startswith": path})
+    return condition
+
+
+def subtree_totals(paths, values):
+    """
+    Acumula los valores de cada categoria en ella y en todos sus ancestros.
+
+    `paths` es {id: path} y `values` {id: valor}; devuelve {id: total del subarbol}.
+    """
+    totals_by_path = defaultdict(int)
+    for category_id, value in values.items():
+        path = paths.get(category_id)
+        if not path or not value:
+            continue
+        for ancestor_path in ancestor_paths(path, include_self=True):
+            totals_by_path[ancestor_path] += value
+    return {category_id: totals_by_path.get(path, 0) for category_id, path in paths.items()}
+
+
+def rebuild_paths(category_model):
+    """
+    Recalcula path y depth de todas las categorias, de padres a hijos.
+    Util para categorias creadas antes de que existiera la ruta materializada.
+    """
+    pending = list(category_model.objects.filter(parent__isnull=True))
+    updated = 0
+    while pending:
+        for category in pending:
+            category.path = ""
+            assign_path(category)
+        category_model.objects.bulk_update(pending, ["path", "depth"], batch_size=500)
+        updated += len(pending)
+        parents = {category.id: category for category in pending}
+        pending = list(category_model.objects.filter(parent_id__in=list(parents)))
+        for category in pending:
+            category.parent = parents[category.parent_id]
+    return updated
@@ -0,0 +1,128 @@
+"""
+Lotes de eventos del cliente (impresiones, clicks, vistas y shares).
+
+Un SDK en el frontend junta los eventos de la pagina y los envia en una sola
+peticion en lugar de una por evento. Los slugs se resuelven con los mapas de
+post_slugs (Redis) y todos los eventos del lote se encolan en un solo pipeline:
+las impresiones y los clicks van a los contadores diferidos (impressions y
+counters) y las vistas y shares al stream de eventos, que consume la tarea
+consume_post_events. La peticion no escribe en la base de datos.
+
+Dentro de un lote cada evento se cuenta una vez por objeto: repetir un click o
+una vista en el mismo lote no suma mas.
+"""
+import logging
+
+import redis
+from django.conf import settings
+
+from utils.ip_utils import get_client_ip
+from . import counters, events, impressions, post_slugs
+from .models import PostShare
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+IMPRESSION = "impression"
+CLICK = "click"
+VIEW = events.VIEW
+SHARE = events.SHARE
+
+# Objetos a los que puede apuntar cada tipo de evento
+TARGETS = {
+    IMPRESSION: (counters.POST, counters.CATEGORY),
+    CLICK: (counters.POST, counters.CATEGORY),
+    VIEW: (counters.POST,),
+    SHARE: (counters.POST,),
+}
+
+SHARE_PLATFORMS = [choice[0] for choice in PostShare._meta.get_field("platform").choices]
+
+MAX_EVENTS = getattr(settings, "BLOG_CLIENT_EVENTS_MAX_BATCH", 500)
+MAX_SLUG_LENGTH = 255
+
+
+def _parse_event(event):
+    if not isinstance(event, dict):
+        return None
+    event_type = event.get("type")
+    target = event.get("target") or counters.POST
+    slug = event.get("slug")
+    if event_type not in TARGETS or target not in TARGETS[event_type]:
+        return None
+    if not isinstance(slug, str) or not slug or len(slug) > MAX_SLUG_LENGTH:
+        return None
+    platform = ""
+    if event_type == SHARE:
+        platform = str(event.get("platform") or "other").lower()
+        if platform not in SHARE_PLATFORMS:
+            return None
+    return event_type, target, slug, platform
+
+
+def parse(batch):
+    """
+    Valida un lote: ([(tipo, objetivo, slug, plataforma)] sin repetidos,
+    numero de eventos descartados). Lanza ValueError si el lote no es una lista
+    o tiene demasiados eventos.
+    """
+    if not isinstance(batch, list):
+        raise ValueError("events must be a list")
+    if len(batch) > MAX_EVENTS:
+        raise ValueError(f"A batch can't have more than {MAX_EVENTS} events")
+
+    parsed = [_parse_event(event) for event in batch]
+    valid = list(dict.fromkeys(event for event in parsed if event is not None))
+    return valid, len(batch) - len(valid)
+
+
+def enqueue(request, batch):
+    """
+    Encola los eventos validos de un lote en una sola llamada a Redis. Devuelve
+    cuantos se aceptaron; los de posts no publicados o categorias que no existen
+    se descartan.
+    """
+    post_ids = post_slugs.resolve(
+        [slug for _, target, slug, _ in batch if target == counters.POST]
+    )
+    category_ids = post_slugs.resolve_categories(
+        [slug for _, target, slug, _ in batch if target == counters.CATEGORY]
+    )
+
+    impressions_by_kind = {counters.POST: [], counters.CATEGORY: []}
+    clicks_by_kind = {counters.POST: {}, counters.CATEGORY: {}}
+    stream_events = []
+    for event_type, target, slug, platform in batch:
+        if target == counters.POST:
+            object_id = post_ids[slug][0] if slug in post_ids else None
+        else:
+            object_id = category_ids.get(slug)
+        if object_id is None:
+            continue
+
+        if event_type == IMPRESSION:
+            impressions_by_kind[target].append(object_id)
+        elif event_type == CLICK:
+            clicks_by_kind[target][object_id] = 1
+        else:
+            stream_events.append((event_type, object_id, {"pl": platform} if platform else {}))
+
+    user = request.user if request.user.is_authenticated else None
+    ip_address = get_client_ip(request)
+    client = impressions.get_client_id(request)
+
+    pipe = redis_client.pipeline(transaction=False)
+    for kind, object_ids in impressions_by_kind.items():
+        impressions.record(kind, object_ids, client=client, pipe=pipe)
+    for kind, amounts in clicks_by_kind.items():
+        counters.increment_many(kind, "clicks", amounts, pipe=pipe)
+    for event_type, post_id, extra in stream_events:
+        events.publish(event_type, post_id, ip_address, user, pipe=pipe, **extra)
+    pipe.execute()
+
+    return (
+        sum(len(object_ids) for object_ids in impressions_by_kind.values())
+        + sum(len(amounts) for amounts in clicks_by_kind.values())
+        + len(stream_events)
+    )
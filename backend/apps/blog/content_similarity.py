@@ -0,0 +1,389 @@
+"""
+Indice de similitud de contenido entre posts (TF-IDF), para "mas como este".
+
+Cada post publicado se convierte en un vector de frecuencias de terminos de su
+titulo, keywords, descripcion y contenido (sin HTML), con los terminos mapeados
+a un espacio fijo de N_FEATURES columnas por hashing, asi el vocabulario no
+crece ni hay que reconstruir el indice al aparecer palabras nuevas. Los vectores
+se guardan en Redis (`content_similarity:docs`, arreglos NumPy compactos int32 /
+float32) y se actualizan uno a uno cuando se guarda o borra un post. La tarea
+rebuild_content_index (diaria, o el comando del mismo nombre) reconstruye el
+indice completo para corregir los cambios que no llegaron a Redis.
+
+Cada proceso mantiene en memoria la matriz dispersa de todos los documentos
+(CSC), el IDF y las normas. En cada consulta compara la version del indice en
+Redis y, si cambio, arma una copia nueva sin bloquear las consultas, que siguen
+con la copia anterior hasta el cambio. La copia nueva reutiliza la matriz
+principal: las filas de los documentos que cambiaron se marcan como borradas y
+sus versiones nuevas van a una matriz chica de cambios, y las frecuencias de
+documento se corrigen con un delta. Cuando los cambios crecen se recarga todo.
+La consulta es un producto disperso sobre las columnas de los terminos del
+post, que responde en milisegundos con decenas de miles de posts.
+"""
+import logging
+import re
+import threading
+import uuid
+import zlib
+from collections import Counter
+
+import msgpack
+import numpy as np
+import redis
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+DOCS_KEY = "content_similarity:docs"
+VERSION_KEY = "content_similarity:version"
+# Version en la que cambio cada post, para aplicar solo los cambios en cada proceso
+CHANGES_KEY = "content_similarity:changes"
+# Cambios hasta esta version ya no estan en el registro: hay que recargar todo
+FLOOR_KEY = "content_similarity:floor"
+MAX_CHANGES = 5000
+
+N_FEATURES = 2 ** 18
+
+# Peso de cada campo en el vector del post
+FIELD_WEIGHTS = (
+    ("title", 3.0),
+    ("keywords", 2.0),
+    ("description", 1.5),
+    ("content", 1.0),
+)
+INDEXED_FIELDS = {field for field, _ in FIELD_WEIGHTS}
+
+TAG_RE = re.compile(r"<[^>]*>")
+TOKEN_RE = re.compile(r"[^\W\d_]{3,}")
+
+TOP_K = 12
+
+# Filas en la matriz de cambios a partir de las cuales se recarga el indice completo
+COMPACT_MIN_ROWS = 1000
+COMPACT_RATIO = 0.1
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(TAG_RE.sub(" ", text or "").lower())
+
+
+def _feature(token):
+    return zlib.crc32(token.encode()) % N_FEATURES
+
+
+def vectorize(post):
+    """
+    Vector de frecuencias del post: (indices int32 ordenados, valores float32).
+    Las frecuencias son sublineales (1 + log tf) y ponderadas por campo.
+    """
+    weights = Counter()
+    for field, field_weight in FIELD_WEIGHTS:
+        for token, count in Counter(tokenize(getattr(post, field, ""))).items():
+            weights[_feature(token)] += field_weight * (1 + np.log(count))
+
+    if not weights:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+    indices = np.fromiter(weights.keys(), dtype=np.int32, count=len(weights))
+    values = np.fromiter(weights.values(), dtype=np.float32, count=len(weights))
+    order = np.argsort(indices)
+    return indices[order], values[order]
+
+
+def _pack(indices, values):
+    return msgpack.packb([indices.tobytes(), values.tobytes()])
+
+
+def _unpack(blob):
+    indices, values = msgpack.unpackb(blob)
+    return np.frombuffer(indices, dtype=np.int32), np.frombuffer(values, dtype=np.float32)
+
+
+_change_script = redis_client.register_script("""
+local version = redis.call('INCR', KEYS[2])
+if ARGV[2] == '' then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+else
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+end
+redis.call('ZADD', KEYS[3], version, ARGV[1])
+if redis.call('ZREMRANGEBYRANK', KEYS[3], 0, -tonumber(ARGV[3]) - 1) > 0 then
+    local oldest = redis.call('ZRANGE', KEYS[3], 0, 0, 'WITHSCORES')
+    redis.call('SET', KEYS[4], tonumber(oldest[2]) - 1)
+end
+return version
+""")
+
+# Reemplaza los documentos por los de una reconstruccion, armada en KEYS[1].
+# KEYS[2] = documentos, KEYS[3] = version, KEYS[4] = cambios, KEYS[5] = piso
+# ARGV[1] = version al empezar la reconstruccion.
+# Devuelve {version nueva, 1 si se perdieron cambios del registro durante la reconstruccion}
+_swap_script = redis_client.register_script("""
+local start = tonumber(ARGV[1])
+-- Los posts que cambiaron mientras se armaba la copia ya tienen su valor actual en KEYS[2]
+for _, post_id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[4], '(' .. start, '+inf')) do
+    local blob = redis.call('HGET', KEYS[2], post_id)
+    if blob then
+        redis.call('HSET', KEYS[1], post_id, blob)
+    else
+        redis.call('HDEL', KEYS[1], post_id)
+    end
+end
+local lost = tonumber(redis.call('GET', KEYS[5]) or '0') > start
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('PERSIST', KEYS[2])
+else
+    redis.call('DEL', KEYS[2])
+end
+redis.call('DEL', KEYS[4])
+-- Sin registro de cambios anterior, cada proceso recarga el indice completo
+local version = redis.call('INCR', KEYS[3])
+redis.call('SET', KEYS[5], version)
+return {version, lost and 1 or 0}
+""")
+
+# Vida de la copia a medio armar si la reconstruccion se interrumpe
+REBUILD_TIMEOUT = 60 * 60 * 6
+
+
+def _change(post_id, blob):
+    try:
+        _change_script(
+            keys=[DOCS_KEY, VERSION_KEY, CHANGES_KEY, FLOOR_KEY], args=[str(post_id), blob, MAX_CHANGES]
+        )
+    except redis.RedisError as e:
+        logger.error(f"Could not update content similarity index for post {post_id}: {str(e)}")
+
+
+def index_post(post):
+    """
+    Agrega o actualiza el vector del post en el indice, o lo quita si no esta publicado.
+    """
+    if post.status != "published":
+        _change(post.pk, "")
+        return
+    indices, values = vectorize(post)
+    _change(post.pk, _pack(indices, values) if len(indices) else "")
+
+
+def index_post_on_commit(post):
+    transaction.on_commit(lambda: index_post(post))
+
+
+def remove_post_on_commit(post_id):
+    transaction.on_commit(lambda: _change(post_id, ""))
+
+
+def rebuild(posts, batch_size=500):
+    """
+    Reconstruye el indice completo a partir de los posts publicados. La copia se
+    arma en una clave aparte y reemplaza a la actual de una vez, asi las consultas
+    nunca ven un indice vacio o a medias; los posts que cambian mientras tanto
+    conservan su ultimo valor. Devuelve el numero de posts indexados.
+    """
+    building_key = f"{DOCS_KEY}:rebuild:{uuid.uuid4().hex}"
+    start_version = int(redis_client.get(VERSION_KEY) or 0)
+
+    pipe = redis_client.pipeline(transaction=False)
+    indexed = 0
+    for post in posts:
+        indices, values = vectorize(post)
+        if not len(indices):
+            continue
+        pipe.hset(building_key, str(post.pk), _pack(indices, values))
+        indexed += 1
+        if indexed % batch_size == 0:
+            pipe.expire(building_key, REBUILD_TIMEOUT)
+            pipe.execute()
+    pipe.execute()
+
+    _, lost = _swap_script(
+        keys=[building_key, DOCS_KEY, VERSION_KEY, CHANGES_KEY, FLOOR_KEY], args=[start_version]
+    )
+    if lost:
+        logger.warning("Some content similarity changes made during the rebuild were lost; rebuild again")
+    return indexed
+
+
+def _rows(vectors):
+    """
+    Matriz CSR con un vector (indices, valores) por fila.
+    """
+    if not vectors:
+        return sparse.csr_matrix((0, N_FEATURES), dtype=np.float32)
+    lengths = np.fromiter((len(indices) for indices, _ in vectors), dtype=np.int64, count=len(vectors))
+    indptr = np.concatenate(([0], np.cumsum(lengths)))
+    indices = np.concatenate([indices for indices, _ in vectors])
+    values = np.concatenate([values for _, values in vectors])
+    return sparse.csr_matrix((values, indices, indptr), shape=(len(vectors), N_FEATURES))
+
+
+def _document_frequency(vectors):
+    if not vectors:
+        return np.zeros(N_FEATURES, dtype=np.int64)
+    return np.bincount(np.concatenate([indices for indices, _ in vectors]), minlength=N_FEATURES)
+
+
+class _Matrix:
+    """
+    Filas de documentos en CSC (para leer las columnas de los terminos de una
+    consulta) y sus valores al cuadrado, que comparten los indices, para las normas.
+    """
+
+    def __init__(self, vectors):
+        self.matrix = _rows(vectors).tocsc()
+        self.squared = sparse.csc_matrix(
+            (self.matrix.data ** 2, self.matrix.indices, self.matrix.indptr), shape=self.matrix.shape
+        )
+
+    def norms(self, idf):
+        return np.sqrt(self.squared @ (idf ** 2))
+
+
+class _Index:
+    """
+    Copia en memoria del indice: matriz documento x termino y sus pesos.
+
+    No cambia despues de creada: `load` y `update` devuelven otra copia, de modo
+    que las consultas pueden seguir leyendo esta mientras se arma la siguiente.
+    Las filas son las de la matriz principal seguidas de las de los cambios; las
+    de documentos que cambiaron despues de armar la principal quedan en `alive`
+    como borradas.
+    """
+
+    def __init__(self, version=None, docs=None, main=None, main_ids=(), main_alive=None, changed_ids=(),
+                 document_frequency=None):
+        self.version = version
+        self.docs = docs or {}
+        self.main = main if main is not None else _Matrix([])
+        self.main_ids = list(main_ids)
+        self.main_alive = main_alive if main_alive is not None else np.ones(len(self.main_ids), dtype=bool)
+        self.changed_ids = list(changed_ids)
+        self.changed = _Matrix([self.docs[post_id] for post_id in self.changed_ids])
+        self.document_frequency = (
+            document_frequency if document_frequency is not None else _document_frequency(list(self.docs.values()))
+        )
+
+        self.post_ids = self.main_ids + self.changed_ids
+        self.alive = np.concatenate([self.main_alive, np.ones(len(self.changed_ids), dtype=bool)])
+        self.rows = {post_id: row for row, post_id in enumerate(self.post_ids) if self.alive[row]}
+        self.idf = None
+        self.norms = None
+        if self.rows:
+            self._weigh()
+
+    @classmethod
+    def load(cls, version, docs):
+        main_ids = list(docs)
+        return cls(version, docs, _Matrix([docs[post_id] for post_id in main_ids]), main_ids)
+
+    def update(self, version, changes):
+        """
+        Copia con los cambios {post_id: vector, o None si se quito}.
+        """
+        docs = dict(self.docs)
+        removed, added = [], []
+        for post_id, vector in changes.items():
+            previous = docs.pop(post_id, None)
+            if previous is not None:
+                removed.append(previous)
+            if vector is not None:
+                docs[post_id] = vector
+                added.append(vector)
+
+        changed_ids = [post_id for post_id in self.changed_ids if post_id not in changes]
+        changed_ids += [post_id for post_id, vector in changes.items() if vector is not None]
+        if len(changed_ids) > max(COMPACT_MIN_ROWS, COMPACT_RATIO * len(self.main_ids)):
+            return _Index.load(version, docs)
+
+        main_alive = self.main_alive.copy()
+        for post_id in changes:
+            row = self.rows.get(post_id)
+            if row is not None and row < len(self.main_ids):
+                main_alive[row] = False
+
+        document_frequency = self.document_frequency - _document_frequency(removed) + _document_frequency(added)
+        return _Index(version, docs, self.main, self.main_ids, main_alive, changed_ids, document_frequency)
+
+    def _weigh(self):
+        self.idf = (np.log((1 + len(self.docs)) / (1 + self.document_frequency)) + 1).astype(np.float32)
+        # Norma de cada fila ponderada por el IDF: sqrt(sum((valor * idf)^2))
+        self.norms = np.concatenate([self.main.norms(self.idf), self.changed.norms(self.idf)])
+        self.norms[self.norms == 0] = 1.0
+
+    def similar(self, post_id, limit):
+        row = self.rows.get(str(post_id))
+        if row is None:
+            return []
+
+        features, values = self.docs[str(post_id)]
+        query = values * self.idf[features] ** 2
+        scores = np.concatenate([
+            self.main.matrix[:, features] @ query,
+            self.changed.matrix[:, features] @ query,
+        ]) / (self.norms * self.norms[row])
+        scores[~self.alive] = 0
+        scores[row] = 0
+
+        limit = min(limit, len(scores) - 1)
+        if limit <= 0:
+            return []
+        best = np.argpartition(-scores, limit)[:limit] if len(scores) > limit else np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [self.post_ids[index] for index in best if scores[index] > 0]
+
+
+_index = _Index()
+# Solo un hilo por proceso arma la copia nueva; las consultas no lo esperan
+_refresh_lock = threading.Lock()
+
+
+def _refreshed_index():
+    """
+    Devuelve la copia del indice al dia con Redis, armandola si hace falta.
+    """
+    global _index
+
+    version, floor = (int(value or 0) for value in redis_client.mget(VERSION_KEY, FLOOR_KEY))
+    index = _index
+    if version == index.version:
+        return index
+
+    # Mientras otro hilo la arma se responde con la copia actual, salvo en la primera carga
+    if not _refresh_lock.acquire(blocking=index.version is None):
+        return index
+    try:
+        index = _index
+        if version == index.version:
+            return index
+
+        if index.version is not None and index.version >= floor:
+            # Aplicar solo los posts que cambiaron desde la ultima carga
+            post_ids = [post_id.decode() for post_id in redis_client.zrangebyscore(CHANGES_KEY, index.version + 1, version)]
+            blobs = redis_client.hmget(DOCS_KEY, post_ids) if post_ids else []
+            changes = {post_id: None if blob is None else _unpack(blob) for post_id, blob in zip(post_ids, blobs)}
+            index = index.update(version, changes)
+        else:
+            docs = {post_id.decode(): _unpack(blob) for post_id, blob in redis_client.hgetall(DOCS_KEY).items()}
+            index = _Index.load(version, docs)
+
+        _index = index
+        return index
+    finally:
+        _refresh_lock.release()
+
+
+def similar_post_ids(post_id, limit=TOP_K):
+    """
+    Ids de los posts publicados con contenido mas parecido, de mayor a menor similitud.
+    """
+    try:
+        return _refreshed_index().similar(post_id, limit)
+    except redis.RedisError as e:
+        logger.warning(f"Could not read content similarity index: {str(e)}")
+        return []
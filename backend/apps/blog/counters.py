@@ -0,0 +1,162 @@
+"""
+Contadores de analiticas con escritura diferida (write-behind).
+
+Cada incremento (views, clicks, likes, comments, shares) se acumula en un hash
+de Redis por objeto, `analytics:<kind>:<id>`, y el id se marca en el set
+`analytics:<kind>:dirty`. La tarea `flush_analytics_counters` vacia esos hashes
+periodicamente y aplica los deltas en bloque a PostAnalytics / CategoryAnalytics,
+asi ninguna peticion hace un read-modify-write de la fila de analiticas.
+"""
+import logging
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+POST = "post"
+CATEGORY = "category"
+
+COUNTER_FIELDS = {
+    POST: ("views", "clicks", "likes", "comments", "shares"),
+    CATEGORY: ("views", "clicks"),
+}
+
+FLUSH_CHUNK_SIZE = 500
+
+
+def _hash_key(kind, object_id):
+    return f"analytics:{kind}:{object_id}"
+
+
+def _dirty_key(kind):
+    return f"analytics:{kind}:dirty"
+
+
+def _processing_key(kind):
+    return f"analytics:{kind}:processing"
+
+
+def increment(kind, object_id, metric, amount=1):
+    """
+    Acumula un incremento para la metrica de un objeto.
+    """
+    if metric not in COUNTER_FIELDS[kind]:
+        raise ValueError(f"Metric '{metric}' is not a buffered counter for {kind}")
+
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hincrby(_hash_key(kind, object_id), metric, amount)
+    pipe.sadd(_dirty_key(kind), str(object_id))
+    pipe.execute()
+
+
+def increment_many(kind, metric, amounts, pipe=None):
+    """
+    Acumula en una sola llamada a Redis los incrementos de una metrica para
+    varios objetos: {"<id>": cantidad}. Con `pipe` los comandos se encolan en
+    ese pipeline y los envia quien lo ejecute.
+    """
+    if metric not in COUNTER_FIELDS[kind]:
+        raise ValueError(f"Metric '{metric}' is not a buffered counter for {kind}")
+    if not amounts:
+        return
+
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = redis_client.pipeline(transaction=False)
+    for object_id, amount in amounts.items():
+        pipe.hincrby(_hash_key(kind, object_id), metric, amount)
+        pipe.sadd(_dirty_key(kind), str(object_id))
+    if own_pipe:
+        pipe.execute()
+
+
+def get_pending(kind, object_ids):
+    """
+    Devuelve los incrementos pendientes de varios objetos en una sola llamada a Redis:
+    {"<id>": {"views": 3, ...}}
+    """
+    ids = [str(object_id) for object_id in object_ids]
+    if not ids:
+        return {}
+
+    pipe = redis_client.pipeline(transaction=False)
+    for object_id in ids:
+        pipe.hgetall(_hash_key(kind, object_id))
+
+    try:
+        results = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not read pending {kind} counters: {str(e)}")
+        return {}
+
+    return {
+        object_id: {field.decode(): int(value) for field, value in values.items()}
+        for object_id, values in zip(ids, results)
+        if values
+    }
+
+
+def get_pending_metric(pending, object_id, metric):
+    """
+    Obtiene el delta pendiente de una metrica desde el resultado de get_pending.
+    """
+    return pending.get(str(object_id), {}).get(metric, 0)
+
+
+def drain(kind, chunk_size=FLUSH_CHUNK_SIZE):
+    """
+    Vacia los contadores pendientes en lotes de `chunk_size` objetos.
+
+    Al empezar, los ids marcados pasan del set de pendientes a uno de proceso y
+    solo se recorre ese: lo que `restore` devuelve (o llega) durante el vaciado
+    queda para la siguiente ejecucion. Si una ejecucion anterior se corto a la
+    mitad, sus ids siguen en el set de proceso y se recorren ahora.
+
+    Cada hash se lee y se borra dentro de un MULTI/EXEC, de modo que los incrementos
+    que llegan durante el vaciado quedan en un hash nuevo y no se pierden.
+    """
+    dirty_key = _dirty_key(kind)
+    processing_key = _processing_key(kind)
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.sunionstore(processing_key, [processing_key, dirty_key])
+    pipe.delete(dirty_key)
+    pipe.execute()
+
+    while True:
+        ids = redis_client.spop(processing_key, chunk_size)
+        if not ids:
+            return
+
+        pipe = redis_client.pipeline(transaction=True)
+        for object_id in ids:
+            key = _hash_key(kind, object_id.decode())
+            pipe.hgetall(key)
+            pipe.delete(key)
+        results = pipe.execute()
+
+        chunk = {}
+        for object_id, values in zip(ids, results[::2]):
+            deltas = {field.decode(): int(value) for field, value in values.items() if int(value)}
+            if deltas:
+                chunk[object_id.decode()] = deltas
+
+        if chunk:
+            yield chunk
+
+
+def restore(kind, chunk):
+    """
+    Devuelve a Redis un lote que no se pudo aplicar en la base de datos. Los ids
+    vuelven al set de pendientes, no al de proceso, asi el `drain` en curso no
+    los vuelve a leer.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for object_id, deltas in chunk.items():
+        for metric, delta in deltas.items():
+            pipe.hincrby(_hash_key(kind, object_id), metric, delta)
+        pipe.sadd(_dirty_key(kind), object_id)
+    pipe.execute()
@@ -0,0 +1,544 @@
+"""
+Datos sinteticos del blog para pruebas de carga (comando generate_dataset).
+
+Genera usuarios, un arbol de categorias, posts, comentarios con hilos, likes,
+shares, vistas e interacciones. La popularidad de los posts sigue una ley de
+Zipf: unos pocos posts reciben la mayor parte de los eventos, como en un blog
+real. Los conteos de cada post se sortean primero (una multinomial sobre los
+pesos de Zipf) y despues se generan sus filas, asi PostAnalytics,
+CategoryAnalytics y los conteos del arbol de categorias coinciden con las filas.
+
+Las filas se generan por lotes en un pool de procesos y se insertan con COPY en
+PostgreSQL (INSERT con executemany en otras bases, en un solo proceso). Los
+inserts no pasan por save() ni por los signals: las analiticas se crean aqui y
+los vectores de busqueda y el indice de contenido se recalculan despues con sus
+comandos.
+
+Cada lote usa un generador aleatorio derivado de la semilla y de la posicion del
+lote, y los ids de usuarios, categorias y posts se derivan de la semilla: la
+misma semilla, los mismos tamanos y la misma fecha final generan los mismos
+datos con cualquier numero de procesos.
+"""
+import hashlib
+import logging
+import multiprocessing
+import uuid
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import connection, connections, transaction
+from django.utils.text import slugify
+from faker import Faker
+
+from apps.authentication.models import UserAccount
+from apps.user_profile.models import UserProfile
+from . import category_tree, threads
+from .models import (
+    Category,
+    CategoryAnalytics,
+    Comment,
+    Post,
+    PostAnalytics,
+    PostInteraction,
+    PostLike,
+    PostShare,
+    PostView,
+    click_through_rate_expression,
+)
+
+logger = logging.getLogger(__name__)
+
+# Parte de los usuarios que son editores (autores de posts)
+AUTHOR_SHARE = 0.02
+PUBLISHED_SHARE = 0.9
+FEATURED_SHARE = 0.02
+# Parte de los comentarios que responden a otro comentario del mismo post
+REPLY_SHARE = 0.3
+MAX_THREAD_DEPTH = 3
+MAX_CATEGORY_DEPTH = 3
+# Parte de las vistas y shares de usuarios con sesion iniciada
+LOGGED_IN_SHARE = 0.3
+
+# Nombres y frases distintos que genera Faker en cada lote; generar cada texto
+# con Faker seria mas lento que insertarlo
+TEXT_POOL = 500
+
+SHARE_PLATFORMS = ["facebook", "x", "linkedin", "whatsapp", "other"]
+DEVICE_TYPES = ["desktop", "mobile", "tablet"]
+
+# Fases del generador, para derivar semillas independientes por fase y lote
+PLAN, USERS, CATEGORIES, POSTS, EVENTS = range(5)
+
+
+def make_id(seed, kind, index):
+    """
+    Id estable de un objeto a partir de la semilla, para referenciarlo desde
+    otros lotes sin consultar la base de datos.
+    """
+    digest = hashlib.blake2b(f"{seed}:{kind}:{index}".encode(), digest_size=16).digest()
+    return uuid.UUID(bytes=digest, version=4)
+
+
+def _rng(seed, phase, start):
+    return np.random.default_rng([seed, phase, start])
+
+
+def _faker(seed, phase, start):
+    fake = Faker()
+    fake.seed_instance(f"{seed}:{phase}:{start}")
+    return fake
+
+
+def _random_id(rng):
+    return uuid.UUID(bytes=rng.bytes(16), version=4)
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc)
+
+
+def _distinct(rng, population, size):
+    """
+    `size` enteros distintos de [0, population) sin recorrer toda la poblacion
+    cuando la muestra es chica.
+    """
+    if size * 4 > population:
+        return rng.permutation(population)[:size]
+    values = np.unique(rng.integers(0, population, size + size // 4 + 8))
+    while len(values) < size:
+        values = np.unique(np.concatenate([values, rng.integers(0, population, size)]))
+    return rng.permutation(values)[:size]
+
+
+def insert_rows(model, fields, rows):
+    """
+    Inserta filas (tuplas con los valores de `fields`, p. ej. "post_id") sin
+    save() ni bulk_create: con COPY en PostgreSQL y con executemany en otras
+    bases. Los valores se guardan tal cual (auto_now y auto_now_add no se
+    aplican), asi se conservan las fechas generadas. Las columnas que no estan
+    en `fields` quedan en NULL.
+    """
+    if not rows:
+        return 0
+
+    model_fields = {field.attname: field for field in model._meta.concrete_fields}
+    columns = [model_fields[name] for name in fields]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column_names = ", ".join(connection.ops.quote_name(field.column) for field in columns)
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            with cursor.copy(f"COPY {table} ({column_names}) FROM STDIN") as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                f"INSERT INTO {table} ({column_names}) VALUES ({placeholders})",
+                [[field.get_db_prep_save(value, connection) for field, value in zip(columns, row)] for row in rows],
+            )
+    return len(rows)
+
+
+def bulk_insert(model, objs):
+    """
+    Inserta instancias con insert_rows, con todos sus campos.
+    """
+    fields = model._meta.concrete_fields
+    rows = [[field.get_prep_value(getattr(obj, field.attname)) for field in fields] for obj in objs]
+    return insert_rows(model, [field.attname for field in fields], rows)
+
+
+def chunks(total, size):
+    return [(start, min(start + size, total)) for start in range(0, total, size)]
+
+
+def event_chunks(event_counts, size):
+    """
+    Rangos de posts con alrededor de `size` eventos cada uno. Con Zipf unos
+    pocos posts concentran los eventos, asi que los rangos no tienen el mismo
+    numero de posts.
+    """
+    total = len(event_counts)
+    if not total:
+        return []
+    cumulative = np.cumsum(event_counts)
+    # Cada rango termina en el post que alcanza el siguiente multiplo de `size`
+    cuts = np.searchsorted(cumulative, np.arange(size, cumulative[-1], size), side="left") + 1
+    bounds = [0, *sorted({int(cut) for cut in cuts if 0 < cut < total}), total]
+    return list(zip(bounds, bounds[1:]))
+
+
+def run(function, tasks, workers=1):
+    """
+    Ejecuta `function(**task)` para cada tarea y genera sus resultados. Con
+    PostgreSQL y mas de un proceso las tareas se reparten en un pool (fork);
+    cada proceso abre su propia conexion.
+    """
+    if workers > 1 and connection.vendor == "postgresql" and "fork" in multiprocessing.get_all_start_methods():
+        # Los procesos hijos no deben heredar la conexion abierta del padre
+        connections.close_all()
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            yield from pool.imap_unordered(_call, [(function, task) for task in tasks])
+        return
+    for task in tasks:
+        yield function(**task)
+
+
+def _call(args):
+    function, task = args
+    try:
+        return function(**task)
+    finally:
+        connections.close_all()
+
+
+def plan_posts(seed, posts, users, categories, comments, likes, views, shares, zipf_exponent, start, end):
+    """
+    Sortea los atributos y conteos de eventos de cada post: {nombre: array}.
+    """
+    rng = _rng(seed, PLAN, 0)
+    authors = max(1, int(users * AUTHOR_SHARE))
+    published = rng.random(posts) < PUBLISHED_SHARE
+
+    # Peso de Zipf por posicion en un ranking aleatorio; los borradores no tienen eventos
+    weights = (rng.permutation(posts) + 1.0) ** -zipf_exponent
+    weights[~published] = 0
+    if weights.sum():
+        weights /= weights.sum()
+
+    def draw(total):
+        return rng.multinomial(total, weights) if weights.sum() else np.zeros(posts, dtype=np.int64)
+
+    plan = {
+        "author": rng.integers(0, authors, posts),
+        "category": rng.integers(0, categories, posts),
+        "published": published,
+        "featured": rng.random(posts) < FEATURED_SHARE,
+        "created": rng.uniform(start.timestamp(), end.timestamp(), posts),
+        "comments": draw(comments),
+        # Un usuario da como maximo un like a cada post
+        "likes": np.minimum(draw(likes), users),
+        "views": draw(views),
+        "shares": draw(shares),
+    }
+    plan["clicks"] = rng.binomial(plan["views"], 0.6)
+    plan["impressions"] = plan["views"] + rng.poisson(plan["views"] * 3.0)
+    return plan
+
+
+USER_FIELDS = (
+    "id", "password", "email", "username", "first_name", "last_name", "created_at", "updated_at", "role",
+    "verified", "is_active", "is_staff", "is_superuser", "two_factor_enabled", "login_otp_used",
+)
+PROFILE_FIELDS = ("id", "user_id")
+
+
+def generate_users(seed, start, stop, authors, password, created_from, end):
+    """
+    Usuarios del rango [start, stop) con sus perfiles; los primeros `authors`
+    son editores.
+    """
+    rng = _rng(seed, USERS, start)
+    fake = _faker(seed, USERS, start)
+    first_names = [fake.first_name() for _ in range(TEXT_POOL)]
+    last_names = [fake.last_name() for _ in range(TEXT_POOL)]
+
+    size = stop - start
+    created = rng.uniform(created_from.timestamp(), end.timestamp(), size).tolist()
+    names = rng.integers(0, TEXT_POOL, (size, 2)).tolist()
+
+    users, profiles = [], []
+    for offset, index in enumerate(range(start, stop)):
+        created_at = _datetime(created[offset])
+        user_id = make_id(seed, "user", index)
+        users.append((
+            user_id, password, f"user{seed}_{index}@example.com", f"user{seed}_{index}",
+            first_names[names[offset][0]], last_names[names[offset][1]], created_at, created_at,
+            "editor" if index < authors else "customer", True, True, False, False, False, False,
+        ))
+        profiles.append((make_id(seed, "profile", index), user_id))
+
+    with transaction.atomic():
+        insert_rows(UserAccount, USER_FIELDS, users)
+        insert_rows(UserProfile, PROFILE_FIELDS, profiles)
+    return len(users)
+
+
+def generate_categories(seed, count):
+    """
+    Arbol de categorias: una quinta parte son raices y el resto cuelga de una
+    categoria anterior de hasta MAX_CATEGORY_DEPTH niveles.
+    """
+    rng = _rng(seed, CATEGORIES, 0)
+    fake = _faker(seed, CATEGORIES, 0)
+    roots = max(1, count // 5)
+
+    categories = []
+    for index in range(count):
+        parent = None
+        if index >= roots:
+            candidates = [category for category in categories if category.depth < MAX_CATEGORY_DEPTH - 1]
+            parent = candidates[int(rng.integers(len(candidates)))]
+        name = f"{fake.word().title()} {index}"
+        category = Category(
+            id=make_id(seed, "category", index),
+            parent=parent,
+            name=name,
+            title=name,
+            description=fake.sentence(nb_words=10),
+            slug=f"{slugify(name)}-{seed}",
+        )
+        category_tree.assign_path(category)
+        categories.append(category)
+
+    with transaction.atomic():
+        bulk_insert(Category, categories)
+        bulk_insert(CategoryAnalytics, [
+            CategoryAnalytics(id=make_id(seed, "category_analytics", index), category_id=category.id)
+            for index, category in enumerate(categories)
+        ])
+    return len(categories)
+
+
+POST_FIELDS = (
+    "id", "user_id", "title", "description", "content", "featured", "keywords", "slug",
+    "category_id", "created_at", "updated_at", "status", "content_hash",
+)
+ANALYTICS_FIELDS = (
+    "id", "post_id", "impressions", "clicks", "click_through_rate", "avg_time_on_page",
+    "time_on_page_samples", "time_on_page_m2", "avg_scroll_depth", "scroll_depth_samples",
+    "views", "likes", "comments", "shares", "trending_score",
+)
+
+
+def generate_posts(seed, start, stop, plan, end):
+    """
+    Posts del rango [start, stop) con sus analiticas. `plan` tiene las
+    porciones de los arrays de plan_posts para ese rango.
+    """
+    rng = _rng(seed, POSTS, start)
+    fake = _faker(seed, POSTS, start)
+    sentences = [fake.sentence(nb_words=12) for _ in range(TEXT_POOL)]
+    words = fake.words(nb=TEXT_POOL)
+
+    size = stop - start
+    picks = rng.integers(0, TEXT_POOL, (size, 15)).tolist()
+    mean_times = rng.lognormal(4.0, 0.5, size).tolist()
+    scroll_depths = rng.uniform(20, 90, size).tolist()
+
+    posts, analytics = [], []
+    for offset, index in enumerate(range(start, stop)):
+        created_at = _datetime(plan["created"][offset])
+        title = fake.sentence(nb_words=6).rstrip(".")
+        post_id = make_id(seed, "post", index)
+        pick = picks[offset]
+        content = "".join(
+            f"<p>{' '.join(sentences[i] for i in pick[paragraph:paragraph + 3])}</p>" for paragraph in (0, 3, 6)
+        )
+        posts.append((
+            post_id,
+            make_id(seed, "user", int(plan["author"][offset])),
+            title,
+            sentences[pick[9]],
+            content,
+            bool(plan["featured"][offset]),
+            ", ".join(words[i] for i in pick[10:15]),
+            f"{slugify(title)[:100]}-{seed}-{index}",
+            make_id(seed, "category", int(plan["category"][offset])),
+            created_at,
+            created_at,
+            "published" if plan["published"][offset] else "draft",
+            "",
+        ))
+
+        views = int(plan["views"][offset])
+        impressions = int(plan["impressions"][offset])
+        clicks = int(plan["clicks"][offset])
+        # La mitad de las vistas envia un beacon de permanencia
+        samples = views // 2
+        mean_time = mean_times[offset] if samples else 0.0
+        analytics.append((
+            make_id(seed, "post_analytics", index),
+            post_id,
+            impressions,
+            clicks,
+            clicks * 100.0 / impressions if impressions else 0.0,
+            mean_time,
+            samples,
+            (mean_time * 0.8) ** 2 * samples,
+            scroll_depths[offset] if samples else 0.0,
+            samples,
+            views,
+            int(plan["likes"][offset]),
+            int(plan["comments"][offset]),
+            int(plan["shares"][offset]),
+            0.0,
+        ))
+
+    with transaction.atomic():
+        insert_rows(Post, POST_FIELDS, posts)
+        insert_rows(PostAnalytics, ANALYTICS_FIELDS, analytics)
+    return len(posts)
+
+
+COMMENT_FIELDS = (
+    "id", "user_id", "post_id", "parent_id", "content", "created_at", "updated_at",
+    "is_active", "path", "depth", "replies_count",
+)
+# Posiciones de los campos que se leen o actualizan en las filas de comentarios
+PATH, DEPTH, REPLIES_COUNT = (COMMENT_FIELDS.index(name) for name in ("path", "depth", "replies_count"))
+LIKE_FIELDS = ("id", "post_id", "user_id", "timestamp")
+SHARE_FIELDS = ("id", "post_id", "user_id", "platform", "timestamp")
+VIEW_FIELDS = ("id", "post_id", "user_id", "ip_address", "timestamp")
+INTERACTION_FIELDS = (
+    "id", "post_id", "user_id", "comment_id", "interaction_type", "interaction_category",
+    "weight", "timestamp", "device_type", "ip_address", "hour_of_day", "day_of_week",
+)
+
+
+
+def _ids(rng, size):
+    data = rng.bytes(16 * size)
+    return [uuid.UUID(bytes=data[offset:offset + 16], version=4) for offset in range(0, 16 * size, 16)]
+
+
+def _timestamps(rng, created, end, size):
+    return [_datetime(value) for value in np.sort(rng.uniform(created, end.timestamp(), size)).tolist()]
+
+
+def _user_ids(seed, indexes):
+    return [make_id(seed, "user", index) for index in indexes.tolist()]
+
+
+def _visitors(rng, seed, users, size):
+    """
+    Usuarios (None si es anonimo) e IPs de `size` visitantes.
+    """
+    logged_in = (rng.random(size) < LOGGED_IN_SHARE).tolist()
+    user_indexes = rng.integers(0, users, size).tolist()
+    octets = rng.integers(1, 255, (size, 4)).tolist()
+    user_ids = [
+        make_id(seed, "user", user_index) if is_logged_in else None
+        for is_logged_in, user_index in zip(logged_in, user_indexes)
+    ]
+    return user_ids, [f"{a}.{b}.{c}.{d}" for a, b, c, d in octets]
+
+
+def _interactions(rng, post_id, interaction_type, user_ids, timestamps, ip_addresses=None, comment_ids=None):
+    size = len(timestamps)
+    ids = _ids(rng, size)
+    devices = rng.integers(0, len(DEVICE_TYPES), size).tolist()
+    category = "passive" if interaction_type == "view" else "active"
+    ip_addresses = ip_addresses or [None] * size
+    comment_ids = comment_ids or [None] * size
+    return [
+        (
+            ids[i], post_id, user_ids[i], comment_ids[i], interaction_type, category,
+            1.0, timestamp, DEVICE_TYPES[devices[i]], ip_addresses[i], timestamp.hour, timestamp.weekday(),
+        )
+        for i, timestamp in enumerate(timestamps)
+    ]
+
+
+def _comments(rng, seed, post_id, users, timestamps, sentences):
+    """
+    Comentarios de un post en orden cronologico; una parte responde a un
+    comentario anterior, hasta MAX_THREAD_DEPTH niveles.
+    """
+    size = len(timestamps)
+    ids = _ids(rng, size)
+    user_ids = _user_ids(seed, rng.integers(0, users, size))
+    is_reply = (rng.random(size) < REPLY_SHARE).tolist()
+    parent_picks = rng.random(size).tolist()
+    texts = rng.integers(0, len(sentences), size).tolist()
+
+    comments = []
+    for i, timestamp in enumerate(timestamps):
+        parent = comments[int(parent_picks[i] * i)] if i and is_reply[i] else None
+        if parent is not None and parent[DEPTH] >= MAX_THREAD_DEPTH:
+            parent = None
+        segment = threads.segment(timestamp, ids[i])
+        comments.append([
+            ids[i], user_ids[i], post_id, parent[0] if parent else None, sentences[texts[i]],
+            timestamp, timestamp, True,
+            parent[PATH] + segment if parent else segment, parent[DEPTH] + 1 if parent else 0, 0,
+        ])
+        if parent is not None:
+            parent[REPLIES_COUNT] += 1
+    return comments
+
+
+def generate_events(seed, start, stop, plan, users, end):
+    """
+    Comentarios, likes, shares, vistas e interacciones de los posts del rango
+    [start, stop), con los conteos de plan_posts.
+    """
+    rng = _rng(seed, EVENTS, start)
+    fake = _faker(seed, EVENTS, start)
+    sentences = [fake.sentence(nb_words=14) for _ in range(TEXT_POOL)]
+
+    comments, likes, shares, views, interactions = [], [], [], [], []
+    for offset, index in enumerate(range(start, stop)):
+        post_id = make_id(seed, "post", index)
+        created = float(plan["created"][offset])
+
+        timestamps = _timestamps(rng, created, end, int(plan["comments"][offset]))
+        post_comments = _comments(rng, seed, post_id, users, timestamps, sentences)
+        comments.extend(post_comments)
+        interactions.extend(_interactions(
+            rng, post_id, "comment", [comment[1] for comment in post_comments], timestamps,
+            comment_ids=[comment[0] for comment in post_comments],
+        ))
+
+        # Un like por usuario y post
+        like_count = int(plan["likes"][offset])
+        user_ids = _user_ids(seed, _distinct(rng, users, like_count))
+        timestamps = _timestamps(rng, created, end, like_count)
+        likes.extend(zip(_ids(rng, like_count), [post_id] * like_count, user_ids, timestamps))
+        interactions.extend(_interactions(rng, post_id, "like", user_ids, timestamps))
+
+        share_count = int(plan["shares"][offset])
+        user_ids, ip_addresses = _visitors(rng, seed, users, share_count)
+        timestamps = _timestamps(rng, created, end, share_count)
+        platforms = [SHARE_PLATFORMS[i] for i in rng.integers(0, len(SHARE_PLATFORMS), share_count).tolist()]
+        shares.extend(zip(_ids(rng, share_count), [post_id] * share_count, user_ids, platforms, timestamps))
+        interactions.extend(_interactions(rng, post_id, "share", user_ids, timestamps, ip_addresses))
+
+        # Cada vista es de un visitante unico, como las que cuenta la ingesta de vistas
+        view_count = int(plan["views"][offset])
+        user_ids, ip_addresses = _visitors(rng, seed, users, view_count)
+        timestamps = _timestamps(rng, created, end, view_count)
+        views.extend(zip(_ids(rng, view_count), [post_id] * view_count, user_ids, ip_addresses, timestamps))
+        interactions.extend(_interactions(rng, post_id, "view", user_ids, timestamps, ip_addresses))
+
+    with transaction.atomic():
+        insert_rows(Comment, COMMENT_FIELDS, comments)
+        insert_rows(PostLike, LIKE_FIELDS, likes)
+        insert_rows(PostShare, SHARE_FIELDS, shares)
+        insert_rows(PostView, VIEW_FIELDS, views)
+        insert_rows(PostInteraction, INTERACTION_FIELDS, interactions)
+    return len(comments) + len(likes) + len(shares) + len(views)
+
+
+def update_category_analytics(seed, plan, categories):
+    """
+    Vistas, impresiones y clicks de cada categoria: la suma de las de sus posts.
+    """
+    totals = {
+        field: np.bincount(plan["category"], weights=plan[field], minlength=categories)
+        for field in ("views", "impressions", "clicks")
+    }
+    rows = list(CategoryAnalytics.objects.filter(
+        category_id__in=[make_id(seed, "category", index) for index in range(categories)]
+    ))
+    indexes = {make_id(seed, "category", index): index for index in range(categories)}
+    for row in rows:
+        index = indexes[row.category_id]
+        for field, values in totals.items():
+            setattr(row, field, int(values[index]))
+    CategoryAnalytics.objects.bulk_update(rows, list(totals), batch_size=1000)
+    CategoryAnalytics.objects.filter(id__in=[row.id for row in rows]).update(
+        click_through_rate=click_through_rate_expression()
+    )
+    return len(rows)
@@ -0,0 +1,203 @@
+"""
+Tiempo de permanencia en los posts (dwell time) a partir de beacons del cliente.
+
+Al salir de un post el cliente envia los segundos que la pagina estuvo visible y
+cuanto se desplazo (porcentaje). Cada beacon actualiza en Redis, con un script
+Lua y sin tocar la base de datos, la media y la suma de cuadrados de las
+diferencias (M2, algoritmo de Welford) del post y de su categoria en
+`dwell:<kind>:<id>`, y marca el id en `dwell:<kind>:dirty`.
+
+La tarea flush_analytics_counters vacia esos hashes y combina cada lote con el
+acumulado de la base de datos (formula de Chan para unir dos medias y varianzas),
+de modo que avg_time_on_page es la media de todos los beacons y
+time_on_page_m2 / time_on_page_samples da su varianza.
+"""
+import logging
+import math
+
+import redis
+from django.conf import settings
+
+from . import post_slugs
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+POST = "post"
+CATEGORY = "category"
+
+# Beacons con mas segundos que esto (pestanas olvidadas abiertas) se descartan
+MAX_SECONDS = getattr(settings, "BLOG_DWELL_MAX_SECONDS", 60 * 60 * 2)
+
+FLUSH_CHUNK_SIZE = 500
+
+_MERGE = """
+local function merge(key, dirty_key, object_id, n_b, mean_b, m2_b, scroll_n_b, scroll_b)
+    local state = redis.call('HMGET', key, 'n', 'mean', 'm2', 'scroll_n', 'scroll')
+    local n_a = tonumber(state[1]) or 0
+    local mean_a = tonumber(state[2]) or 0
+    local n = n_a + n_b
+    local delta = mean_b - mean_a
+    local fields = {
+        'n', tostring(n),
+        'mean', tostring(mean_a + delta * n_b / n),
+        'm2', tostring((tonumber(state[3]) or 0) + m2_b + delta * delta * n_a * n_b / n),
+    }
+    if scroll_n_b > 0 then
+        local scroll_n_a = tonumber(state[4]) or 0
+        local scroll_a = tonumber(state[5]) or 0
+        local scroll_n = scroll_n_a + scroll_n_b
+        table.insert(fields, 'scroll_n')
+        table.insert(fields, tostring(scroll_n))
+        table.insert(fields, 'scroll')
+        table.insert(fields, tostring(scroll_a + (scroll_b - scroll_a) * scroll_n_b / scroll_n))
+    end
+    redis.call('HSET', key, unpack(fields))
+    redis.call('SADD', dirty_key, object_id)
+end
+"""
+
+# KEYS[1] = mapa de slugs; ARGV = slug, segundos, scroll ('' si no vino)
+# Devuelve 0 si el slug no esta en el mapa
+_beacon_script = redis_client.register_script(_MERGE + """
+local entry = redis.call('HGET', KEYS[1], ARGV[1])
+if not entry then
+    return 0
+end
+local separator = string.find(entry, ':', 1, true)
+local post_id = string.sub(entry, 1, separator - 1)
+local category_id = string.sub(entry, separator + 1)
+local seconds = tonumber(ARGV[2])
+local scroll = tonumber(ARGV[3])
+local scroll_n = scroll and 1 or 0
+merge('dwell:post:' .. post_id, 'dwell:post:dirty', post_id, 1, seconds, 0, scroll_n, scroll or 0)
+if category_id ~= '' then
+    merge('dwell:category:' .. category_id, 'dwell:category:dirty', category_id, 1, seconds, 0, 0, 0)
+end
+return 1
+""")
+
+# Devuelve a Redis un lote que no se pudo guardar: KEYS = hashes, ARGV = (id, n, mean, m2, scroll_n, scroll) * N
+_restore_script = redis_client.register_script(_MERGE + """
+for i, key in ipairs(KEYS) do
+    local offset = (i - 1) * 6
+    merge(key, ARGV[#ARGV], ARGV[offset + 1], tonumber(ARGV[offset + 2]), tonumber(ARGV[offset + 3]),
+        tonumber(ARGV[offset + 4]), tonumber(ARGV[offset + 5]), tonumber(ARGV[offset + 6]))
+end
+return #KEYS
+""")
+
+
+def _hash_key(kind, object_id):
+    return f"dwell:{kind}:{object_id}"
+
+
+def _dirty_key(kind):
+    return f"dwell:{kind}:dirty"
+
+
+def _processing_key(kind):
+    return f"dwell:{kind}:processing"
+
+
+def parse_beacon(seconds, scroll_depth=None):
+    """
+    Valida los valores de un beacon: (segundos, scroll en 0-100 o None), o None
+    si el beacon se descarta.
+    """
+    try:
+        seconds = float(seconds)
+        scroll_depth = float(scroll_depth) if scroll_depth not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(seconds) or seconds <= 0 or seconds > MAX_SECONDS:
+        return None
+    if scroll_depth is not None:
+        if not math.isfinite(scroll_depth):
+            return None
+        scroll_depth = min(max(scroll_depth, 0.0), 100.0)
+    return seconds, scroll_depth
+
+
+def record(slug, seconds, scroll_depth=None):
+    """
+    Suma un beacon al acumulado del post y de su categoria en una llamada a Redis.
+    Devuelve False si el slug no es de un post publicado.
+    """
+    args = [slug, seconds, "" if scroll_depth is None else scroll_depth]
+    try:
+        if _beacon_script(keys=[post_slugs.SLUGS_KEY], args=args):
+            return True
+        # Slug fuera del mapa: cargarlo desde la base de datos y reintentar
+        if not post_slugs.resolve([slug]):
+            return False
+        return bool(_beacon_script(keys=[post_slugs.SLUGS_KEY], args=args))
+    except redis.RedisError as e:
+        logger.error(f"Could not record dwell time for {slug}: {str(e)}")
+        return False
+
+
+def drain(kind, chunk_size=FLUSH_CHUNK_SIZE):
+    """
+    Vacia los acumulados pendientes en lotes: {id: (n, media, m2, scroll_n, scroll)}.
+    Como en counters.drain, solo recorre los ids marcados al empezar y cada hash
+    se lee y se borra en un MULTI/EXEC.
+    """
+    dirty_key = _dirty_key(kind)
+    processing_key = _processing_key(kind)
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.sunionstore(processing_key, [processing_key, dirty_key])
+    pipe.delete(dirty_key)
+    pipe.execute()
+
+    while True:
+        ids = redis_client.spop(processing_key, chunk_size)
+        if not ids:
+            return
+
+        pipe = redis_client.pipeline(transaction=True)
+        for object_id in ids:
+            key = _hash_key(kind, object_id.decode())
+            pipe.hgetall(key)
+            pipe.delete(key)
+        results = pipe.execute()
+
+        chunk = {}
+        for object_id, values in zip(ids, results[::2]):
+            values = {field.decode(): float(value) for field, value in values.items()}
+            if values.get("n"):
+                chunk[object_id.decode()] = (
+                    int(values["n"]),
+                    values.get("mean", 0.0),
+                    values.get("m2", 0.0),
+                    int(values.get("scroll_n", 0)),
+                    values.get("scroll", 0.0),
+                )
+        if chunk:
+            yield chunk
+
+
+def restore(kind, chunk):
+    """
+    Devuelve a Redis un lote que no se pudo aplicar en la base de datos. Los ids
+    quedan en el set de pendientes, fuera del `drain` en curso.
+    """
+    keys, args = [], []
+    for object_id, state in chunk.items():
+        keys.append(_hash_key(kind, object_id))
+        args.extend([object_id, *state])
+    if keys:
+        _restore_script(keys=keys, args=[*args, _dirty_key(kind)])
+
+
+def combine(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """
+    Une dos acumulados (conteo, media, M2) en uno.
+    """
+    n = n_a + n_b
+    if not n:
+        return 0, 0.0, 0.0
+    delta = mean_b - mean_a
+    return n, mean_a + delta * n_b / n, m2_a + m2_b + delta * delta * n_a * n_b / n
@@ -0,0 +1,125 @@
+"""
+Stream de eventos de interaccion con posts.
+
+Las vistas y los lotes de eventos del cliente solo publican eventos compactos
+(vistas y shares) en el stream de Redis `blog:events` (un XADD por evento) y
+responden; la tarea `consume_post_events` lee el stream con un grupo de
+consumidores, inserta en bloque PostView / PostShare / PostInteraction y suma
+los contadores.
+Los eventos se confirman (XACK) despues de escribirse en la base de datos; si un
+consumidor muere, sus eventos pendientes los recupera la siguiente ejecucion.
+"""
+import logging
+import os
+import socket
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+STREAM_KEY = "blog:events"
+CONSUMER_GROUP = "blog-events"
+
+# Longitud aproximada maxima del stream, para acotar la memoria de Redis
+STREAM_MAXLEN = getattr(settings, "BLOG_EVENTS_STREAM_MAXLEN", 100000)
+
+READ_BATCH_SIZE = 500
+# Eventos sin confirmar durante mas de este tiempo se reasignan a otro consumidor
+CLAIM_IDLE_MS = 60 * 1000
+CONSUME_LOCK_TIMEOUT = 60 * 5
+
+VIEW = "view"
+SHARE = "share"
+
+
+def publish(event_type, post_id, ip_address, user=None, pipe=None, **extra):
+    """
+    Agrega un evento al stream. Con `pipe` el XADD se encola en ese pipeline y
+    lo envia quien lo ejecute.
+    """
+    (pipe or redis_client).xadd(
+        STREAM_KEY,
+        {
+            "t": event_type,
+            "p": str(post_id),
+            "u": str(user.pk) if user is not None else "",
+            "ip": ip_address or "",
+            "ts": int(time.time()),
+            **extra,
+        },
+        maxlen=STREAM_MAXLEN,
+        approximate=True,
+    )
+
+
+def publish_view(post_id, ip_address, user=None):
+    """
+    Publica un evento de vista de un post.
+    """
+    try:
+        publish(VIEW, post_id, ip_address, user)
+    except redis.RedisError as e:
+        # Perder una vista es preferible a fallar la peticion
+        logger.error(f"Could not publish view event for post {post_id}: {str(e)}")
+
+
+def consume_lock():
+    """
+    Candado que evita que dos consumidores procesen eventos a la vez.
+    """
+    return redis_client.lock(f"{STREAM_KEY}:lock", timeout=CONSUME_LOCK_TIMEOUT)
+
+
+def consumer_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def ensure_group():
+    try:
+        redis_client.xgroup_create(STREAM_KEY, CONSUMER_GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _decode(entries):
+    return [
+        (entry_id, {key.decode(): value.decode() for key, value in fields.items()})
+        for entry_id, fields in entries
+        if fields
+    ]
+
+
+def read_batch(consumer, count=READ_BATCH_SIZE):
+    """
+    Devuelve un lote de eventos [(id, {campo: valor})] para `consumer`.
+
+    Primero reclama los eventos que otro consumidor dejo sin confirmar y despues
+    lee eventos nuevos.
+    """
+    _, claimed, *_ = redis_client.xautoclaim(
+        STREAM_KEY, CONSUMER_GROUP, consumer, min_idle_time=CLAIM_IDLE_MS, start_id="0-0", count=count
+    )
+    if claimed:
+        return _decode(claimed)
+
+    response = redis_client.xreadgroup(CONSUMER_GROUP, consumer, {STREAM_KEY: ">"}, count=count)
+    if not response:
+        return []
+    _, entries = response[0]
+    return _decode(entries)
+
+
+def ack(entry_ids):
+    """
+    Confirma y borra del stream los eventos ya procesados.
+    """
+    if entry_ids:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.xack(STREAM_KEY, CONSUMER_GROUP, *entry_ids)
+        pipe.xdel(STREAM_KEY, *entry_ids)
+        pipe.execute()
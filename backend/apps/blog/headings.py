@@ -0,0 +1,95 @@
+"""
+Procesamiento del contenido de los posts: encabezados para el indice del post.
+
+El hash del contenido se guarda en `Post.content_hash`, asi un guardado que no
+cambia el cuerpo no vuelve a procesarlo. Los encabezados se extraen en una sola
+pasada sobre el HTML (ya saneado con bleach), sin construir el arbol del documento,
+y se sincronizan por diferencias: solo se insertan, actualizan o borran los que
+cambiaron, cada grupo con una sola consulta.
+"""
+import hashlib
+import html
+import re
+from collections import defaultdict
+
+from django.utils.text import slugify
+
+from . import cache_tags
+from .models import Heading
+
+HEADING_RE = re.compile(r"<h([1-6])(?:\s[^>]*)?>(.*?)</h\1\s*>", re.IGNORECASE | re.DOTALL)
+TAG_RE = re.compile(r"<[^>]*>")
+SPACE_RE = re.compile(r"\s+")
+
+TITLE_MAX_LENGTH = Heading._meta.get_field("title").max_length
+
+
+def content_hash(content):
+    return hashlib.blake2b((content or "").encode(), digest_size=16).hexdigest()
+
+
+def refresh_content_hash(post):
+    """
+    Actualiza `post.content_hash` y devuelve True si el contenido cambio desde
+    la ultima vez que se procesaron sus encabezados.
+    """
+    digest = content_hash(post.content)
+    if digest == post.content_hash:
+        return False
+    post.content_hash = digest
+    return True
+
+
+def extract_headings(content):
+    """
+    Devuelve los encabezados del HTML en orden: [(level, title)].
+    """
+    if not content or "<h" not in content.lower():
+        return []
+
+    headings = []
+    for match in HEADING_RE.finditer(content):
+        title = SPACE_RE.sub(" ", html.unescape(TAG_RE.sub(" ", match.group(2)))).strip()
+        if title:
+            headings.append((int(match.group(1)), title[:TITLE_MAX_LENGTH]))
+    return headings
+
+
+def sync_headings(post, extracted):
+    """
+    Sincroniza los encabezados guardados del post con los extraidos de su contenido.
+
+    Los encabezados que siguen en el contenido conservan su fila (y su id), solo
+    se actualiza su posicion si cambio. Devuelve True si hubo cambios.
+    """
+    # Encabezados actuales agrupados por (nivel, titulo), en orden
+    existing = defaultdict(list)
+    for heading in Heading.objects.filter(post=post).order_by("order"):
+        existing[(heading.level, heading.title)].append(heading)
+
+    to_create = []
+    to_update = []
+    for order, (level, title) in enumerate(extracted, start=1):
+        matches = existing.get((level, title))
+        if matches:
+            heading = matches.pop(0)
+            if heading.order != order:
+                heading.order = order
+                to_update.append(heading)
+        else:
+            to_create.append(Heading(post=post, title=title, slug=slugify(title), level=level, order=order))
+
+    to_delete = [heading.pk for headings in existing.values() for heading in headings]
+
+    if to_delete:
+        Heading.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        Heading.objects.bulk_update(to_update, ["order"])
+    if to_create:
+        Heading.objects.bulk_create(to_create)
+
+    changed = bool(to_create or to_update or to_delete)
+    if changed:
+        # bulk_create y bulk_update no envian signals
+        cache_tags.invalidate(cache_tags.post(post.pk))
+    return changed
@@ -0,0 +1,188 @@
+"""
+Impresiones de posts y categorias acumuladas en Redis.
+
+Las impresiones de cada tipo viven en un solo hash, `<kind>:impressions`, con el
+id del objeto como campo. Para sincronizarlas, el hash se renombra atomicamente a
+`<kind>:impressions:processing` y se recorre con HSCAN en lotes, de modo que las
+impresiones que llegan durante la sincronizacion van a un hash nuevo y no se pierden.
+"""
+import hashlib
+import logging
+
+import redis
+from django.conf import settings
+
+from utils.ip_utils import get_client_ip
+from .counters import POST, CATEGORY
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+SYNC_CHUNK_SIZE = 500
+SYNC_LOCK_TIMEOUT = 60 * 10
+
+# Ventana en segundos durante la que un mismo cliente solo suma una impresion por objeto.
+# Con 0 no se deduplica.
+IMPRESSION_DEDUP_SECONDS = getattr(settings, "BLOG_IMPRESSION_DEDUP_SECONDS", 0)
+
+# KEYS[1] = hash de impresiones pendientes, KEYS[2..n] = claves "visto" por cliente y objeto
+# ARGV[1] = ventana de deduplicacion, ARGV[2..n] = ids de los objetos
+_record_deduplicated = redis_client.register_script("""
+local window = tonumber(ARGV[1])
+local counted = 0
+for i = 2, #ARGV do
+    if redis.call('SET', KEYS[i], 1, 'NX', 'EX', window) then
+        redis.call('HINCRBY', KEYS[1], ARGV[i], 1)
+        counted = counted + 1
+    end
+end
+return counted
+""")
+
+
+def _pending_key(kind):
+    return f"{kind}:impressions"
+
+
+def _processing_key(kind):
+    return f"{kind}:impressions:processing"
+
+
+def _seen_key(kind, client, object_id):
+    return f"{kind}:impressions:seen:{client}:{object_id}"
+
+
+def get_client_id(request):
+    """
+    Identificador del cliente para deduplicar impresiones: el usuario o, si es anonimo, su IP.
+    """
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        client = f"user:{user.pk}"
+    else:
+        client = f"ip:{get_client_ip(request)}"
+    return hashlib.blake2b(client.encode(), digest_size=8).hexdigest()
+
+
+def record(kind, object_ids, client=None, pipe=None):
+    """
+    Suma una impresion a cada objeto en una sola llamada a Redis.
+
+    Si se indica un cliente y la deduplicacion esta activa, un mismo cliente
+    solo suma una impresion por objeto dentro de la ventana configurada. Con
+    `pipe` los comandos se encolan en ese pipeline y los envia quien lo ejecute.
+    """
+    object_ids = [str(object_id) for object_id in dict.fromkeys(object_ids)]
+    if not object_ids:
+        return
+
+    key = _pending_key(kind)
+
+    if client and IMPRESSION_DEDUP_SECONDS > 0:
+        _record_deduplicated(
+            keys=[key] + [_seen_key(kind, client, object_id) for object_id in object_ids],
+            args=[IMPRESSION_DEDUP_SECONDS] + object_ids,
+            client=pipe,
+        )
+        return
+
+    own_pipe = pipe is None
+    if own_pipe:
+        pipe = redis_client.pipeline(transaction=False)
+    for object_id in object_ids:
+        pipe.hincrby(key, object_id, 1)
+    if own_pipe:
+        pipe.execute()
+
+
+def record_after_response(response, kind, request=None):
+    """
+    Programa el registro de impresiones de los items de la pagina devuelta en
+    `response` para cuando la respuesta ya se envio al cliente.
+    """
+    data = getattr(response, "data", None)
+    results = data.get("results") if isinstance(data, dict) else None
+    if not isinstance(results, list):
+        return response
+
+    object_ids = [item["id"] for item in results if isinstance(item, dict) and item.get("id")]
+    return record_ids_after_response(response, kind, object_ids, request)
+
+
+def record_ids_after_response(response, kind, object_ids, request=None):
+    """
+    Igual que record_after_response, pero con los ids ya conocidos (p. ej. los
+    de una pagina servida desde el cache de respuestas).
+    """
+    if not object_ids:
+        return response
+
+    client = get_client_id(request) if request is not None else None
+
+    close = response.close
+
+    def close_and_record():
+        close()
+        try:
+            record(kind, object_ids, client=client)
+        except Exception as e:
+            logger.error(f"Error recording {kind} impressions: {str(e)}")
+
+    # El servidor (WSGI) o el handler de Django (ASGI) cierran la respuesta despues de enviarla
+    response.close = close_and_record
+    return response
+
+
+def sync_lock(kind):
+    """
+    Candado que evita que dos sincronizaciones del mismo tipo se ejecuten a la vez.
+    """
+    return redis_client.lock(f"{kind}:impressions:lock", timeout=SYNC_LOCK_TIMEOUT)
+
+
+def begin_drain(kind):
+    """
+    Mueve las impresiones pendientes al hash de procesamiento.
+
+    Si quedo un hash de procesamiento de una ejecucion interrumpida, se procesa
+    primero ese y las impresiones nuevas esperan a la siguiente ejecucion.
+    Devuelve True si hay impresiones por procesar.
+    """
+    processing_key = _processing_key(kind)
+    if redis_client.exists(processing_key):
+        return True
+
+    try:
+        redis_client.rename(_pending_key(kind), processing_key)
+    except redis.ResponseError:
+        # No hay impresiones pendientes
+        return False
+    return True
+
+
+def iter_chunks(kind, chunk_size=SYNC_CHUNK_SIZE):
+    """
+    Recorre el hash de procesamiento con HSCAN y genera lotes {id: impresiones}.
+    """
+    chunk = {}
+    for object_id, count in redis_client.hscan_iter(_processing_key(kind), count=chunk_size):
+        chunk[object_id.decode()] = int(count)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = {}
+    if chunk:
+        yield chunk
+
+
+def ack(kind, object_ids):
+    """
+    Borra del hash de procesamiento los ids ya sincronizados.
+    """
+    object_ids = list(object_ids)
+    if object_ids:
+        redis_client.hdel(_processing_key(kind), *object_ids)
+
+
+def finish_drain(kind):
+    redis_client.delete(_processing_key(kind))
@@ -0,0 +1,100 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.blog import datasets
+from apps.blog.tasks import rollup_category_tree
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un conjunto de datos sintetico para pruebas de carga: usuarios, arbol de categorias, "
+        "posts, comentarios, likes, shares, vistas e interacciones con popularidad de Zipf"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--categories", type=int, default=50)
+        parser.add_argument("--posts", type=int, default=10000)
+        parser.add_argument("--comments", type=int, default=50000)
+        parser.add_argument("--likes", type=int, default=100000)
+        parser.add_argument("--views", type=int, default=500000)
+        parser.add_argument("--shares", type=int, default=10000)
+        parser.add_argument("--zipf", type=float, default=1.1, help="Exponente de la ley de Zipf de la popularidad")
+        parser.add_argument("--days", type=int, default=365, help="Dias de historia hasta --end")
+        parser.add_argument("--end", help="Fecha final de los datos (YYYY-MM-DD), por defecto hoy (UTC)")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--batch-size", type=int, default=5000, help="Filas por lote y transaccion")
+        parser.add_argument("--password", default="loadtest", help="Contrasena de todos los usuarios generados")
+
+    def handle(self, *args, **options):
+        seed = options["seed"]
+        users, categories, posts = options["users"], options["categories"], options["posts"]
+        batch_size, workers = options["batch_size"], options["workers"]
+
+        if posts and (users < 1 or categories < 1):
+            raise CommandError("Posts need at least one user and one category")
+        if min(options[name] for name in ("users", "categories", "posts", "comments", "likes", "views", "shares")) < 0:
+            raise CommandError("Sizes must not be negative")
+        if seed < 0:
+            raise CommandError("--seed must not be negative")
+        if batch_size < 1 or options["days"] < 1:
+            raise CommandError("--batch-size and --days must be positive")
+
+        end_date = parse_date(options["end"]) if options["end"] else datetime.now(dt_timezone.utc).date()
+        if end_date is None:
+            raise CommandError("--end must use the YYYY-MM-DD format")
+        end = datetime.combine(end_date, datetime.min.time(), tzinfo=dt_timezone.utc)
+        start = end - timedelta(days=options["days"])
+
+        plan = datasets.plan_posts(
+            seed, posts, users, categories,
+            options["comments"], options["likes"], options["views"], options["shares"],
+            options["zipf"], start, end,
+        )
+
+        def slice_plan(first, last):
+            return {key: values[first:last] for key, values in plan.items()}
+
+        password = make_password(options["password"])
+        authors = max(1, int(users * datasets.AUTHOR_SHARE))
+
+        self._phase("users", datasets.run(datasets.generate_users, [
+            {"seed": seed, "start": first, "stop": last, "authors": authors, "password": password,
+             "created_from": start, "end": end}
+            for first, last in datasets.chunks(users, batch_size)
+        ], workers))
+
+        self._phase("categories", [datasets.generate_categories(seed, categories)] if categories else [])
+
+        self._phase("posts", datasets.run(datasets.generate_posts, [
+            {"seed": seed, "start": first, "stop": last, "plan": slice_plan(first, last), "end": end}
+            for first, last in datasets.chunks(posts, batch_size)
+        ], workers))
+
+        event_counts = plan["comments"] + plan["likes"] + plan["shares"] + plan["views"]
+        self._phase("comments, likes, shares and views", datasets.run(datasets.generate_events, [
+            {"seed": seed, "start": first, "stop": last, "plan": slice_plan(first, last), "users": users, "end": end}
+            for first, last in datasets.event_chunks(event_counts, batch_size)
+        ], workers))
+
+        if categories:
+            datasets.update_category_analytics(seed, plan, categories)
+            rollup_category_tree()
+
+        self.stdout.write(
+            "Run update_search_vectors and rebuild_content_index to index the new posts, "
+            f"and rollup_post_stats(hours={options['days'] * 24}) to fill the analytics rollups"
+        )
+
+    def _phase(self, name, results):
+        started = time.perf_counter()
+        created = sum(results)
+        elapsed = time.perf_counter() - started
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f"Created {created} {name} in {elapsed:.1f}s ({rate:.0f} rows/s)"))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.blog import partitions
+from apps.blog.models import PostInteraction, PostView
+
+
+class Command(BaseCommand):
+    help = "Convierte las tablas de eventos del blog (PostInteraction, PostView) en tablas particionadas por mes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=partitions.MONTHS_AHEAD)
+
+    def handle(self, *args, **options):
+        if not partitions.is_supported():
+            raise CommandError("Table partitioning requires PostgreSQL")
+
+        for model in (PostInteraction, PostView):
+            table = model._meta.db_table
+            if partitions.is_partitioned(table):
+                self.stdout.write(f"{table} is already partitioned")
+                continue
+            created = partitions.convert(model, months_ahead=options["months_ahead"])
+            self.stdout.write(self.style.SUCCESS(f"Partitioned {table} into {created} monthly partitions"))
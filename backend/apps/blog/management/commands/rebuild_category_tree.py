@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog import category_tree
+from apps.blog.models import Category
+from apps.blog.tasks import rollup_category_tree
+
+
+class Command(BaseCommand):
+    help = "Recalcula la ruta, profundidad y conteos acumulados del arbol de categorias"
+
+    def handle(self, *args, **options):
+        updated = category_tree.rebuild_paths(Category)
+        rollup_category_tree()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt tree paths for {updated} categories"))
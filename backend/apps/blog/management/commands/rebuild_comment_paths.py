@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog import threads
+from apps.blog.models import Comment
+
+
+class Command(BaseCommand):
+    help = "Recalcula la ruta de hilo, profundidad y conteo de respuestas de todos los comentarios"
+
+    def handle(self, *args, **options):
+        updated = threads.rebuild_paths(Comment)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt thread paths for {updated} comments"))
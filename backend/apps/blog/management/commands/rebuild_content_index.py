@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.blog import tasks
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el indice de similitud de contenido con todos los posts publicados"
+
+    def handle(self, *args, **options):
+        indexed = tasks.rebuild_content_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} posts"))
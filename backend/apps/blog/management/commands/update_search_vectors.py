@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.blog import search
+from apps.blog.models import Post
+
+
+class Command(BaseCommand):
+    help = "Recalcula el vector de busqueda de texto completo de todos los posts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("Full-text search requires PostgreSQL")
+
+        batch_size = options["batch_size"]
+        post_ids = list(Post.objects.order_by("id").values_list("id", flat=True))
+
+        updated = 0
+        for start in range(0, len(post_ids), batch_size):
+            batch = post_ids[start:start + batch_size]
+            updated += search.update_search_vectors(Post.objects.filter(id__in=batch))
+
+        self.stdout.write(self.style.SUCCESS(f"Updated search vectors for {updated} posts"))
@@ -0,0 +1,233 @@
+import ckeditor.fields
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVectorField
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+from apps.blog import search
+
+
+def update_search_vectors(apps, schema_editor):
+    # Vector de busqueda de los posts existentes, con un solo UPDATE
+    search.update_search_vectors(apps.get_model('blog', 'Post').objects.all())
+
+
+class Migration(migrations.Migration):
+    """
+    Extension pg_trgm de PostgreSQL, para los indices GIN gin_trgm_ops de Post y
+    la busqueda por similitud de search.py. En otras bases de datos no hace nada.
+
+    Antes de los campos e indices de la busqueda y la paginacion por cursor se
+    ponen al dia los modelos que 0001_initial no recogia (Post.user, Comment,
+    PostInteraction...), sobre los que se apoyan estos indices y las migraciones
+    siguientes.
+    """
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('media', '0001_initial'),
+        ('blog', '0001_initial'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        # Modelos que 0001_initial no recogia
+        migrations.AlterModelOptions(
+            name='postview',
+            options={'ordering': ['-timestamp']},
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='featured',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='user',
+            field=models.ForeignKey(default=None, on_delete=django.db.models.deletion.CASCADE, related_name='user_post', to=settings.AUTH_USER_MODEL),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='comments',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='likes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='shares',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postview',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='post_views', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='category',
+            name='thumbnail',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='blog_category_thumbnail', to='media.media'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='content',
+            field=ckeditor.fields.RichTextField(default=None),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='slug',
+            field=models.CharField(max_length=128, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='status',
+            field=models.CharField(choices=[('draft', 'Draft'), ('published', 'Published')], default='draft', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='postanalytics',
+            name='post',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='post_analytics', to='blog.post'),
+        ),
+        migrations.AlterField(
+            model_name='postview',
+            name='post',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='views', to='blog.post'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postview',
+            unique_together={('post', 'user', 'ip_address')},
+        ),
+        migrations.CreateModel(
+            name='PostShare',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('platform', models.CharField(blank=True, choices=[('facebook', 'Facebook'), ('x', 'X'), ('linkedin', 'LinkedIn'), ('whatsapp', 'WhatsApp'), ('other', 'Other')], max_length=50, null=True)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shares', to='blog.post')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='post_shares', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('content', ckeditor.fields.RichTextField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='replies', to='blog.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_comments', to='blog.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_comments', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryView',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('ip_address', models.GenericIPAddressField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_view', to='blog.category')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategoryAnalytics',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('click_through_rate', models.FloatField(default=0)),
+                ('avg_time_on_page', models.FloatField(default=0)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='category_analytics', to='blog.category')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostLike',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='blog.post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'unique_together': {('post', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PostInteraction',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('interaction_type', models.CharField(choices=[('view', 'View'), ('like', 'Like'), ('comment', 'Comment'), ('share', 'Share')], max_length=10)),
+                ('interaction_category', models.CharField(choices=[('passive', 'Passive'), ('active', 'Active')], default='passive', max_length=10)),
+                ('weight', models.FloatField(default=1.0)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('device_type', models.CharField(blank=True, choices=[('desktop', 'Desktop'), ('mobile', 'Mobile'), ('tablet', 'Tablet')], max_length=50, null=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('hour_of_day', models.IntegerField(blank=True, null=True)),
+                ('day_of_week', models.IntegerField(blank=True, null=True)),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='interaction', to='blog.comment')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_interactions', to='blog.post')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='user_post_interactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-timestamp'],
+                'unique_together': {('user', 'post', 'interaction_type', 'comment')},
+            },
+        ),
+        # Busqueda de texto completo (search.py) y paginacion por cursor (pagination.py)
+        migrations.AddField(
+            model_name='post',
+            name='search_vector',
+            field=SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(update_search_vectors, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='post_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', 'title', 'id'], name='post_status_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['status', '-updated_at', '-id'], name='post_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['category', 'status', '-created_at', '-id'], name='post_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['user', 'status', '-created_at', '-id'], name='post_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=GinIndex(fields=['search_vector'], name='post_search_vector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=GinIndex(fields=['title'], name='post_title_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=GinIndex(fields=['keywords'], name='post_keywords_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='postanalytics',
+            index=models.Index(fields=['-views', 'post'], name='postanalytics_views_idx'),
+        ),
+    ]
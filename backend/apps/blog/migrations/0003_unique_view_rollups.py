@@ -0,0 +1,41 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0002_trigram_extension'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostUniqueViewRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('unique_views', models.PositiveIntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unique_view_rollups', to='blog.post')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('post', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryUniqueViewRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('unique_views', models.PositiveIntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unique_view_rollups', to='blog.category')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('category', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+from apps.blog import threads
+
+
+def rebuild_paths(apps, schema_editor):
+    # Ruta, profundidad y respuestas activas de los comentarios existentes
+    threads.rebuild_paths(apps.get_model('blog', 'Comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0003_unique_view_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['path'], name='comment_path_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(rebuild_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.20 on 2026-10-18 10:55
+
+from django.db import migrations, models
+
+from apps.blog import category_tree
+
+
+def rebuild_paths(apps, schema_editor):
+    # Ruta y profundidad de las categorias existentes; los conteos los llena la
+    # siguiente ejecucion de la tarea rollup_category_tree
+    category_tree.rebuild_paths(apps.get_model('blog', 'Category'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categoryanalytics',
+            name='subtree_clicks',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='categoryanalytics',
+            name='subtree_post_views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='categoryanalytics',
+            name='subtree_views',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['path'], name='category_path_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(rebuild_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0006_category_tree'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoryanalytics',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import utils.uuid_utils
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0007_trending_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostHourlyRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hourly_rollups', to='blog.post')),
+            ],
+            options={
+                'ordering': ['-hour'],
+                'indexes': [models.Index(fields=['hour'], name='posthourlyrollup_hour_idx')],
+                'unique_together': {('post', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PostDailyRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('likes', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+                ('shares', models.PositiveIntegerField(default=0)),
+                ('score', models.FloatField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='blog.post')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('post', 'date')},
+            },
+        ),
+        # Tablas de eventos: sin restricciones unicas ni orden por defecto, ver partitions.py
+        migrations.AlterModelOptions(
+            name='postinteraction',
+            options={},
+        ),
+        migrations.AlterModelOptions(
+            name='postview',
+            options={},
+        ),
+        migrations.AlterUniqueTogether(
+            name='postinteraction',
+            unique_together=set(),
+        ),
+        migrations.AlterUniqueTogether(
+            name='postview',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='postinteraction',
+            name='id',
+            field=models.UUIDField(default=utils.uuid_utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AlterField(
+            model_name='postview',
+            name='id',
+            field=models.UUIDField(default=utils.uuid_utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AddIndex(
+            model_name='postinteraction',
+            index=models.Index(fields=['post', '-timestamp'], name='postinteraction_post_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postinteraction',
+            index=models.Index(fields=['user', '-timestamp'], name='postinteraction_user_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postview',
+            index=models.Index(fields=['post', 'user', 'ip_address'], name='postview_visitor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='postview',
+            index=models.Index(fields=['post', '-timestamp'], name='postview_post_time_idx'),
+        ),
+    ]
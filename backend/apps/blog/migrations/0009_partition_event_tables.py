@@ -0,0 +1,31 @@
+from django.db import migrations
+
+from apps.blog import partitions
+
+
+def partition_event_tables(apps, schema_editor):
+    # Solo en PostgreSQL. La copia bloquea las tablas mientras dura: conviene
+    # migrar con la ingesta de eventos detenida
+    if not partitions.is_supported():
+        return
+    for model_name in ('PostInteraction', 'PostView'):
+        model = apps.get_model('blog', model_name)
+        if not partitions.is_partitioned(model._meta.db_table):
+            partitions.convert(model)
+
+
+class Migration(migrations.Migration):
+    """
+    Convierte PostInteraction y PostView en tablas particionadas por mes, ver
+    partitions.py. Las tablas que ya se convirtieron con el comando
+    partition_event_tables se dejan como estan. No se puede deshacer: las tablas
+    particionadas no admiten las restricciones unicas de antes de 0008.
+    """
+
+    dependencies = [
+        ('blog', '0008_event_tables_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_event_tables),
+    ]
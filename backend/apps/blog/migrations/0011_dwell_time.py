@@ -0,0 +1,43 @@
+# Generated by Django 4.2.20 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0010_author_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoryanalytics',
+            name='time_on_page_m2',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='categoryanalytics',
+            name='time_on_page_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='avg_scroll_depth',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='scroll_depth_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='time_on_page_m2',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postanalytics',
+            name='time_on_page_samples',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
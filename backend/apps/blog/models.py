@@ -1,16 +1,24 @@
 import uuid
 
-from django.db import models
-from django.db.models.signals import post_save
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.db.models.lookups import GreaterThan
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django.utils.text import slugify
 from django.utils.html import format_html
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from ckeditor.fields import RichTextField
 
 from apps.media.models import Media
 from apps.media.serializers import MediaSerializer
+from utils.uuid_utils import uuid7
+from . import cache_tags, category_tree, content_similarity, counters, post_slugs, search, threads, trending, unique_views
 
 User = settings.AUTH_USER_MODEL
 
@@ -25,6 +33,16 @@ def category_thumbnail_directory(instance, filename):
     sanitized_name = instance.name.replace(" ", "_")
     return "thumbnails/blog_categories/{0}/{1}".format(sanitized_name, filename)
 
+#Expresion SQL para recalcular el CTR en bloque con un UPDATE, sin leer las filas.
+#`impressions` permite calcularlo con el valor nuevo dentro del mismo UPDATE
+def click_through_rate_expression(impressions=None):
+    impressions = F("impressions") if impressions is None else impressions
+    return Case(
+        When(GreaterThan(impressions, 0), then=Cast(F("clicks"), FloatField()) * 100.0 / impressions),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
 
 class Category(models.Model):
 
@@ -53,8 +71,71 @@ class Category(models.Model):
     )
     slug = models.CharField(max_length=128)
 
+    # Ruta materializada en el arbol de categorias, ver category_tree.py
+    path = models.CharField(max_length=255, blank=True, default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    # Posts publicados en la categoria y en todo su subarbol
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+    subtree_post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # Subarbol de una categoria: path LIKE 'prefijo%'
+            models.Index(fields=["path"], name="category_path_prefix_idx", opclasses=["varchar_pattern_ops"]),
+        ]
+
     def __str__(self):
         return self.name
+
+    def clean(self):
+        # Una categoria no puede quedar dentro de su propio subarbol
+        if self.parent_id and self.path and self.parent.path.startswith(self.path):
+            raise ValidationError({"parent": "A category can't be moved under itself or one of its subcategories"})
+
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            if kwargs.get("update_fields") is None:
+                # Los conteos de posts solo cambian con UPDATEs sobre la ruta (category_tree):
+                # guardar una instancia leida antes no debe pisarlos
+                kwargs["update_fields"] = [
+                    field.name for field in self._meta.concrete_fields
+                    if not field.primary_key and field.name not in ("post_count", "subtree_post_count")
+                ]
+            previous = Category.objects.filter(pk=self.pk).values(
+                "path", "depth", "parent_id", "subtree_post_count"
+            ).first()
+
+        if not self.path or (previous and previous["parent_id"] != self.parent_id):
+            category_tree.assign_path(self)
+
+        moved = previous and previous["path"] and previous["path"] != self.path
+        if not moved:
+            super().save(*args, **kwargs)
+            return
+
+        # Cambio de padre: mover el subarbol y sus conteos junto con la categoria
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            category_tree.move_subtree(
+                Category,
+                previous["path"],
+                self.path,
+                self.depth - previous["depth"],
+                previous["subtree_post_count"],
+            )
+
+    def get_descendants(self, include_self=False):
+        categories = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            categories = categories.exclude(pk=self.pk)
+        return categories.order_by("path")
+
+    def get_ancestors(self, include_self=False):
+        return Category.objects.filter(
+            path__in=category_tree.ancestor_paths(self.path, include_self=include_self)
+        ).order_by("depth")
     
     def thumbnail_preview(self):
         if self.thumbnail:
@@ -85,6 +166,17 @@ class CategoryAnalytics(models.Model):
     clicks = models.PositiveIntegerField(default=0)
     click_through_rate = models.FloatField(default=0)
     avg_time_on_page = models.FloatField(default=0)
+    # Beacons de permanencia acumulados y suma de cuadrados de las diferencias, ver dwell.py
+    time_on_page_samples = models.PositiveIntegerField(default=0)
+    time_on_page_m2 = models.FloatField(default=0)
+
+    # Totales de la categoria y todas sus subcategorias, ver rollup_category_tree
+    subtree_views = models.PositiveIntegerField(default=0)
+    subtree_clicks = models.PositiveIntegerField(default=0)
+    subtree_post_views = models.PositiveIntegerField(default=0)
+
+    # Ultimo puntaje de tendencia guardado desde Redis, ver trending.py
+    trending_score = models.FloatField(default=0)
 
     def _update_click_through_rate(self):
         if self.impressions > 0:
@@ -94,21 +186,25 @@ class CategoryAnalytics(models.Model):
         self.save()
 
     def increment_click(self):
-        self.clicks += 1
-        self.save()
-        self._update_click_through_rate()
-    
-    def increment_impression(self):
-        self.impressions += 1
-        self.save()
-        self._update_click_through_rate()
+        # El click se acumula en Redis y flush_analytics_counters lo aplica (junto al CTR)
+        counters.increment(counters.CATEGORY, self.category_id, "clicks")
 
-    def increment_view(self, ip_address):
-        if not CategoryView.objects.filter(category=self.category, ip_address=ip_address).exists():
+    def increment_view(self, ip_address, user=None):
+        """
+        Registra la vista de un visitante y suma una vista si es un visitante unico.
+        Usa HyperLogLog en Redis o, en modo exacto, la tabla CategoryView.
+        """
+        if unique_views.is_exact():
+            if CategoryView.objects.filter(category=self.category, ip_address=ip_address).exists():
+                return
             CategoryView.objects.create(category=self.category, ip_address=ip_address)
-            
-            self.views += 1
-            self.save()
+        else:
+            visitor = unique_views.visitor_id(user.pk if user else None, ip_address)
+            is_new, = unique_views.add(counters.CATEGORY, [(self.category_id, visitor, timezone.localdate())])
+            if not is_new:
+                return
+
+        counters.increment(counters.CATEGORY, self.category_id, "views")
 
 
 class Post(models.Model):
@@ -149,14 +245,40 @@ class Post(models.Model):
 
     status = models.CharField(max_length=10, choices=status_options, default='draft')
 
+    # Vector de busqueda ponderado (titulo, keywords, descripcion, contenido), ver search.py
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Hash del contenido con el que se extrajeron los encabezados, ver headings.py
+    content_hash = models.CharField(max_length=32, blank=True, default="", editable=False)
+
     objects = models.Manager() # default manager
     postobjects = PostObjects() # custom manager
 
     class Meta:
         ordering = ("status", "-created_at")
+        # Indices compuestos para la paginacion por cursor de cada `sorting`
+        indexes = [
+            models.Index(fields=["status", "-created_at", "-id"], name="post_status_created_idx"),
+            models.Index(fields=["status", "title", "id"], name="post_status_title_idx"),
+            models.Index(fields=["status", "-updated_at", "-id"], name="post_status_updated_idx"),
+            models.Index(fields=["category", "status", "-created_at", "-id"], name="post_category_created_idx"),
+            models.Index(fields=["user", "status", "-created_at", "-id"], name="post_user_created_idx"),
+            # Busqueda de texto completo y por trigramas (requiere la extension pg_trgm)
+            GinIndex(fields=["search_vector"], name="post_search_vector_idx"),
+            GinIndex(fields=["title"], name="post_title_trgm_idx", opclasses=["gin_trgm_ops"]),
+            GinIndex(fields=["keywords"], name="post_keywords_trgm_idx", opclasses=["gin_trgm_ops"]),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Categoria y estado al cargar el post, para ajustar los conteos del arbol de categorias
+        instance._loaded_category_state = (
+            instance.__dict__.get("category_id"), instance.__dict__.get("status")
+        )
+        return instance
     
     def thumbnail_preview(self):
         if self.thumbnail:
@@ -180,15 +302,39 @@ class Comment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    # Ruta materializada del hilo y nivel de anidamiento, ver threads.py
+    path = models.CharField(max_length=255, blank=True, default="", editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Respuestas directas activas, mantenido al crear, borrar, activar y desactivar respuestas
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
+
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # Hilos completos de un post en orden de ruta
+            models.Index(fields=["post", "path"], name="comment_post_path_idx"),
+            # Subarboles por prefijo de ruta (LIKE 'prefijo%')
+            models.Index(fields=["path"], name="comment_path_prefix_idx", opclasses=["varchar_pattern_ops"]),
+        ]
 
     def __str__(self):
         return f"Comment by {self.user.username} on {self.post.title}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Estado al cargar el comentario, para ajustar replies_count del padre si cambia
+        instance._loaded_is_active = instance.__dict__.get("is_active")
+        return instance
+
     def get_replies(self):
         return self.replies.filter(is_active=True)
 
+    def save(self, *args, **kwargs):
+        if not self.path:
+            threads.assign_path(self)
+        super().save(*args, **kwargs)
+
 
 class PostLike(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -240,7 +386,7 @@ class PostInteraction(models.Model):
         ("active", "Active"),
     )
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='user_post_interactions', blank=True, null=True)
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_interactions')
     comment = models.ForeignKey(
@@ -263,22 +409,18 @@ class PostInteraction(models.Model):
 
 
     class Meta:
-        unique_together = ('user', 'post', 'interaction_type', 'comment')
-        ordering = ['-timestamp']
+        # Tabla particionada por mes en PostgreSQL (ver partitions.py): sin
+        # restricciones unicas ni orden por defecto, que obligaria a ordenar
+        # todas las particiones en cada consulta
+        indexes = [
+            models.Index(fields=["post", "-timestamp"], name="postinteraction_post_time_idx"),
+            models.Index(fields=["user", "-timestamp"], name="postinteraction_user_time_idx"),
+        ]
     
     def __str__(self):
         username = self.user.username if self.user else "Anonymous"
         return f"{username} {self.interaction_type} {self.post.title}"
     
-    def detect_anomalies(user, post):
-        recent_interactions = PostInteraction.objects.filter(
-            user=user,
-            post=post,
-            timestamp__gte=timezone.now() - timezone.timedelta(minutes=10)
-        )
-        if recent_interactions.count() > 50: # Limite arbitrario
-            raise ValueError("Anomalous behavior detected!")
-    
     def clean(self):
         # Validar que las interacciones tipo "comment" tengan un comentario asociado
         if self.interaction_type == 'comment' and not self.comment:
@@ -303,20 +445,145 @@ class PostInteraction(models.Model):
 
 class PostView(models.Model):
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='views')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="post_views", null=True, blank=True)
     ip_address = models.GenericIPAddressField()
     timestamp = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = ("post", "user", "ip_address")
-        ordering = ["-timestamp"]
+        # Particionada por mes como PostInteraction
+        indexes = [
+            models.Index(fields=["post", "user", "ip_address"], name="postview_visitor_idx"),
+            models.Index(fields=["post", "-timestamp"], name="postview_post_time_idx"),
+        ]
 
     def __str__(self):
         return f"View by {self.user.username if self.user else 'Anonymous'} on {self.post.title}"
 
 
+class PostUniqueViewRollup(models.Model):
+    """
+    Visitantes unicos de un post por dia, consolidados por la tarea rollup_unique_views.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='unique_view_rollups')
+    date = models.DateField()
+    unique_views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("post", "date")
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.post.title} {self.date}: {self.unique_views} unique views"
+
+
+class PostHourlyRollup(models.Model):
+    """
+    Interacciones de un post por hora, consolidadas por la tarea rollup_post_stats.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='hourly_rollups')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+    # Interacciones ponderadas con los pesos del ranking de tendencias
+    score = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ("post", "hour")
+        ordering = ["-hour"]
+        indexes = [models.Index(fields=["hour"], name="posthourlyrollup_hour_idx")]
+
+    def __str__(self):
+        return f"{self.post.title} {self.hour:%Y-%m-%d %H}h: {self.views} views"
+
+
+class PostDailyRollup(models.Model):
+    """
+    Interacciones de un post por dia, sumadas desde PostHourlyRollup.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='daily_rollups')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ("post", "date")
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.post.title} {self.date}: {self.views} views"
+
+
+class AuthorHourlyRollup(models.Model):
+    """
+    Interacciones de todos los posts de un autor por hora, consolidadas por la
+    tarea rollup_post_stats junto con PostHourlyRollup.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='hourly_post_rollups')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ("user", "hour")
+        ordering = ["-hour"]
+        indexes = [models.Index(fields=["hour"], name="authorhourlyrollup_hour_idx")]
+
+    def __str__(self):
+        return f"{self.user} {self.hour:%Y-%m-%d %H}h: {self.views} views"
+
+
+class AuthorDailyRollup(models.Model):
+    """
+    Interacciones de todos los posts de un autor por dia.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_post_rollups')
+    date = models.DateField()
+    views = models.PositiveIntegerField(default=0)
+    likes = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+    shares = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+
+    class Meta:
+        unique_together = ("user", "date")
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.user} {self.date}: {self.views} views"
+
+
+class CategoryUniqueViewRollup(models.Model):
+    """
+    Visitantes unicos de una categoria por dia, consolidados por la tarea rollup_unique_views.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='unique_view_rollups')
+    date = models.DateField()
+    unique_views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("category", "date")
+        ordering = ["-date"]
+
+    def __str__(self):
+        return f"{self.category.name} {self.date}: {self.unique_views} unique views"
+
+
 class PostAnalytics(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -326,12 +593,26 @@ class PostAnalytics(models.Model):
     clicks = models.PositiveIntegerField(default=0)
     click_through_rate = models.FloatField(default=0)
     avg_time_on_page = models.FloatField(default=0)
+    # Beacons de permanencia acumulados y suma de cuadrados de las diferencias, ver dwell.py
+    time_on_page_samples = models.PositiveIntegerField(default=0)
+    time_on_page_m2 = models.FloatField(default=0)
+    avg_scroll_depth = models.FloatField(default=0)
+    scroll_depth_samples = models.PositiveIntegerField(default=0)
 
     views = models.PositiveIntegerField(default=0)
     likes = models.PositiveIntegerField(default=0)
     comments = models.PositiveIntegerField(default=0)
     shares = models.PositiveIntegerField(default=0)
 
+    # Ultimo puntaje de tendencia guardado desde Redis, ver trending.py
+    trending_score = models.FloatField(default=0)
+
+    class Meta:
+        # Para el ordenamiento `most_viewed` (pagination.POST_SORTINGS), en el mismo orden
+        indexes = [
+            models.Index(fields=["-views", "post"], name="postanalytics_views_idx"),
+        ]
+
     def _update_click_through_rate(self):
         if self.impressions > 0:
             self.click_through_rate = (self.clicks/self.impressions) * 100
@@ -341,14 +622,17 @@ class PostAnalytics(models.Model):
 
     def increment_metric(self, metric_name):
         """
-        Incrementa cualquier métrica específica (likes, comments, shares).
+        Incrementa cualquier métrica específica (views, clicks, likes, comments, shares).
+        El incremento se acumula en Redis y se aplica en bloque por flush_analytics_counters.
         """
-        if hasattr(self, metric_name):
-            setattr(self, metric_name, getattr(self, metric_name) + 1)
-            self.save()
+        if metric_name in counters.COUNTER_FIELDS[counters.POST]:
+            counters.increment(counters.POST, self.post_id, metric_name)
         else:
             raise ValueError(f"Metric '{metric_name}' does not exist in PostAnalytics")
 
+    def increment_click(self):
+        self.increment_metric("clicks")
+
 
 class Heading(models.Model):
     """Crear una clase que permita crear un menu html del post"""
@@ -385,7 +669,173 @@ def create_post_analytics(sender, instance, created, **kwargs):
     if created:
         PostAnalytics.objects.create(post=instance)
 
+@receiver(post_save, sender=Post)
+def update_post_search_vector(sender, instance, update_fields=None, **kwargs):
+    # Solo recalcular si cambio alguno de los campos del vector de busqueda
+    if update_fields is not None and not set(update_fields) & set(search.SEARCH_FIELDS):
+        return
+    search.update_search_vectors(Post.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=Post)
+def update_post_content_index(sender, instance, update_fields=None, **kwargs):
+    # Solo recalcular si cambio el texto del post o su estado de publicacion
+    if update_fields is not None and not set(update_fields) & (content_similarity.INDEXED_FIELDS | {"status"}):
+        return
+    content_similarity.index_post_on_commit(instance)
+
+@receiver(post_delete, sender=Post)
+def remove_post_content_index(sender, instance, **kwargs):
+    content_similarity.remove_post_on_commit(instance.pk)
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Category)
+def remember_previous_slug(sender, instance, **kwargs):
+    # Si el slug cambia, el anterior tambien se quita del mapa de slugs
+    if not instance._state.adding:
+        instance._previous_slug = sender.objects.filter(pk=instance.pk).values_list("slug", flat=True).first()
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def forget_post_slug(sender, instance, **kwargs):
+    # El mapa de slugs se vuelve a cargar desde la base de datos cuando se pida
+    slugs = (instance.slug, getattr(instance, "_previous_slug", None))
+    transaction.on_commit(lambda: post_slugs.forget(*slugs))
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def forget_category_slug(sender, instance, **kwargs):
+    slugs = (instance.slug, getattr(instance, "_previous_slug", None))
+    transaction.on_commit(lambda: post_slugs.forget_categories(*slugs))
+
 @receiver(post_save, sender=Category)
 def create_category_analytics(sender, instance, created, **kwargs):
     if created:
         CategoryAnalytics.objects.create(category=instance)
+
+# replies_count cuenta solo las respuestas activas, igual que threads.rebuild_paths
+@receiver(pre_save, sender=Comment)
+def remember_comment_is_active(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._previous_is_active = False
+        return
+    previous = getattr(instance, "_loaded_is_active", None)
+    if previous is None:
+        # Campo diferido o instancia creada a mano: leer el estado guardado
+        previous = Comment.objects.filter(pk=instance.pk).values_list("is_active", flat=True).first() or False
+    instance._previous_is_active = previous
+
+@receiver(post_save, sender=Comment)
+def update_parent_replies_count(sender, instance, **kwargs):
+    was_active = getattr(instance, "_previous_is_active", False)
+    instance._loaded_is_active = instance.is_active
+    if not instance.parent_id or was_active == instance.is_active:
+        return
+    if instance.is_active:
+        Comment.objects.filter(pk=instance.parent_id).update(replies_count=F("replies_count") + 1)
+    else:
+        Comment.objects.filter(pk=instance.parent_id, replies_count__gt=0).update(
+            replies_count=F("replies_count") - 1
+        )
+
+@receiver(post_delete, sender=Comment)
+def decrement_parent_replies_count(sender, instance, **kwargs):
+    if instance.parent_id and instance.is_active:
+        Comment.objects.filter(pk=instance.parent_id, replies_count__gt=0).update(
+            replies_count=F("replies_count") - 1
+        )
+
+# Invalidacion del cache: cada cambio incrementa la generacion de las etiquetas
+# de las que dependen las respuestas cacheadas (ver cache_tags)
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_cache(sender, instance, update_fields=None, **kwargs):
+    # El vector de busqueda no forma parte de ninguna respuesta
+    if update_fields is not None and set(update_fields) <= {"search_vector"}:
+        return
+    cache_tags.invalidate(
+        cache_tags.POSTS,
+        cache_tags.post(instance.pk),
+        cache_tags.author(instance.user_id),
+        cache_tags.category(instance.category_id),
+    )
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_cache(sender, instance, **kwargs):
+    cache_tags.invalidate(cache_tags.CATEGORIES, cache_tags.category(instance.pk))
+
+@receiver(post_save, sender=Heading)
+@receiver(post_delete, sender=Heading)
+def invalidate_heading_cache(sender, instance, **kwargs):
+    cache_tags.invalidate(cache_tags.post(instance.post_id))
+
+@receiver(post_save, sender=PostLike)
+@receiver(post_delete, sender=PostLike)
+def invalidate_post_like_cache(sender, instance, **kwargs):
+    cache_tags.invalidate(cache_tags.post(instance.post_id))
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_thread_cache(sender, instance, **kwargs):
+    cache_tags.invalidate(cache_tags.thread(instance.post_id))
+
+@receiver(post_save, sender=User)
+def invalidate_author_cache(sender, instance, update_fields=None, **kwargs):
+    # Iniciar sesion solo actualiza last_login, que no se muestra en el blog
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    cache_tags.invalidate(cache_tags.author(instance.pk))
+
+@receiver(post_save, sender="user_profile.UserProfile")
+def invalidate_author_profile_cache(sender, instance, **kwargs):
+    cache_tags.invalidate(cache_tags.author(instance.user_id))
+
+# Conteos de posts publicados acumulados en el arbol de categorias
+@receiver(pre_save, sender=Post)
+def remember_post_category_state(sender, instance, **kwargs):
+    if instance._state.adding:
+        instance._previous_category_state = (None, None)
+        return
+    state = getattr(instance, "_loaded_category_state", (None, None))
+    if None in state:
+        # Campos diferidos o instancia creada a mano: leer el estado guardado
+        state = Post.objects.filter(pk=instance.pk).values_list("category_id", "status").first() or (None, None)
+    instance._previous_category_state = state
+
+@receiver(post_save, sender=Post)
+def update_category_post_counts(sender, instance, **kwargs):
+    previous_category_id, previous_status = getattr(instance, "_previous_category_state", (None, None))
+    was_counted = previous_status == "published"
+    is_counted = instance.status == "published"
+    if was_counted and (not is_counted or previous_category_id != instance.category_id):
+        category_tree.apply_post_count_delta(Category, previous_category_id, -1)
+    if is_counted and (not was_counted or previous_category_id != instance.category_id):
+        category_tree.apply_post_count_delta(Category, instance.category_id, 1)
+    instance._loaded_category_state = (instance.category_id, instance.status)
+
+@receiver(post_save, sender=Post)
+def move_trending_category(sender, instance, **kwargs):
+    previous_category_id, _ = getattr(instance, "_previous_category_state", (None, None))
+    if previous_category_id is not None and previous_category_id != instance.category_id:
+        post_id, category_id = instance.pk, instance.category_id
+        transaction.on_commit(lambda: trending.move_post(post_id, previous_category_id, category_id))
+
+@receiver(post_delete, sender=Post)
+def decrement_category_post_counts(sender, instance, **kwargs):
+    if instance.status == "published":
+        category_tree.apply_post_count_delta(Category, instance.category_id, -1)
+
+@receiver(post_save, sender=PostInteraction)
+def record_trending_interaction(sender, instance, created, **kwargs):
+    if created:
+        # Usar el post que ya cargo quien creo la interaccion; si solo vino post_id,
+        # leer solo su categoria
+        if PostInteraction.post.is_cached(instance):
+            category_id = instance.post.category_id
+        else:
+            category_id = Post.objects.filter(id=instance.post_id).values_list("category_id", flat=True).first()
+        trending.record_on_commit([(
+            instance.post_id,
+            category_id,
+            trending.interaction_score(instance.interaction_type, instance.weight),
+        )])
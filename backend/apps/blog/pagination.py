@@ -0,0 +1,378 @@
+"""
+Paginacion en la base de datos para los listados de posts.
+
+Los listados ya no serializan el queryset completo: la pagina se recorta con
+LIMIT en SQL. Hay dos modos:
+
+- `?cursor=...` (por defecto): keyset. La posicion del ultimo item se codifica en
+  el cursor y la siguiente pagina se obtiene con un predicado
+  `(campo, id) > (valor, id)` que aprovecha los indices compuestos de Post, asi la
+  latencia no crece con el numero de posts. Sin cursor, o con uno vacio, se pide
+  la primera pagina, que ya devuelve el enlace `next` por cursor. Los campos de
+  otras tablas (las vistas de PostAnalytics en `most_viewed`) se exigen no nulos:
+  el JOIN pasa a ser INNER y la pagina se lee del indice de esa tabla.
+- `?p=N`: compatible con la paginacion anterior, con LIMIT/OFFSET y un COUNT.
+
+El orden por tendencia usa TrendingPagination, que recorre el ranking de Redis.
+"""
+import base64
+import binascii
+import datetime
+import json
+import logging
+import uuid
+from itertools import islice
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from rest_framework_api.serializers import APIResponseSerializer
+
+from . import trending
+
+logger = logging.getLogger(__name__)
+
+# Ordenamientos soportados por el parametro `sorting`. Todos terminan en `id`
+# para que la posicion de cada post sea unica.
+POST_SORTINGS = {
+    "newest": ("-created_at", "-id"),
+    "az": ("title", "id"),
+    "za": ("-title", "-id"),
+    "recently_updated": ("-updated_at", "-id"),
+    # En el orden del indice postanalytics_views_idx (views DESC, post_id)
+    "most_viewed": ("-post_analytics__views", "id"),
+    # Orden de los posts fuera del ranking de tendencias, ver TrendingPagination
+    "trending": ("-created_at", "-id"),
+}
+
+# Orden por defecto de Post (Meta.ordering) con `id` como desempate
+DEFAULT_POST_ORDERING = ("status", "-created_at", "-id")
+
+
+def get_post_ordering(sorting):
+    return POST_SORTINGS.get(sorting, DEFAULT_POST_ORDERING)
+
+
+class KeysetPagination:
+    page_size = 6
+    page_query_param = "p"
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+
+    def __init__(self, ordering):
+        self.ordering = tuple(ordering)
+        self.max_page_size = getattr(settings, "MAX_PAGE_SIZE", 100)
+        self.count = None
+        self.next = None
+        self.previous = None
+
+    def paginate_queryset(self, queryset, request):
+        """
+        Devuelve la lista de objetos de la pagina pedida.
+        """
+        self.request = request
+        self.page_size = self._get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        # Un keyset no puede comparar nulos; exigir los campos de otras tablas ademas
+        # convierte su LEFT JOIN en INNER JOIN, que deja recorrer el indice de esa tabla
+        related = [field.lstrip("-") for field in self.ordering if "__" in field]
+        if related:
+            queryset = queryset.filter(**{f"{name}__isnull": False for name in related})
+
+        params = request.query_params
+        if self.page_query_param in params and self.cursor_query_param not in params:
+            return self._paginate_page(queryset, params[self.page_query_param])
+        return self._paginate_cursor(queryset, params.get(self.cursor_query_param, ""))
+
+    def get_paginated_response(self, data):
+        serializer = APIResponseSerializer(
+            {
+                "success": True,
+                "status": status.HTTP_200_OK,
+                "results": data,
+                "count": self.count,
+                "next": self.next,
+                "previous": self.previous,
+            }
+        )
+        return Response(serializer.data)
+
+    def _get_page_size(self, request):
+        page_size = self.page_size
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            pass
+
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    # Paginacion por numero de pagina (`p`)
+
+    def _paginate_page(self, queryset, page):
+        try:
+            page = int(page)
+        except (TypeError, ValueError):
+            raise NotFound(detail="Invalid page.")
+
+        self.count = queryset.count()
+        last_page = max((self.count + self.page_size - 1) // self.page_size, 1)
+        if page < 1 or page > last_page:
+            raise NotFound(detail="Invalid page.")
+
+        items = self._slice(queryset, (page - 1) * self.page_size)
+
+        url = self.request.build_absolute_uri()
+        if page < last_page:
+            self.next = replace_query_param(url, self.page_query_param, page + 1)
+        if page == 2:
+            self.previous = remove_query_param(url, self.page_query_param)
+        elif page > 2:
+            self.previous = replace_query_param(url, self.page_query_param, page - 1)
+        return items
+
+    def _slice(self, queryset, offset):
+        return list(queryset[offset:offset + self.page_size])
+
+    # Paginacion por cursor (keyset)
+
+    def _paginate_cursor(self, queryset, cursor):
+        position, reverse = self._decode_cursor(cursor) if cursor else (None, False)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(_invert(field) for field in ordering)
+            queryset = queryset.order_by(*ordering)
+
+        if position is not None:
+            queryset = self._filter_after(queryset, ordering, position)
+
+        # Un item de mas indica si hay otra pagina en la direccion recorrida
+        items = list(queryset[:self.page_size + 1])
+        has_more = len(items) > self.page_size
+        items = items[:self.page_size]
+        if reverse:
+            items.reverse()
+
+        if items:
+            has_next = position is not None if reverse else has_more
+            has_previous = has_more if reverse else position is not None
+            if has_next:
+                self.next = self._cursor_link(self._position(items[-1]), reverse=False)
+            if has_previous:
+                self.previous = self._cursor_link(self._position(items[0]), reverse=True)
+        return items
+
+    def _filter_after(self, queryset, ordering, position):
+        # Un cursor alterado puede traer valores que no corresponden a los campos
+        try:
+            return queryset.filter(_after(ordering, position))
+        except (DjangoValidationError, ValueError, TypeError):
+            raise NotFound(detail="Invalid cursor.")
+
+    def _position(self, obj):
+        return [_encode_value(_field_value(obj, field.lstrip("-"))) for field in self.ordering]
+
+    def _cursor_link(self, position, reverse):
+        return self._link({"p": position, "r": reverse})
+
+    def _link(self, payload):
+        payload = json.dumps(payload, separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _decode_payload(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (TypeError, ValueError, binascii.Error):
+            raise NotFound(detail="Invalid cursor.")
+        if not isinstance(payload, dict):
+            raise NotFound(detail="Invalid cursor.")
+        return payload
+
+    def _decode_cursor(self, cursor):
+        payload = self._decode_payload(cursor)
+        position = payload.get("p")
+        if not _is_position(position, len(self.ordering)):
+            raise NotFound(detail="Invalid cursor.")
+        return position, bool(payload.get("r", False))
+
+
+class TrendingPagination(KeysetPagination):
+    """
+    Paginacion del orden por tendencia.
+
+    Primero se recorren los CANDIDATES primeros posts del ranking de Redis por
+    tramos (ZREVRANGE inicio fin): de cada tramo se traen solo sus posts con
+    `id__in` y se ordenan en Python, y el cursor guarda la posicion en el ranking.
+    Despues siguen los demas posts, del mas nuevo al mas viejo, por keyset.
+    Cada item del recorrido lleva su llave: ("o", posicion en el ranking) o
+    ("p", posicion keyset).
+    """
+
+    # Posiciones del ranking que se leen en cada llamada a Redis
+    ranking_batch_size = 50
+
+    def __init__(self, category_ids=None):
+        super().__init__(POST_SORTINGS["trending"])
+        self.category_ids = None if category_ids is None else list(category_ids)
+        self._candidates = None
+
+    def _paginate_cursor(self, queryset, cursor):
+        start, reverse = self._decode_cursor(cursor) if cursor else (("o", 0), False)
+
+        # Un item de mas indica si hay otra pagina en la direccion recorrida
+        items = list(islice(self._walk(queryset, start, reverse, self.page_size + 1), self.page_size + 1))
+        has_more = len(items) > self.page_size
+        items = items[:self.page_size]
+        if reverse:
+            items.reverse()
+
+        if items:
+            has_next = bool(cursor) if reverse else has_more
+            has_previous = has_more if reverse else bool(cursor)
+            if has_next:
+                kind, value = items[-1][0]
+                self.next = self._trending_link((kind, value + 1 if kind == "o" else value), reverse=False)
+            if has_previous:
+                self.previous = self._trending_link(items[0][0], reverse=True)
+        return [post for _, post in items]
+
+    def _slice(self, queryset, offset):
+        walk = self._walk(queryset, ("o", 0), False, offset + self.page_size)
+        return [post for _, post in islice(walk, offset, offset + self.page_size)]
+
+    def _walk(self, queryset, start, reverse, batch_size):
+        """
+        Recorre los posts desde `start`: hacia adelante, una posicion del ranking
+        (incluida) o keyset (excluida); hacia atras, los anteriores a `start`.
+        """
+        kind, value = start
+        if kind == "o":
+            yield from self._walk_ranking(queryset, value, reverse)
+            if not reverse:
+                yield from self._walk_rest(queryset, None, False, batch_size)
+        else:
+            yield from self._walk_rest(queryset, value, reverse, batch_size)
+            if reverse:
+                yield from self._walk_ranking(queryset, len(self._get_candidates()), True)
+
+    def _walk_ranking(self, queryset, offset, reverse):
+        position = min(offset, trending.CANDIDATES)
+        while (position > 0) if reverse else (position < trending.CANDIDATES):
+            start = max(position - self.ranking_batch_size, 0) if reverse else position
+            limit = position - start if reverse else min(self.ranking_batch_size, trending.CANDIDATES - position)
+            post_ids = self._ranking(start, limit)
+            if not post_ids:
+                return
+
+            posts = {str(post.id): post for post in queryset.filter(id__in=post_ids)}
+            ranked = [(start + index, post_id) for index, post_id in enumerate(post_ids)]
+            for index, post_id in reversed(ranked) if reverse else ranked:
+                if post_id in posts:
+                    yield ("o", index), posts[post_id]
+
+            if reverse:
+                position = start
+            elif len(post_ids) < limit:
+                return
+            else:
+                position += limit
+
+    def _walk_rest(self, queryset, position, reverse, batch_size):
+        ordering = tuple(_invert(field) for field in self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        candidates = self._get_candidates()
+        if candidates:
+            queryset = queryset.exclude(id__in=candidates)
+
+        while True:
+            page = self._filter_after(queryset, ordering, position) if position is not None else queryset
+            items = list(page[:batch_size])
+            for item in items:
+                position = self._position(item)
+                yield ("p", position), item
+            if len(items) < batch_size:
+                return
+
+    def _get_candidates(self):
+        if self._candidates is None:
+            self._candidates = self._ranking(0, trending.CANDIDATES)
+        return self._candidates
+
+    def _ranking(self, start, limit):
+        try:
+            return trending.top_posts(limit, self.category_ids, start=start)
+        except redis.RedisError as e:
+            # Sin ranking los posts quedan del mas nuevo al mas viejo
+            logger.warning(f"Could not read trending ranking: {str(e)}")
+            return []
+
+    def _trending_link(self, start, reverse):
+        kind, value = start
+        return self._link({kind: value, "r": reverse})
+
+    def _decode_cursor(self, cursor):
+        payload = self._decode_payload(cursor)
+        reverse = bool(payload.get("r", False))
+        if "o" in payload:
+            offset = payload["o"]
+            if type(offset) is not int or offset < 0:
+                raise NotFound(detail="Invalid cursor.")
+            return ("o", offset), reverse
+
+        position = payload.get("p")
+        if not _is_position(position, len(self.ordering)):
+            raise NotFound(detail="Invalid cursor.")
+        return ("p", position), reverse
+
+
+def _is_position(position, length):
+    return (
+        isinstance(position, list)
+        and len(position) == length
+        and all(isinstance(value, (str, int, float)) and not isinstance(value, bool) for value in position)
+    )
+
+
+def _invert(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
+
+
+def _after(ordering, position):
+    """
+    Predicado de los objetos que van despues de `position` en `ordering`:
+    (a > va) OR (a = va AND b > vb) OR ...
+    """
+    predicate = Q()
+    equal = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        predicate |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return predicate
+
+
+def _field_value(obj, name):
+    # "post_analytics__views" -> obj.post_analytics.views (relacion ya cargada con select_related)
+    for attribute in name.split("__"):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
@@ -0,0 +1,243 @@
+"""
+Particiones mensuales de las tablas de eventos (PostInteraction y PostView).
+
+En PostgreSQL las tablas se convierten una sola vez, con la migracion
+0009_partition_event_tables (o el comando partition_event_tables, que hace lo
+mismo fuera de las migraciones), en tablas particionadas por rango de
+`timestamp`: una particion por mes (`blog_postinteraction_p202610`) y una por
+defecto para las filas fuera de rango. Las consultas que filtran por fecha solo leen las
+particiones de ese rango y descartar los eventos viejos es separar una particion
+(DETACH) en lugar de un DELETE masivo que llena la tabla de filas muertas.
+
+La tarea maintain_event_partitions crea por adelantado las particiones de los
+proximos meses y separa las que quedan fuera del periodo de retencion. Las
+particiones separadas quedan como tablas sueltas, listas para archivarlas
+(pg_dump) y borrarlas, o se borran directamente con BLOG_EVENTS_DROP_DETACHED.
+
+Toda restriccion unica de una tabla particionada debe incluir la columna de
+particion, asi que la clave primaria pasa a ser (id, timestamp) y las tablas
+dejan de tener restricciones unicas: la ingesta de vistas ya descarta los
+visitantes repetidos (HyperLogLog o consulta previa a PostView).
+"""
+import logging
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Meses futuros con particion creada de antemano
+MONTHS_AHEAD = getattr(settings, "BLOG_EVENTS_PARTITION_MONTHS_AHEAD", 3)
+# Meses completos de eventos que se conservan, ademas del mes actual
+RETENTION_MONTHS = getattr(settings, "BLOG_EVENTS_RETENTION_MONTHS", 13)
+DROP_DETACHED = getattr(settings, "BLOG_EVENTS_DROP_DETACHED", False)
+
+PARTITION_COLUMN = "timestamp"
+PARTITION_NAME_RE = re.compile(r"_p(\d{4})(\d{2})$")
+
+
+def is_supported():
+    return connection.vendor == "postgresql"
+
+
+def month_start(value):
+    """
+    Primer dia del mes (UTC) de una fecha o datetime.
+    """
+    if isinstance(value, datetime):
+        value = value.astimezone(dt_timezone.utc)
+    return date(value.year, value.month, 1)
+
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def _bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT 1 FROM pg_partitioned_table
+            JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+            WHERE pg_class.relname = %s AND pg_table_is_visible(pg_class.oid)
+            """,
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(table):
+    """
+    Particiones mensuales adjuntas a la tabla: {primer dia del mes: nombre}.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)
+            """,
+            [table],
+        )
+        names = [name for name, in cursor.fetchall()]
+
+    months = {}
+    for name in names:
+        match = PARTITION_NAME_RE.search(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def _create_partition(editor, table, month):
+    editor.execute(
+        f"CREATE TABLE IF NOT EXISTS {_quote(partition_name(table, month))} PARTITION OF {_quote(table)} "
+        f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+    )
+
+
+def _create_keys(editor, model):
+    """
+    Clave primaria, claves foraneas e indices de la tabla particionada. Los
+    indices de la tabla padre se crean en cada particion.
+    """
+    table = model._meta.db_table
+    editor.execute(
+        f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(f'{table}_pkey')} "
+        f"PRIMARY KEY ({_quote(model._meta.pk.column)}, {_quote(PARTITION_COLUMN)})"
+    )
+    # Columnas que ya encabezan un indice compuesto del modelo
+    leading_columns = {model._meta.get_field(index.fields[0].lstrip("-")).column for index in model._meta.indexes}
+    for field in model._meta.concrete_fields:
+        if not field.is_relation:
+            continue
+        target = field.target_field
+        editor.execute(
+            f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(f'{table}_{field.column}_fk')} "
+            f"FOREIGN KEY ({_quote(field.column)}) "
+            f"REFERENCES {_quote(target.model._meta.db_table)} ({_quote(target.column)}) "
+            f"DEFERRABLE INITIALLY DEFERRED"
+        )
+        if field.db_index and field.column not in leading_columns:
+            editor.execute(
+                f"CREATE INDEX {_quote(f'{table}_{field.column}_idx')} ON {_quote(table)} ({_quote(field.column)})"
+            )
+    for index in model._meta.indexes:
+        editor.execute(index.create_sql(model, editor))
+
+
+def _drop_foreign_keys(editor, table):
+    """
+    Quita las claves foraneas de una particion separada: sus filas archivadas no
+    deben impedir borrar los posts o usuarios a los que apuntan.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [_quote(table)],
+        )
+        constraints = [name for name, in cursor.fetchall()]
+    for name in constraints:
+        editor.execute(f"ALTER TABLE {_quote(table)} DROP CONSTRAINT {_quote(name)}")
+
+
+def convert(model, months_ahead=MONTHS_AHEAD, now=None):
+    """
+    Convierte la tabla del modelo en una tabla particionada por mes y copia sus
+    filas, todo en una transaccion. Devuelve el numero de particiones mensuales.
+
+    La copia bloquea la tabla mientras dura: conviene hacerla con la ingesta de
+    eventos detenida.
+    """
+    table = model._meta.db_table
+    legacy = f"{table}_unpartitioned"
+    now = now or timezone.now()
+
+    with connection.schema_editor() as editor:
+        editor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(legacy)}")
+        editor.execute(
+            f"CREATE TABLE {_quote(table)} (LIKE {_quote(legacy)} INCLUDING DEFAULTS) "
+            f"PARTITION BY RANGE ({_quote(PARTITION_COLUMN)})"
+        )
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MIN({_quote(PARTITION_COLUMN)}) FROM {_quote(legacy)}")
+            oldest = cursor.fetchone()[0]
+
+        month = month_start(oldest or now)
+        last = add_months(month_start(now), months_ahead)
+        created = 0
+        while month <= last:
+            _create_partition(editor, table, month)
+            created += 1
+            month = add_months(month, 1)
+        editor.execute(f"CREATE TABLE {_quote(f'{table}_default')} PARTITION OF {_quote(table)} DEFAULT")
+
+        editor.execute(f"INSERT INTO {_quote(table)} SELECT * FROM {_quote(legacy)}")
+        editor.execute(f"DROP TABLE {_quote(legacy)}")
+        # Las claves e indices se crean despues de copiar: es mas rapido que mantenerlos fila a fila
+        _create_keys(editor, model)
+
+    return created
+
+
+def maintain(model, now=None, months_ahead=MONTHS_AHEAD, retention_months=RETENTION_MONTHS, drop_detached=DROP_DETACHED):
+    """
+    Crea las particiones del mes actual y de los proximos `months_ahead` meses y
+    separa las anteriores al periodo de retencion.
+
+    Devuelve ([particiones creadas], [particiones separadas]).
+    """
+    table = model._meta.db_table
+    if not is_partitioned(table):
+        logger.warning(f"{table} is not partitioned, run the blog migrations first")
+        return [], []
+
+    current = month_start(now or timezone.now())
+    existing = partitions(table)
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month in existing:
+            continue
+        try:
+            with connection.schema_editor() as editor:
+                _create_partition(editor, table, month)
+        except DatabaseError as e:
+            # La particion por defecto ya tiene filas de ese mes
+            logger.error(f"Could not create partition {partition_name(table, month)}: {str(e)}")
+            continue
+        created.append(partition_name(table, month))
+
+    cutoff = add_months(current, -retention_months)
+    detached = []
+    for month, name in sorted(existing.items()):
+        if month >= cutoff:
+            continue
+        with connection.schema_editor() as editor:
+            editor.execute(f"ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(name)}")
+            if drop_detached:
+                editor.execute(f"DROP TABLE {_quote(name)}")
+            else:
+                _drop_foreign_keys(editor, name)
+        detached.append(name)
+
+    return created, detached
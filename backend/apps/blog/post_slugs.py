@@ -0,0 +1,161 @@
+"""
+Mapas slug -> id en Redis, para los endpoints de alto volumen (beacons y lotes
+de eventos del cliente) que reciben slugs y no deben consultar la base de datos
+por cada peticion.
+
+Cada entrada del hash `post_slugs` guarda "<post_id>:<category_id>" de un post
+publicado, y cada entrada de `category_slugs` el id de una categoria. Los slugs
+que faltan se buscan en la base de datos en una sola consulta y se agregan al
+mapa. Los slugs que tampoco estan en la base de datos se anotan por un rato
+en `<mapa>:missing` (sorted set con el vencimiento como puntaje), asi los lotes
+con slugs inventados no consultan la base de datos en cada peticion. Al guardar
+o borrar un post o una categoria su entrada se borra de ambos, y se vuelve a
+cargar la proxima vez que se pide.
+"""
+import logging
+import time
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+SLUGS_KEY = "post_slugs"
+CATEGORY_SLUGS_KEY = "category_slugs"
+
+# Segundos que un slug desconocido se da por inexistente sin consultar la base de datos
+MISSING_TIMEOUT = getattr(settings, "BLOG_SLUG_MISSING_TIMEOUT", 60)
+
+
+def _missing_key(key):
+    return f"{key}:missing"
+
+
+def _entry(post_id, category_id):
+    return f"{post_id}:{category_id or ''}"
+
+
+def _parse(entry):
+    post_id, category_id = entry.decode().split(":", 1)
+    return post_id, category_id or None
+
+
+def _cached(key, slugs):
+    """
+    Entradas guardadas de los slugs y slugs que se sabe que no existen, en un solo
+    viaje a Redis.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hmget(key, slugs)
+    pipe.zmscore(_missing_key(key), slugs)
+    try:
+        entries, expirations = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not read slug map {key}: {str(e)}")
+        return {}, set()
+    now = time.time()
+    cached = {slug: entry for slug, entry in zip(slugs, entries) if entry is not None}
+    missing = {
+        slug for slug, expires_at in zip(slugs, expirations)
+        if expires_at is not None and expires_at > now
+    }
+    return cached, missing
+
+
+def _store(key, entries, missing):
+    if not entries and not missing:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    if entries:
+        pipe.hset(key, mapping=entries)
+    if missing:
+        now = time.time()
+        pipe.zremrangebyscore(_missing_key(key), "-inf", now)
+        pipe.zadd(_missing_key(key), dict.fromkeys(missing, now + MISSING_TIMEOUT))
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not update slug map {key}: {str(e)}")
+
+
+def _forget(key, slugs):
+    slugs = [slug for slug in slugs if slug]
+    if not slugs:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hdel(key, *slugs)
+    pipe.zrem(_missing_key(key), *slugs)
+    try:
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error(f"Could not remove slugs from slug map {key}: {str(e)}")
+
+
+def _resolve(key, slugs, parse, lookup):
+    slugs = list(dict.fromkeys(slugs))
+    if not slugs:
+        return {}
+
+    cached, known_missing = _cached(key, slugs)
+    resolved = {slug: parse(entry) for slug, entry in cached.items()}
+    missing = [slug for slug in slugs if slug not in resolved and slug not in known_missing]
+    if not missing:
+        return resolved
+
+    found = lookup(missing)
+    _store(
+        key,
+        {slug: entry for slug, (_, entry) in found.items()},
+        [slug for slug in missing if slug not in found],
+    )
+    resolved.update({slug: value for slug, (value, _) in found.items()})
+    return resolved
+
+
+def resolve(slugs):
+    """
+    Posts publicados de varios slugs: {slug: (post_id, category_id)}. Los slugs
+    que no son de un post publicado no aparecen en el resultado.
+    """
+    from .models import Post
+
+    def lookup(missing):
+        return {
+            slug: ((str(post_id), str(category_id) if category_id else None), _entry(post_id, category_id))
+            for slug, post_id, category_id in Post.postobjects.filter(slug__in=missing).values_list(
+                "slug", "id", "category_id"
+            )
+        }
+
+    return _resolve(SLUGS_KEY, slugs, _parse, lookup)
+
+
+def resolve_categories(slugs):
+    """
+    Ids de las categorias de varios slugs: {slug: category_id}.
+    """
+    from .models import Category
+
+    def lookup(missing):
+        return {
+            slug: (str(category_id), str(category_id))
+            for slug, category_id in Category.objects.filter(slug__in=missing).values_list("slug", "id")
+        }
+
+    return _resolve(CATEGORY_SLUGS_KEY, slugs, bytes.decode, lookup)
+
+
+def forget(*slugs):
+    """
+    Quita slugs de posts del mapa (post guardado o borrado).
+    """
+    _forget(SLUGS_KEY, slugs)
+
+
+def forget_categories(*slugs):
+    """
+    Quita slugs de categorias del mapa (categoria guardada o borrada).
+    """
+    _forget(CATEGORY_SLUGS_KEY, slugs)
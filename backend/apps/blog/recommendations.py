@@ -0,0 +1,166 @@
+"""
+Posts relacionados por filtrado colaborativo item-item.
+
+La tarea build_related_posts recorre PostInteraction en lotes (`iterator`), arma
+una matriz dispersa usuario x post con el peso de cada interaccion y calcula la
+similitud coseno entre posts por bloques de columnas, de modo que la memoria
+depende del numero de interacciones distintas y del tamano del bloque, no del
+cuadrado del numero de posts. Los K vecinos de cada post se guardan en Redis,
+`related_posts:<id>`, asi servirlos es un solo GET.
+"""
+import logging
+
+import msgpack
+import numpy as np
+import redis
+from django.conf import settings
+from scipy import sparse
+
+from . import trending, unique_views
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+TOP_K = 12
+READ_CHUNK_SIZE = 50000
+# Columnas de la matriz de similitud que se calculan a la vez
+BLOCK_SIZE = 512
+# Los vecinos se recalculan cada dia; si la tarea deja de correr expiran
+RELATED_TIMEOUT = 60 * 60 * 24 * 3
+
+
+def _related_key(post_id):
+    return f"related_posts:{post_id}"
+
+
+class _Index(dict):
+    """
+    Asigna a cada clave nueva el siguiente indice de fila o columna.
+    """
+
+    def __missing__(self, key):
+        index = self[key] = len(self)
+        return index
+
+
+def interaction_matrix(interactions, chunk_size=READ_CHUNK_SIZE):
+    """
+    Matriz dispersa usuario x post a partir de filas
+    (user_id, ip_address, post_id, interaction_type, weight).
+
+    Las filas se acumulan en lotes de `chunk_size` que se pasan a arreglos de
+    numpy, asi nunca hay mas de un lote de interacciones sueltas (objetos de
+    Python) en memoria. La matriz se arma una sola vez al final, sumando las
+    interacciones repetidas. Devuelve (matriz, [post_id por columna]).
+    """
+    users = _Index()
+    posts = _Index()
+
+    rows, cols, values = [], [], []
+    chunks = []
+
+    def flush():
+        if not rows:
+            return
+        chunks.append((
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(cols, dtype=np.int64),
+            np.asarray(values, dtype=np.float64),
+        ))
+        rows.clear()
+        cols.clear()
+        values.clear()
+
+    for user_id, ip_address, post_id, interaction_type, weight in interactions:
+        score = trending.interaction_score(interaction_type, weight)
+        if not score:
+            continue
+        rows.append(users[unique_views.visitor_id(user_id, ip_address)])
+        cols.append(posts[post_id])
+        values.append(score)
+        if len(rows) >= chunk_size:
+            flush()
+    flush()
+
+    shape = (len(users), len(posts))
+    if chunks:
+        row_indices, col_indices, data = (np.concatenate(arrays) for arrays in zip(*chunks))
+    else:
+        row_indices = col_indices = np.array([], dtype=np.int64)
+        data = np.array([], dtype=np.float64)
+    matrix = sparse.coo_matrix((data, (row_indices, col_indices)), shape=shape).tocsr()
+
+    post_ids = [None] * len(posts)
+    for post_id, index in posts.items():
+        post_ids[index] = post_id
+    return matrix, post_ids
+
+
+def top_neighbours(matrix, top_k=TOP_K, block_size=BLOCK_SIZE):
+    """
+    Los `top_k` posts mas similares (coseno) a cada columna de la matriz.
+
+    Devuelve, por columna, (indices, similitudes) de mayor a menor similitud.
+    """
+    # Amortiguar usuarios con muchas interacciones repetidas sobre el mismo post
+    matrix = matrix.tocsc(copy=True)
+    matrix.data = np.log1p(matrix.data)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1.0
+    normalized = (matrix @ sparse.diags(1.0 / norms)).tocsc()
+    transposed = normalized.T.tocsr()
+
+    n_posts = normalized.shape[1]
+    neighbours = []
+    for start in range(0, n_posts, block_size):
+        stop = min(start + block_size, n_posts)
+        # Similitudes de todos los posts con las columnas del bloque
+        block = (transposed @ normalized[:, start:stop]).tocsc()
+        for offset in range(stop - start):
+            column = start + offset
+            begin, end = block.indptr[offset], block.indptr[offset + 1]
+            indices = block.indices[begin:end]
+            scores = block.data[begin:end]
+
+            keep = indices != column
+            indices, scores = indices[keep], scores[keep]
+            if len(scores) > top_k:
+                best = np.argpartition(-scores, top_k)[:top_k]
+                indices, scores = indices[best], scores[best]
+            order = np.argsort(-scores, kind="stable")
+            neighbours.append((indices[order], scores[order]))
+    return neighbours
+
+
+def store(post_ids, neighbours):
+    """
+    Guarda los vecinos de cada post en Redis en lotes pipelined.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    stored = 0
+    for post_id, (indices, scores) in zip(post_ids, neighbours):
+        if not len(indices):
+            continue
+        related = [[str(post_ids[index]), round(float(score), 4)] for index, score in zip(indices, scores)]
+        pipe.set(_related_key(post_id), msgpack.packb(related), ex=RELATED_TIMEOUT)
+        stored += 1
+        if stored % 1000 == 0:
+            pipe.execute()
+    pipe.execute()
+    return stored
+
+
+def related_post_ids(post_id):
+    """
+    Ids de los posts relacionados, de mayor a menor similitud.
+    """
+    try:
+        blob = redis_client.get(_related_key(post_id))
+    except redis.RedisError as e:
+        logger.warning(f"Could not read related posts for {post_id}: {str(e)}")
+        return []
+    if blob is None:
+        return []
+    return [related_id for related_id, _ in msgpack.unpackb(blob)]
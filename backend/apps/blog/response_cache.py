@@ -0,0 +1,134 @@
+"""
+Cache de respuestas de los listados del blog.
+
+Se guarda el JSON ya renderizado de cada pagina, no el queryset, de modo que un
+acierto cuesta un solo GET a Redis y ningun trabajo del ORM ni de los serializers.
+La clave se construye con los parametros de la peticion normalizados, y el valor
+es un sobre msgpack con las generaciones de las etiquetas de las que depende la
+pagina (ver cache_tags), los ids de la pagina (para registrar impresiones) y el
+cuerpo JSON comprimido con zlib.
+"""
+import hashlib
+import logging
+import zlib
+
+import msgpack
+import redis
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+from core import metrics
+from . import cache_tags
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+POST_LIST = "post_list"
+CATEGORY_LIST = "category_list"
+CATEGORY_POSTS = "category_posts"
+
+# Parametros de la peticion que cambian la respuesta de cada listado.
+# Cualquier otro parametro se ignora para que no fragmente el cache.
+FAMILY_PARAMS = {
+    POST_LIST: ("search", "sorting", "ordering", "author", "is_featured", "categories", "p", "cursor", "page_size"),
+    CATEGORY_LIST: ("parent_slug", "descendants", "ordering", "sorting", "search", "p", "page_size"),
+    CATEGORY_POSTS: ("slug", "sorting", "p", "cursor", "page_size"),
+}
+
+RESPONSE_CACHE_TIMEOUT = getattr(settings, "BLOG_RESPONSE_CACHE_TIMEOUT", 60 * 5)
+COMPRESSION_LEVEL = 6
+ENVELOPE_VERSION = 2
+
+
+def _normalize_params(family, request):
+    """
+    Devuelve los parametros relevantes del listado ordenados y sin valores vacios,
+    de modo que `?a=1&b=2` y `?b=2&a=1` compartan clave.
+    """
+    params = []
+    for name in FAMILY_PARAMS[family]:
+        raw_values = request.query_params.getlist(name)
+        values = sorted({value.strip() for value in raw_values if value.strip()})
+        if name == "p" and values == ["1"] and "cursor" not in FAMILY_PARAMS[family]:
+            # La primera pagina es la misma con o sin `p`; en los listados por cursor
+            # `?p=1` pide la paginacion por numero, distinta de la de por defecto
+            continue
+        if values:
+            params.append((name, values))
+    return params
+
+
+def cache_key(family, request):
+    """
+    Clave de cache de la pagina pedida. Incluye el host porque los enlaces
+    `next` y `previous` de la respuesta son absolutos.
+    """
+    normalized = repr((request.get_host(), _normalize_params(family, request)))
+    digest = hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+    return f"response_cache:{family}:{digest}"
+
+
+def fetch(family, request):
+    """
+    Busca la pagina en el cache: un GET y un MGET para validar sus etiquetas.
+
+    Devuelve `(response, object_ids)` o None si no esta en cache o se invalido.
+    """
+    cached = _fetch(family, request)
+    metrics.record_cache_lookup(family, cached is not None)
+    return cached
+
+
+def _fetch(family, request):
+    try:
+        blob = redis_client.get(cache_key(family, request))
+    except redis.RedisError as e:
+        logger.warning(f"Could not read {family} response cache: {str(e)}")
+        return None
+
+    if blob is None:
+        return None
+
+    try:
+        version, snapshot, object_ids, body = msgpack.unpackb(blob)
+        if version != ENVELOPE_VERSION:
+            return None
+        body = zlib.decompress(body)
+    except (ValueError, TypeError, zlib.error, msgpack.UnpackException) as e:
+        logger.warning(f"Discarding corrupt {family} response cache entry: {str(e)}")
+        return None
+
+    if not cache_tags.is_current(snapshot):
+        return None
+
+    return HttpResponse(body, content_type="application/json"), object_ids
+
+
+def store(family, request, response, dependencies):
+    """
+    Guarda la pagina de una respuesta paginada exitosa junto con las generaciones
+    de las etiquetas de `dependencies`.
+    """
+    data = getattr(response, "data", None)
+    if response.status_code != 200 or not isinstance(data, dict):
+        return
+
+    snapshot = dependencies.snapshot()
+    if snapshot is None:
+        return
+
+    results = data.get("results")
+    if not isinstance(results, list):
+        return
+
+    object_ids = [str(item["id"]) for item in results if isinstance(item, dict) and item.get("id")]
+    body = zlib.compress(JSONRenderer().render(data), COMPRESSION_LEVEL)
+    blob = msgpack.packb([ENVELOPE_VERSION, snapshot, object_ids, body])
+
+    try:
+        redis_client.set(cache_key(family, request), blob, ex=RESPONSE_CACHE_TIMEOUT)
+    except redis.RedisError as e:
+        logger.warning(f"Could not store {family} response cache: {str(e)}")
+
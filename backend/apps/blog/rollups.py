@@ -0,0 +1,240 @@
+"""
+Conteos de interacciones por post consolidados por hora y por dia.
+
+La tarea rollup_post_stats agrupa los eventos recientes de PostInteraction por
+post y hora en PostHourlyRollup, y suma las horas de cada dia tocado en
+PostDailyRollup. Los conteos de cada autor (AuthorHourlyRollup /
+AuthorDailyRollup) se suman de los de sus posts en la misma pasada, asi la serie
+de un autor lee una fila por periodo sin importar cuantos posts tenga. Los conteos se recalculan desde los eventos y se sobrescriben
+(no se suman), asi la tarea se puede repetir o solapar sin contar dos veces.
+Los tableros leen estas tablas, pequenas y con un indice por post y fecha, en
+lugar de recorrer los eventos, que ademas se descartan pasado el periodo de
+retencion de sus particiones.
+
+time_series arma las series de tiempo por hora, dia o semana de un post o de
+todos los posts de un autor con una consulta sobre estas tablas.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import TruncDate, TruncHour, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import trending
+from .models import (
+    AuthorDailyRollup,
+    AuthorHourlyRollup,
+    Post,
+    PostDailyRollup,
+    PostHourlyRollup,
+    PostInteraction,
+)
+
+# Dias que se conservan los conteos por hora; los diarios no se borran
+HOURLY_RETENTION_DAYS = getattr(settings, "BLOG_HOURLY_ROLLUP_RETENTION_DAYS", 90)
+
+# Campo de la tabla de conteos de cada tipo de interaccion
+COUNT_FIELDS = {
+    "view": "views",
+    "like": "likes",
+    "comment": "comments",
+    "share": "shares",
+}
+ROLLUP_FIELDS = [*COUNT_FIELDS.values(), "score"]
+
+BATCH_SIZE = 1000
+
+# Intervalos de las series: (paso, dias del rango por defecto, maximo de puntos)
+INTERVALS = {
+    "hour": (timedelta(hours=1), 2, 24 * 31),
+    "day": (timedelta(days=1), 30, 366),
+    "week": (timedelta(weeks=1), 7 * 12, 104),
+}
+
+
+def _score_expression():
+    """
+    Puntaje de las interacciones con los pesos del ranking de tendencias.
+    """
+    return Sum(
+        Case(
+            *[
+                When(interaction_type=interaction_type, then=F("weight") * Value(weight))
+                for interaction_type, weight in trending.INTERACTION_WEIGHTS.items()
+            ],
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    )
+
+
+def _upsert(model, owner_field, bucket_field, rows):
+    model.objects.bulk_create(
+        [model(**row) for row in rows],
+        update_conflicts=True,
+        unique_fields=[owner_field, bucket_field],
+        update_fields=ROLLUP_FIELDS,
+        batch_size=BATCH_SIZE,
+    )
+    return len(rows)
+
+
+def _author_rows(rows, bucket_field):
+    """
+    Suma las filas por post de cada periodo en filas por autor.
+    """
+    authors = dict(
+        Post.objects.filter(id__in={row["post_id"] for row in rows}).values_list("id", "user_id")
+    )
+    totals = defaultdict(lambda: dict.fromkeys(ROLLUP_FIELDS, 0))
+    for row in rows:
+        user_id = authors.get(row["post_id"])
+        if user_id is None:
+            continue
+        total = totals[(user_id, row[bucket_field])]
+        for field in ROLLUP_FIELDS:
+            total[field] += row[field] or 0
+    return [
+        {"user_id": user_id, bucket_field: bucket, **total}
+        for (user_id, bucket), total in totals.items()
+    ]
+
+
+def _store(bucket_field, post_model, author_model, rows):
+    _upsert(post_model, "post", bucket_field, rows)
+    _upsert(author_model, "user", bucket_field, _author_rows(rows, bucket_field))
+    return len(rows)
+
+
+def rollup_hours(since):
+    """
+    Recalcula los conteos por hora de los posts y de sus autores desde la hora
+    que contiene `since`. Devuelve el numero de filas (post, hora) guardadas.
+    """
+    since = since.replace(minute=0, second=0, microsecond=0)
+    rows = list(
+        PostInteraction.objects.filter(timestamp__gte=since)
+        .annotate(hour=TruncHour("timestamp"))
+        .values("post_id", "hour")
+        .annotate(
+            **{
+                field: Count("id", filter=Q(interaction_type=interaction_type))
+                for interaction_type, field in COUNT_FIELDS.items()
+            },
+            score=_score_expression(),
+        )
+        .order_by()
+    )
+    return _store("hour", PostHourlyRollup, AuthorHourlyRollup, rows)
+
+
+def rollup_days(since):
+    """
+    Recalcula los conteos diarios, a partir de los conteos por hora, desde el dia
+    (en la zona horaria del sitio) que contiene `since`.
+    """
+    rows = list(
+        PostHourlyRollup.objects.filter(hour__gte=_day_start(timezone.localtime(since).date()))
+        .annotate(date=TruncDate("hour"))
+        .values("post_id", "date")
+        .annotate(**{field: Sum(field) for field in ROLLUP_FIELDS})
+        .order_by()
+    )
+    return _store("date", PostDailyRollup, AuthorDailyRollup, rows)
+
+
+def prune_hours(now=None, retention_days=HOURLY_RETENTION_DAYS):
+    """
+    Borra los conteos por hora mas viejos que el periodo de retencion.
+    """
+    cutoff = (now or timezone.now()) - timedelta(days=retention_days)
+    deleted, _ = PostHourlyRollup.objects.filter(hour__lt=cutoff).delete()
+    AuthorHourlyRollup.objects.filter(hour__lt=cutoff).delete()
+    return deleted
+
+
+def _parse_day(value):
+    day = parse_date(value)
+    if day is None:
+        raise ValueError("Dates must use the YYYY-MM-DD format")
+    return day
+
+
+def parse_range(interval, start=None, end=None):
+    """
+    Rango de fechas (inclusive) de una serie a partir de los parametros
+    `start` / `end` (YYYY-MM-DD). Por defecto termina hoy.
+    """
+    _, default_days, max_points = INTERVALS[interval]
+    end = _parse_day(end) if end else timezone.localdate()
+    start = _parse_day(start) if start else end - timedelta(days=default_days - 1)
+    if start > end:
+        raise ValueError("start must not be after end")
+    if interval == "week":
+        # Las semanas empiezan el lunes, como TruncWeek
+        start -= timedelta(days=start.weekday())
+    if len(_buckets(interval, start, end)) > max_points:
+        raise ValueError(f"The range can't have more than {max_points} {interval} points")
+    return start, end
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def _buckets(interval, start, end):
+    """
+    Inicio de cada punto de la serie: datetimes (UTC) por hora, fechas por dia o semana.
+    """
+    step = INTERVALS[interval][0]
+    if interval == "hour":
+        bucket, stop = _day_start(start), _day_start(end + timedelta(days=1))
+        bucket, stop = bucket.astimezone(dt_timezone.utc), stop.astimezone(dt_timezone.utc)
+    else:
+        bucket, stop = start, end + timedelta(days=1)
+    buckets = []
+    while bucket < stop:
+        buckets.append(bucket)
+        bucket += step
+    return buckets
+
+
+def time_series(interval, start, end, post=None, user=None):
+    """
+    Serie de conteos de un post o de todos los posts de un autor (`user`), con un
+    punto por cada hora, dia o semana del rango, incluidos los que no tienen
+    interacciones.
+    """
+    hourly_model, daily_model = (PostHourlyRollup, PostDailyRollup) if post else (AuthorHourlyRollup, AuthorDailyRollup)
+    owner = {"post": post} if post else {"user": user}
+
+    if interval == "hour":
+        rows = hourly_model.objects.filter(
+            hour__gte=_day_start(start), hour__lt=_day_start(end + timedelta(days=1)), **owner
+        ).annotate(bucket=F("hour"))
+    else:
+        rows = daily_model.objects.filter(date__gte=start, date__lte=end, **owner).annotate(
+            bucket=TruncWeek("date") if interval == "week" else F("date")
+        )
+
+    counts = {
+        row.pop("bucket"): row
+        for row in rows.values("bucket").annotate(**{field: Sum(field) for field in ROLLUP_FIELDS}).order_by()
+    }
+    if interval == "hour":
+        counts = {bucket.astimezone(dt_timezone.utc): row for bucket, row in counts.items()}
+    elif interval == "week":
+        counts = {bucket.date() if isinstance(bucket, datetime) else bucket: row for bucket, row in counts.items()}
+
+    series = []
+    for bucket in _buckets(interval, start, end):
+        row = counts.get(bucket, {})
+        series.append({
+            "bucket": timezone.localtime(bucket).isoformat() if interval == "hour" else bucket.isoformat(),
+            **{field: row.get(field) or 0 for field in COUNT_FIELDS.values()},
+            "score": round(row.get("score") or 0, 2),
+        })
+    return series
@@ -0,0 +1,108 @@
+"""
+Busqueda de texto completo de posts.
+
+Cada post guarda un `search_vector` ponderado (titulo A, keywords B, descripcion C,
+contenido D) indexado con GIN, que se actualiza al guardar el post. La busqueda
+ordena por SearchRank; si no devuelve nada (p. ej. por una errata), la vista pagina
+en su lugar `similar_posts`, la similitud por trigramas del titulo y las keywords.
+Los resultados incluyen un fragmento de la descripcion con los terminos resaltados.
+
+En bases de datos que no son PostgreSQL se mantiene la busqueda con icontains.
+"""
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchHeadline,
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connection
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Greatest
+
+SEARCH_CONFIG = getattr(settings, "BLOG_SEARCH_CONFIG", "english")
+
+# Campos que forman el vector de busqueda; si cambia alguno hay que recalcularlo
+SEARCH_FIELDS = ("title", "keywords", "description", "content")
+
+# Orden de los resultados de una busqueda cuando no se pide otro `sorting`
+SEARCH_ORDERING = ("-search_rank", "-id")
+
+
+def is_supported():
+    return connection.vendor == "postgresql"
+
+
+def search_vector():
+    """
+    Expresion del vector de busqueda ponderado de un post.
+    """
+    return (
+        SearchVector("title", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("keywords", weight="B", config=SEARCH_CONFIG)
+        + SearchVector("description", weight="C", config=SEARCH_CONFIG)
+        + SearchVector("content", weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """
+    Recalcula el vector de busqueda de los posts del queryset con un solo UPDATE.
+    """
+    if is_supported():
+        return queryset.update(search_vector=search_vector())
+    return 0
+
+
+def search_posts(queryset, text):
+    """
+    Filtra `queryset` por `text` y anota `search_rank` (relevancia) y
+    `search_headline` (descripcion con los terminos resaltados).
+    """
+    if not is_supported():
+        return queryset.filter(
+            Q(title__icontains=text) |
+            Q(description__icontains=text) |
+            Q(content__icontains=text) |
+            Q(keywords__icontains=text) |
+            Q(category__name__icontains=text)
+        ).annotate(
+            search_rank=Value(0.0, output_field=FloatField()),
+            search_headline=F("description"),
+        )
+
+    query = _query(text)
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F("search_vector"), query),
+        search_headline=_headline(query),
+    )
+
+
+def similar_posts(queryset, text):
+    """
+    Respaldo de una busqueda sin resultados: posts de `queryset` con el titulo o
+    las keywords parecidos a `text` (erratas), con las mismas anotaciones que
+    `search_posts`. Solo en PostgreSQL.
+    """
+    return queryset.filter(
+        Q(title__trigram_similar=text) | Q(keywords__trigram_similar=text)
+    ).annotate(
+        search_rank=Greatest(TrigramSimilarity("title", text), TrigramSimilarity("keywords", text)),
+        search_headline=_headline(_query(text)),
+    )
+
+
+def _query(text):
+    return SearchQuery(text, search_type="websearch", config=SEARCH_CONFIG)
+
+
+def _headline(query):
+    return SearchHeadline(
+        "description",
+        query,
+        config=SEARCH_CONFIG,
+        start_sel="<mark>",
+        stop_sel="</mark>",
+        max_fragments=2,
+    )
@@ -1,5 +1,9 @@
+from django.db import models
+from django.db.models import Exists, F, Func, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 
+from . import counters
 from .models import (
     Post, 
     Category, 
@@ -12,9 +16,32 @@ from .models import (
     CategoryAnalytics,
     PostAnalytics
 )
-from apps.media.serializers import MediaSerializer
+from apps.media.serializers import MediaSerializer, SignedMediaListSerializer
 from apps.authentication.serializers import UserPublicSerializer
 
+class PendingCountersListSerializer(SignedMediaListSerializer):
+    """
+    Ademas de firmar los medios, obtiene en una sola llamada a Redis los incrementos
+    de analiticas pendientes de todos los posts de la lista.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context.setdefault("pending_counters", {}).update(
+            counters.get_pending(counters.POST, [item.id for item in items])
+        )
+        return super().to_representation(items)
+
+
+def get_pending_counters(serializer, obj):
+    """
+    Incrementos pendientes del post: los precargados por la lista o una consulta individual.
+    """
+    if "pending_counters" in serializer.context:
+        return serializer.context["pending_counters"]
+    return counters.get_pending(counters.POST, [obj.id])
+
+
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
@@ -23,13 +50,30 @@ class CategorySerializer(serializers.ModelSerializer):
 
 class CategoryListSerializer(serializers.ModelSerializer):
     thumbnail = MediaSerializer()
+
+    # Medios firmados en bloque por SignedMediaListSerializer
+    media_fields = ("thumbnail",)
+
     class Meta:
         model = Category
         fields = [
+            'id',
             'name',
             'slug',
-            'thumbnail'
+            'thumbnail',
+            'parent',
+            'depth',
+            'post_count',
+            'subtree_post_count',
         ]
+        list_serializer_class = SignedMediaListSerializer
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Plan de consultas para serializar una lista de categorias sin N+1.
+        """
+        return queryset.select_related("thumbnail")
 
 
 class CategoryAnalyticsSerializer(serializers.ModelSerializer):
@@ -45,6 +89,9 @@ class CategoryAnalyticsSerializer(serializers.ModelSerializer):
             "clicks",
             "click_through_rate",
             "avg_time_on_page",
+            "subtree_views",
+            "subtree_clicks",
+            "subtree_post_views",
         ]
 
     def get_category_name(self, obj):
@@ -69,6 +116,15 @@ class PostViewSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+def _count_subquery(queryset):
+    """
+    Conteo de `queryset` (filtrado por OuterRef("pk")) como subconsulta escalar.
+    COUNT va como Func y no como agregado para que Django no agregue GROUP BY.
+    """
+    counts = queryset.order_by().annotate(total=Func(F("pk"), function="COUNT")).values("total")
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
 class PostSerializer(serializers.ModelSerializer):
     category = CategorySerializer()
     headings = HeadingSerializer(many=True)
@@ -82,20 +138,58 @@ class PostSerializer(serializers.ModelSerializer):
     class Meta:
         model = Post
         fields = "__all__"
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        """
+        Plan de consultas para serializar posts en una sola consulta: relaciones con
+        select_related, conteos de comentarios y likes como subconsultas
+        correlacionadas, y `has_liked` como subconsulta Exists cuando se indica la
+        peticion del usuario.
+
+        Cada conteo va en su propia subconsulta: con dos JOIN a comentarios y likes
+        en la misma consulta las filas se multiplicarian entre si (comentarios x
+        likes) y habria que agrupar por todas las columnas del post.
+        """
+        queryset = queryset.select_related(
+            "category", "thumbnail", "user", "post_analytics"
+        ).prefetch_related("headings").annotate(
+            comments_total=_count_subquery(
+                Comment.objects.filter(post=OuterRef("pk"), parent=None, is_active=True)
+            ),
+            likes_total=_count_subquery(PostLike.objects.filter(post=OuterRef("pk"))),
+        )
+
+        if request is not None:
+            user = request.user
+            if user and user.is_authenticated:
+                liked = Exists(PostLike.objects.filter(post=OuterRef("pk"), user=user))
+            else:
+                liked = Value(False)
+            queryset = queryset.annotate(user_has_liked=liked)
+        return queryset
     
     def get_view_count(self, obj):
-        return obj.post_analytics.views if obj.post_analytics else 0
+        views = obj.post_analytics.views if obj.post_analytics else 0
+        return views + counters.get_pending_metric(get_pending_counters(self, obj), obj.id, "views")
     
     def get_comments_count(self, obj):
+        if hasattr(obj, "comments_total"):
+            return obj.comments_total
         return obj.post_comments.filter(parent=None, is_active=True).count()
     
     def get_likes_count(self, obj):
+        if hasattr(obj, "likes_total"):
+            return obj.likes_total
         return obj.likes.filter().count()
     
     def get_has_liked(self, obj):
         """
         Verifica si el usuario autenticado ha dado 'like' al post.
         """
+        if hasattr(obj, "user_has_liked"):
+            return obj.user_has_liked
+
         user = self.context.get('request').user
         if user and user.is_authenticated:
             return PostLike.objects.filter(post=obj, user=user).exists()
@@ -107,6 +201,10 @@ class PostListSerializer(serializers.ModelSerializer):
     view_count = serializers.SerializerMethodField()
     thumbnail = MediaSerializer()
     user = UserPublicSerializer()
+    search_headline = serializers.SerializerMethodField()
+
+    # Medios firmados en bloque por SignedMediaListSerializer
+    media_fields = ("thumbnail", "category.thumbnail", "user.userprofile.profile_picture")
     
     class Meta:
         model = Post
@@ -122,10 +220,32 @@ class PostListSerializer(serializers.ModelSerializer):
             "created_at",
             "user",
             "featured",
+            "search_headline",
         ]
+        list_serializer_class = PendingCountersListSerializer
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Plan de consultas para serializar una lista de posts sin N+1. El contenido
+        y el vector de busqueda no se usan en la lista y no se cargan.
+        """
+        return queryset.select_related(
+            "category__thumbnail",
+            "thumbnail",
+            "post_analytics",
+            "user__userprofile__profile_picture",
+        ).defer("content", "search_vector")
 
     def get_view_count(self, obj):
-        return obj.post_analytics.views if obj.post_analytics else 0
+        views = obj.post_analytics.views if obj.post_analytics else 0
+        return views + counters.get_pending_metric(get_pending_counters(self, obj), obj.id, "views")
+
+    def get_search_headline(self, obj):
+        """
+        Descripcion con los terminos buscados resaltados, solo en resultados de busqueda.
+        """
+        return getattr(obj, "search_headline", None)
 
 
 class PostAnalyticsSerializer(serializers.ModelSerializer):
@@ -183,7 +303,6 @@ class PostInteractionSerializer(serializers.ModelSerializer):
 class CommentSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
     post_title = serializers.SerializerMethodField()
-    replies_count = serializers.SerializerMethodField()
     # replies = serializers.SerializerMethodField()
 
     class Meta:
@@ -198,19 +317,26 @@ class CommentSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
             "is_active",
+            "depth",
             "replies_count",
             # "replies",
         ]
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Plan de consultas para serializar comentarios sin N+1.
+        """
+        return queryset.select_related("user", "post").defer(
+            "post__content", "post__search_vector"
+        )
+
     def get_post_title(self, obj):
         return obj.post.title
 
     def get_replies(self, obj):
         replies = obj.replies.filter(is_active=True)
         return CommentSerializer(replies, many=True).data
-    
-    def get_replies_count(self, obj):
-        return obj.replies.filter(is_active=True).count()
 
 
 class PostLikeSerializer(serializers.ModelSerializer):
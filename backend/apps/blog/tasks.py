@@ -1,9 +1,43 @@
 from celery import shared_task
 import logging
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
 import redis
 from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
 
-from .models import PostAnalytics, Post, CategoryAnalytics, Category
+from . import (
+    cache_tags,
+    category_tree,
+    content_similarity,
+    counters,
+    dwell,
+    events,
+    impressions,
+    partitions,
+    recommendations,
+    rollups,
+    trending,
+    unique_views,
+)
+from .models import (
+    PostAnalytics,
+    Post,
+    CategoryAnalytics,
+    Category,
+    PostView,
+    PostInteraction,
+    PostShare,
+    CategoryView,
+    PostUniqueViewRollup,
+    CategoryUniqueViewRollup,
+    click_through_rate_expression,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +49,8 @@ def increment_post_impressions(post_id):
     Incrementa las impresiones del post asociado
     """
     try:
-        analytics, created = PostAnalytics.objects.get_or_create(post__id=post_id)
-        analytics.increment_impression()
+        # Se acumula con el resto de impresiones y se sincroniza en sync_impressions_to_db
+        impressions.record(impressions.POST, [post_id])
     except Exception as e:
         logger.info(f"Error incrementing impressions for Post ID {post_id}: {str(e)}")
 
@@ -28,8 +62,7 @@ def increment_post_views_task(slug, ip_address, user=None):
     """
     try:
         post = Post.objects.get(slug=slug)
-        post_analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        post_analytics.increment_view(ip_address , user=user)
+        counters.increment(counters.POST, post.id, "views")
     except Post.DoesNotExist:
         logger.error(f"Post with slug {slug} does not exist.")
     except Exception as e:
@@ -37,79 +70,575 @@ def increment_post_views_task(slug, ip_address, user=None):
 
 
 @shared_task
-def sync_impressions_to_db():
+def flush_analytics_counters():
     """
-    Sincronizar las impresiones almacenadas en redis con la base de datos
+    Vuelca en bloque a la base de datos los contadores de analiticas acumulados en Redis
     """
-    keys = redis_client.keys("post:impressions:*")
-    for key in keys:
+    _flush_counters(counters.POST, PostAnalytics, Post, "post_id")
+    _flush_counters(counters.CATEGORY, CategoryAnalytics, Category, "category_id")
+    _flush_dwell(dwell.POST, PostAnalytics, Post, "post_id")
+    _flush_dwell(dwell.CATEGORY, CategoryAnalytics, Category, "category_id")
+
+
+def _flush_counters(kind, analytics_model, parent_model, parent_field):
+    flushed = 0
+    for chunk in counters.drain(kind):
         try:
-            post_id = key.decode("utf-8").split(":")[-1]
-
-            # Validar que el post existe
-            try:
-                post = Post.objects.get(id=post_id)
-            except Post.DoesNotExist:
-                logger.info(f"Post with ID {post_id} does not exist. Skipping.")
-                continue
-
-            # Obtener impresiones de redis
-            impressions = int(redis_client.get(key))
-            if impressions == 0:
-                redis_client.delete(key)
-                continue
-            
-            # Obtener y crear instancia de category analytics
-            analytics, created = PostAnalytics.objects.get_or_create(post=post)
-
-            # Incrementar impresiones
-            analytics.impressions += impressions
-            analytics.save()
-
-            # Incrementar la tasa de clics (CTR)
-            analytics._update_click_through_rate()
-
-            # Eliminar la clave de redis despues de sincronizar
-            redis_client.delete(key)
+            with transaction.atomic():
+                _apply_counter_deltas(chunk, analytics_model, parent_model, parent_field)
+            flushed += len(chunk)
         except Exception as e:
-            print(f"Error syncing impressions for {key}: {str(e)}")
+            # Devolver el lote a Redis para reintentarlo en la siguiente ejecucion
+            logger.error(f"Error flushing {kind} counters: {str(e)}")
+            counters.restore(kind, chunk)
 
+    if flushed:
+        logger.info(f"Flushed analytics counters for {flushed} {kind} objects")
 
-@shared_task
-def sync_category_impressions_to_db():
+
+def _apply_counter_deltas(chunk, analytics_model, parent_model, parent_field):
     """
-    Sincronizar las impresiones almacenadas en redis con la base de datos
+    Aplica un lote {id: {metrica: delta}} con un solo UPDATE usando expresiones F(),
+    y recalcula el CTR en SQL.
     """
-    keys = redis_client.keys("category:impressions:*")
-    for key in keys:
+    rows = _get_analytics_rows(list(chunk), analytics_model, parent_model, parent_field)
+
+    fields = sorted({metric for object_id in rows for metric in chunk[object_id]})
+    if not fields:
+        return
+
+    for object_id, row in rows.items():
+        deltas = chunk[object_id]
+        for metric in fields:
+            setattr(row, metric, F(metric) + deltas.get(metric, 0))
+
+    analytics_model.objects.bulk_update(rows.values(), fields)
+
+    if "clicks" in fields:
+        analytics_model.objects.filter(id__in=[row.id for row in rows.values()]).update(
+            click_through_rate=click_through_rate_expression()
+        )
+
+
+def _flush_dwell(kind, analytics_model, parent_model, parent_field):
+    flushed = 0
+    for chunk in dwell.drain(kind):
         try:
-            # Decodificar y extraer el ID de la categoría desde la clave Redis
-            category_id = key.decode("utf-8").split(":")[-1]
-
-            # Validar que la categoria existe
-            try:
-                category = Category.objects.get(id=category_id)
-            except Category.DoesNotExist:
-                logger.info(f"Category with ID {category_id} does not exist. Skipping.")
-                continue
-            
-            # Obtener impresiones de redis
-            impressions = int(redis_client.get(key))
-            if impressions == 0:
-                redis_client.delete(key)
-                continue
-
-            # Obtener y crear instancia de category analytics
-            analytics, created = CategoryAnalytics.objects.get_or_create(category=category)
-
-            # Incrementar impresiones
-            analytics.impressions += impressions
-            analytics.save()
-
-            # Actualizar tasa de clics (CTR)
-            analytics._update_click_through_rate()
-
-            # Eliminar la clave de redis despues de sincronizar
-            redis_client.delete(key)
+            with transaction.atomic():
+                _apply_dwell(chunk, analytics_model, parent_model, parent_field)
+            flushed += len(chunk)
         except Exception as e:
-            print(f"Error syncing impressions for {key}: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error flushing {kind} dwell times: {str(e)}")
+            dwell.restore(kind, chunk)
+
+    if flushed:
+        logger.info(f"Flushed dwell times for {flushed} {kind} objects")
+
+
+def _apply_dwell(chunk, analytics_model, parent_model, parent_field):
+    """
+    Combina un lote {id: (n, media, m2, scroll_n, scroll)} con la media y la
+    varianza acumuladas de cada fila, con un solo bulk_update.
+    """
+    fields = ["avg_time_on_page", "time_on_page_samples", "time_on_page_m2"]
+    has_scroll = analytics_model is PostAnalytics
+    if has_scroll:
+        fields += ["avg_scroll_depth", "scroll_depth_samples"]
+
+    rows = _get_analytics_rows(
+        list(chunk), analytics_model, parent_model, parent_field, fields=fields, for_update=True
+    )
+    for object_id, row in rows.items():
+        samples, mean, m2, scroll_samples, scroll = chunk[object_id]
+        row.time_on_page_samples, row.avg_time_on_page, row.time_on_page_m2 = dwell.combine(
+            row.time_on_page_samples, row.avg_time_on_page, row.time_on_page_m2, samples, mean, m2
+        )
+        if has_scroll and scroll_samples:
+            row.scroll_depth_samples, row.avg_scroll_depth, _ = dwell.combine(
+                row.scroll_depth_samples, row.avg_scroll_depth, 0.0, scroll_samples, scroll, 0.0
+            )
+
+    analytics_model.objects.bulk_update(rows.values(), fields)
+
+
+def _get_analytics_rows(object_ids, analytics_model, parent_model, parent_field, fields=(), for_update=False):
+    """
+    Devuelve {id del objeto: fila de analiticas} con una consulta `__in` por lote.
+    Los ids de objetos que ya no existen se omiten. Solo se cargan `fields`, y con
+    `for_update` las filas quedan bloqueadas hasta el final de la transaccion.
+    """
+    def select(ids):
+        queryset = analytics_model.objects.filter(**{f"{parent_field}__in": ids}).only("id", parent_field, *fields)
+        return queryset.select_for_update() if for_update else queryset
+
+    rows = {str(getattr(row, parent_field)): row for row in select(object_ids)}
+
+    # Crear las analiticas que falten (objetos creados sin disparar post_save)
+    missing_ids = [object_id for object_id in object_ids if object_id not in rows]
+    if missing_ids:
+        existing_ids = parent_model.objects.filter(id__in=missing_ids).values_list("id", flat=True)
+        if existing_ids:
+            analytics_model.objects.bulk_create(
+                [analytics_model(**{parent_field: object_id}) for object_id in existing_ids],
+                ignore_conflicts=True,
+            )
+            rows.update({str(getattr(row, parent_field)): row for row in select(missing_ids)})
+
+    return rows
+
+
+def _sync_impressions(kind, analytics_model, parent_model, parent_field):
+    """
+    Sincroniza las impresiones de un tipo de objeto: un SELECT `__in` y un solo
+    UPDATE (impresiones + CTR) por lote, y registra metricas de la ejecucion.
+    """
+    lock = impressions.sync_lock(kind)
+    if not lock.acquire(blocking=False):
+        logger.info(f"Impressions sync for {kind} is already running. Skipping.")
+        return
+
+    try:
+        if not impressions.begin_drain(kind):
+            return
+
+        started_at = time.monotonic()
+        synced_objects = synced_impressions = skipped_objects = chunks = 0
+
+        for chunk in impressions.iter_chunks(kind):
+            chunks += 1
+            rows = _get_analytics_rows(list(chunk), analytics_model, parent_model, parent_field)
+            skipped_objects += len(chunk) - len(rows)
+
+            deltas = {object_id: chunk[object_id] for object_id in rows if chunk[object_id] > 0}
+            if deltas:
+                new_impressions = F("impressions") + Case(
+                    *[When(id=rows[object_id].id, then=Value(delta)) for object_id, delta in deltas.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+                analytics_model.objects.filter(id__in=[rows[object_id].id for object_id in deltas]).update(
+                    impressions=new_impressions,
+                    click_through_rate=click_through_rate_expression(new_impressions),
+                )
+                synced_objects += len(deltas)
+                synced_impressions += sum(deltas.values())
+
+            impressions.ack(kind, chunk)
+
+        impressions.finish_drain(kind)
+
+        elapsed = time.monotonic() - started_at
+        logger.info(
+            f"Synced {synced_impressions} {kind} impressions for {synced_objects} objects "
+            f"in {chunks} chunks ({skipped_objects} skipped) in {elapsed:.2f}s "
+            f"({synced_impressions / elapsed if elapsed else 0:.0f} impressions/s)"
+        )
+    finally:
+        lock.release()
+
+
+@shared_task
+def sync_impressions_to_db():
+    """
+    Sincronizar las impresiones almacenadas en redis con la base de datos
+    """
+    _sync_impressions(impressions.POST, PostAnalytics, Post, "post_id")
+
+
+@shared_task
+def sync_category_impressions_to_db():
+    """
+    Sincronizar las impresiones de categorias almacenadas en redis con la base de datos
+    """
+    _sync_impressions(impressions.CATEGORY, CategoryAnalytics, Category, "category_id")
+
+
+@shared_task
+def consume_post_events(max_batches=20):
+    """
+    Procesa los eventos de interaccion publicados en el stream de Redis: inserta
+    en bloque las vistas unicas y los shares y los suma a los contadores.
+    """
+    lock = events.consume_lock()
+    if not lock.acquire(blocking=False):
+        logger.info("Post events consumer is already running. Skipping.")
+        return
+
+    try:
+        events.ensure_group()
+        consumer = events.consumer_name()
+
+        for _ in range(max_batches):
+            batch = events.read_batch(consumer)
+            if not batch:
+                break
+
+            view_events = [fields for _, fields in batch if fields.get("t") == events.VIEW]
+            _ingest_view_events(view_events)
+            share_events = [fields for _, fields in batch if fields.get("t") == events.SHARE]
+            _ingest_share_events(share_events)
+
+            # Los eventos con un tipo desconocido tambien se confirman para no reprocesarlos
+            events.ack([entry_id for entry_id, _ in batch])
+    finally:
+        lock.release()
+
+
+def _parse_stream_event(fields):
+    try:
+        return (
+            uuid.UUID(fields["p"]),
+            uuid.UUID(fields["u"]) if fields.get("u") else None,
+            fields["ip"],
+            datetime.fromtimestamp(int(fields["ts"]), tz=dt_timezone.utc),
+        )
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Discarding malformed {fields.get('t')} event {fields}: {str(e)}")
+        return None
+
+
+def _ingest_view_events(view_events):
+    """
+    Registra un lote de eventos de vista. Solo cuentan las vistas de visitantes
+    unicos por post: se descartan las repetidas dentro del lote y las de visitantes
+    ya vistos, segun el HyperLogLog del post o, en modo exacto, la tabla PostView.
+    """
+    unique_events = {}
+    for fields in view_events:
+        event = _parse_stream_event(fields)
+        if event is not None and event[2]:
+            unique_events.setdefault(event[:3], event[3])
+
+    if not unique_events:
+        return
+
+    post_ids = {post_id for post_id, _, _ in unique_events}
+    user_ids = {user_id for _, user_id, _ in unique_events if user_id}
+
+    # Ignorar eventos de posts o usuarios que ya no existen
+    post_categories = dict(Post.objects.filter(id__in=post_ids).values_list("id", "category_id"))
+    post_ids = set(post_categories)
+    user_ids = set(get_user_model().objects.filter(id__in=user_ids).values_list("id", flat=True))
+
+    unique_events = {
+        key: timestamp
+        for key, timestamp in unique_events.items()
+        if key[0] in post_ids and (key[1] is None or key[1] in user_ids)
+    }
+
+    if unique_views.is_exact():
+        existing = set(
+            PostView.objects.filter(
+                post_id__in=post_ids,
+                ip_address__in={ip_address for _, _, ip_address in unique_events},
+            ).values_list("post_id", "user_id", "ip_address")
+        )
+        new_views = {key: timestamp for key, timestamp in unique_events.items() if key not in existing}
+        visits = []
+    else:
+        items = list(unique_events.items())
+        visits = [
+            (post_id, unique_views.visitor_id(user_id, ip_address), timezone.localdate(timestamp))
+            for (post_id, user_id, ip_address), timestamp in items
+        ]
+        # Un visitante cuenta una vez por post aunque llegue con varias IPs o en varios dias
+        first_visits = {}
+        for visit, item in zip(visits, items):
+            first_visits.setdefault(visit[:2], (visit, item))
+        # Las visitas se registran en los HyperLogLog despues de guardar las vistas: si la
+        # transaccion falla y el evento se reintenta, sus visitantes siguen siendo nuevos
+        is_new = unique_views.is_new(counters.POST, [visit for visit, _ in first_visits.values()])
+        new_views = dict(item for (_, item), new in zip(first_visits.values(), is_new) if new)
+
+    if not new_views:
+        unique_views.add(counters.POST, visits)
+        return
+
+    with transaction.atomic():
+        transaction.on_commit(lambda: unique_views.add(counters.POST, visits))
+        if unique_views.is_exact():
+            PostView.objects.bulk_create(
+                [
+                    PostView(post_id=post_id, user_id=user_id, ip_address=ip_address)
+                    for post_id, user_id, ip_address in new_views
+                ],
+                ignore_conflicts=True,
+            )
+        # bulk_create no ejecuta PostInteraction.save(): completar sus campos derivados
+        PostInteraction.objects.bulk_create(
+            [
+                PostInteraction(
+                    post_id=post_id,
+                    user_id=user_id,
+                    ip_address=ip_address,
+                    interaction_type="view",
+                    interaction_category="passive",
+                    hour_of_day=timestamp.hour,
+                    day_of_week=timestamp.weekday(),
+                )
+                for (post_id, user_id, ip_address), timestamp in new_views.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+    views_per_post = Counter(str(post_id) for post_id, _, _ in new_views)
+    counters.increment_many(counters.POST, "views", views_per_post)
+    trending.record(
+        (post_id, post_categories[post_id], trending.interaction_score("view") * views)
+        for post_id, views in Counter(post_id for post_id, _, _ in new_views).items()
+    )
+    logger.info(f"Ingested {len(new_views)} post views for {len(views_per_post)} posts")
+
+
+def _ingest_share_events(share_events):
+    """
+    Registra un lote de shares enviados en los lotes de eventos del cliente.
+    """
+    shares = []
+    for fields in share_events:
+        event = _parse_stream_event(fields)
+        if event is not None:
+            shares.append((*event, fields.get("pl") or "other"))
+    if not shares:
+        return
+
+    # Ignorar eventos de posts o usuarios que ya no existen
+    post_categories = dict(
+        Post.objects.filter(id__in={share[0] for share in shares}).values_list("id", "category_id")
+    )
+    user_ids = set(
+        get_user_model().objects.filter(id__in={share[1] for share in shares if share[1]}).values_list("id", flat=True)
+    )
+    shares = [
+        share for share in shares
+        if share[0] in post_categories and (share[1] is None or share[1] in user_ids)
+    ]
+    if not shares:
+        return
+
+    with transaction.atomic():
+        PostShare.objects.bulk_create(
+            [PostShare(post_id=post_id, user_id=user_id, platform=platform) for post_id, user_id, _, _, platform in shares]
+        )
+        PostInteraction.objects.bulk_create(
+            [
+                PostInteraction(
+                    post_id=post_id,
+                    user_id=user_id,
+                    ip_address=ip_address or None,
+                    interaction_type="share",
+                    interaction_category="active",
+                    hour_of_day=timestamp.hour,
+                    day_of_week=timestamp.weekday(),
+                )
+                for post_id, user_id, ip_address, timestamp, _ in shares
+            ]
+        )
+
+    shares_per_post = Counter(post_id for post_id, _, _, _, _ in shares)
+    counters.increment_many(counters.POST, "shares", {str(post_id): count for post_id, count in shares_per_post.items()})
+    trending.record(
+        (post_id, post_categories[post_id], trending.interaction_score("share") * count)
+        for post_id, count in shares_per_post.items()
+    )
+    logger.info(f"Ingested {len(shares)} post shares for {len(shares_per_post)} posts")
+
+
+@shared_task
+def rollup_unique_views(days=2):
+    """
+    Consolida en la base de datos los visitantes unicos diarios de posts y
+    categorias de hoy y de los dias anteriores.
+    """
+    for day in unique_views.rollup_days(timezone.localdate(), days):
+        _rollup_unique_views(counters.POST, day, PostUniqueViewRollup, Post, "post", PostView)
+        _rollup_unique_views(counters.CATEGORY, day, CategoryUniqueViewRollup, Category, "category", CategoryView)
+
+
+def _rollup_unique_views(kind, day, rollup_model, parent_model, parent_field, view_model):
+    if unique_views.is_exact():
+        counts = dict(
+            view_model.objects.filter(timestamp__date=day)
+            .values_list(parent_field)
+            .annotate(total=Count("id"))
+            .values_list(parent_field, "total")
+        )
+        counts = {str(object_id): total for object_id, total in counts.items()}
+    else:
+        counts = unique_views.day_counts(kind, day)
+
+    if not counts:
+        return
+
+    existing_ids = parent_model.objects.filter(id__in=list(counts)).values_list("id", flat=True)
+    rollup_model.objects.bulk_create(
+        [
+            rollup_model(**{f"{parent_field}_id": object_id, "date": day, "unique_views": counts[str(object_id)]})
+            for object_id in existing_ids
+        ],
+        update_conflicts=True,
+        unique_fields=[parent_field, "date"],
+        update_fields=["unique_views"],
+    )
+    logger.info(f"Rolled up {kind} unique views for {len(existing_ids)} objects on {day}")
+
+
+@shared_task
+def rollup_post_stats(hours=3):
+    """
+    Consolida las interacciones de las ultimas horas en los conteos por hora de
+    cada post y recalcula los conteos diarios de los dias que abarcan.
+
+    Se recalculan varias horas hacia atras para incluir los eventos que llegan
+    tarde a la base de datos (p. ej. los del stream de vistas).
+    """
+    since = timezone.now() - timedelta(hours=hours)
+    hourly = rollups.rollup_hours(since)
+    daily = rollups.rollup_days(since)
+    logger.info(f"Rolled up {hourly} hourly and {daily} daily post stats")
+
+
+@shared_task
+def maintain_event_partitions():
+    """
+    Crea las particiones mensuales futuras de las tablas de eventos, separa las
+    que superan el periodo de retencion y borra los conteos por hora viejos.
+    """
+    if partitions.is_supported():
+        for model in (PostInteraction, PostView):
+            created, detached = partitions.maintain(model)
+            if created or detached:
+                logger.info(
+                    f"{model._meta.db_table}: created partitions {created}, detached partitions {detached}"
+                )
+
+    deleted = rollups.prune_hours()
+    if deleted:
+        logger.info(f"Deleted {deleted} expired hourly post stats")
+
+
+@shared_task
+def rollup_category_tree():
+    """
+    Recalcula los conteos acumulados del arbol de categorias: posts publicados,
+    vistas y clicks de cada categoria y de su subarbol, y vistas de sus posts.
+
+    Los conteos de posts se mantienen al guardar cada post; esta tarea corrige
+    los cambios hechos sin signals (p. ej. QuerySet.update) y acumula las analiticas.
+    """
+    categories = list(Category.objects.only("id", "path", "post_count", "subtree_post_count"))
+    paths = {category.id: category.path for category in categories}
+
+    post_counts = dict(
+        Post.postobjects.values_list("category_id").annotate(total=Count("id")).values_list("category_id", "total")
+    )
+    post_views = dict(
+        PostAnalytics.objects.filter(post__status="published")
+        .values_list("post__category_id")
+        .annotate(total=Sum("views"))
+        .values_list("post__category_id", "total")
+    )
+    analytics = {row.category_id: row for row in CategoryAnalytics.objects.filter(category_id__in=list(paths))}
+
+    subtree_post_counts = category_tree.subtree_totals(paths, post_counts)
+    subtree_post_views = category_tree.subtree_totals(paths, post_views)
+    subtree_views = category_tree.subtree_totals(paths, {key: row.views for key, row in analytics.items()})
+    subtree_clicks = category_tree.subtree_totals(paths, {key: row.clicks for key, row in analytics.items()})
+
+    changed_categories = []
+    for category in categories:
+        counts = (post_counts.get(category.id, 0), subtree_post_counts[category.id])
+        if (category.post_count, category.subtree_post_count) != counts:
+            category.post_count, category.subtree_post_count = counts
+            changed_categories.append(category)
+
+    changed_analytics = []
+    for category_id, row in analytics.items():
+        totals = (subtree_views[category_id], subtree_clicks[category_id], subtree_post_views[category_id])
+        if (row.subtree_views, row.subtree_clicks, row.subtree_post_views) != totals:
+            row.subtree_views, row.subtree_clicks, row.subtree_post_views = totals
+            changed_analytics.append(row)
+
+    with transaction.atomic():
+        Category.objects.bulk_update(changed_categories, ["post_count", "subtree_post_count"], batch_size=500)
+        CategoryAnalytics.objects.bulk_update(
+            changed_analytics, ["subtree_views", "subtree_clicks", "subtree_post_views"], batch_size=500
+        )
+        if changed_categories:
+            # bulk_update no envia signals
+            cache_tags.invalidate(cache_tags.CATEGORIES)
+
+    logger.info(
+        f"Rolled up category tree: {len(changed_categories)} categories and "
+        f"{len(changed_analytics)} analytics rows updated"
+    )
+
+
+@shared_task
+def snapshot_trending_scores():
+    """
+    Mueve la epoca del ranking de tendencias si hace falta, descarta los puntajes
+    despreciables y guarda los puntajes actuales en PostAnalytics / CategoryAnalytics.
+
+    Si el ranking de Redis se perdio, lo vuelve a cargar desde el ultimo snapshot.
+    """
+    if trending.is_empty():
+        saved = list(
+            PostAnalytics.objects.filter(trending_score__gt=0).values_list("post_id", "post__category_id", "trending_score")
+        )
+        if saved:
+            trending.restore(saved)
+            logger.info(f"Restored trending ranking for {len(saved)} posts")
+        return
+
+    trending.rebase()
+    _snapshot_trending_scores(trending.current_scores(trending.POSTS_KEY), PostAnalytics, "post")
+    _snapshot_trending_scores(trending.current_scores(trending.CATEGORIES_KEY), CategoryAnalytics, "category")
+
+
+def _snapshot_trending_scores(scores, analytics_model, parent_field):
+    rows = list(
+        analytics_model.objects.filter(
+            Q(**{f"{parent_field}_id__in": list(scores)}) | Q(trending_score__gt=0)
+        ).only("id", f"{parent_field}_id", "trending_score")
+    )
+    for row in rows:
+        row.trending_score = scores.get(str(getattr(row, f"{parent_field}_id")), 0)
+    analytics_model.objects.bulk_update(rows, ["trending_score"], batch_size=500)
+    logger.info(f"Saved trending scores for {len(rows)} {parent_field} analytics rows")
+
+
+@shared_task
+def build_related_posts():
+    """
+    Recalcula los posts relacionados de cada post a partir de las interacciones
+    de los usuarios (filtrado colaborativo item-item).
+    """
+    interactions = (
+        PostInteraction.objects.filter(post__status="published")
+        .values_list("user_id", "ip_address", "post_id", "interaction_type", "weight")
+        .iterator(chunk_size=recommendations.READ_CHUNK_SIZE)
+    )
+    matrix, post_ids = recommendations.interaction_matrix(interactions)
+    if not post_ids:
+        return
+
+    neighbours = recommendations.top_neighbours(matrix)
+    stored = recommendations.store(post_ids, neighbours)
+    logger.info(
+        f"Built related posts for {stored} posts from {matrix.nnz} user-post pairs "
+        f"({matrix.shape[0]} users)"
+    )
+
+
+@shared_task
+def rebuild_content_index():
+    """
+    Reconstruye el indice de similitud de contenido con todos los posts publicados.
+    Corrige los posts cuyo cambio no llego al indice (p. ej. Redis no respondia al
+    guardarlos). Devuelve el numero de posts indexados.
+    """
+    posts = Post.postobjects.only("id", "title", "keywords", "description", "content").iterator(chunk_size=500)
+    indexed = content_similarity.rebuild(posts)
+    logger.info(f"Rebuilt the content similarity index with {indexed} posts")
+    return indexed
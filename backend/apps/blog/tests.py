@@ -1,6 +1,78 @@
-from django.test import TestCase
+import base64
+import io
+import json
+from datetime import date, datetime, timezone as dt_timezone
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from urllib.parse import urlparse
 
-from backend.apps.blog.models import Category
+import fakeredis
+import numpy as np
+import redis
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.migrations.loader import MigrationLoader
+from django.db.models import F, FloatField, Value
+from django.http import HttpResponse
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from prometheus_client import REGISTRY
+from redis.commands.core import Script
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.authentication.models import UserAccount
+from apps.blog import (
+    abuse,
+    cache_tags,
+    category_tree,
+    client_events,
+    content_similarity,
+    counters,
+    dwell,
+    events,
+    headings as post_headings,
+    impressions,
+    partitions,
+    post_slugs,
+    recommendations,
+    response_cache,
+    rollups,
+    search as post_search,
+    tasks,
+    threads,
+    trending,
+    unique_views,
+)
+from apps.blog.models import (
+    AuthorDailyRollup,
+    AuthorHourlyRollup,
+    Category,
+    Comment,
+    Heading,
+    Post,
+    PostAnalytics,
+    PostDailyRollup,
+    PostHourlyRollup,
+    PostInteraction,
+    PostLike,
+)
+from apps.blog.pagination import POST_SORTINGS, KeysetPagination, TrendingPagination
+from apps.blog.serializers import PostSerializer
+from apps.blog.views import (
+    CategoriesListView,
+    CategoryDetailView,
+    DetailPostView,
+    ListPostCommentsView,
+    PostAuthorViews,
+    PostCommentViews,
+    PostLikeViews,
+    PostListView,
+)
+from core import metrics
+from utils import cloudfront_utils
 
 
 # Create your tests here.
@@ -17,3 +89,1255 @@ class CategoryModelTest(TestCase):
     def test_category_creation(self):
         self.assertEqual(str(self.category), 'Tech')
         self.assertEqual(self.category.title, 'Tech')
+
+
+class CategoryTreeTest(TestCase):
+    def setUp(self):
+        self.a = Category.objects.create(name="A", slug="a")
+        self.b = Category.objects.create(name="B", slug="b", parent=self.a)
+        self.c = Category.objects.create(name="C", slug="c", parent=self.b)
+        self.d = Category.objects.create(name="D", slug="d")
+        author = create_author()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_post(author, "tree-1", category=self.c)
+            create_post(author, "tree-2", category=self.c)
+            create_post(author, "tree-3", category=self.b)
+
+    def _counts(self):
+        categories = Category.objects.in_bulk()
+        return {
+            category.slug: (category.depth, category.post_count, category.subtree_post_count)
+            for category in sorted(categories.values(), key=lambda category: category.slug)
+        }
+
+    def test_post_counts_roll_up_the_path(self):
+        self.assertEqual(self._counts(), {"a": (0, 0, 3), "b": (1, 1, 3), "c": (2, 2, 2), "d": (0, 0, 0)})
+        self.assertEqual(list(self.c.get_ancestors()), [self.a, self.b])
+
+    def test_moving_a_category_moves_its_subtree_and_counts(self):
+        self.b.parent = self.d
+        self.b.save()
+
+        self.c.refresh_from_db()
+        self.assertTrue(self.c.path.startswith(self.d.path + self.b.path[-category_tree.SEGMENT_LENGTH:]))
+        self.assertEqual(list(self.d.get_descendants()), [self.b, self.c])
+        self.assertEqual(list(self.a.get_descendants()), [])
+        self.assertEqual(self._counts(), {"a": (0, 0, 0), "b": (1, 1, 3), "c": (2, 2, 2), "d": (0, 0, 3)})
+
+    def test_a_category_cannot_move_under_its_subtree(self):
+        self.a.parent = self.c
+        with self.assertRaises(ValueError):
+            self.a.save()
+
+
+class QueryCountTestMixin:
+    """
+    Verifica que un endpoint hace el mismo numero de consultas sin importar
+    cuantas filas serializa (sin N+1).
+    """
+
+    def assertConstantQueries(self, add_rows, call, sizes=(2, 8)):
+        counts = []
+        for size in sizes:
+            add_rows(size)
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = call()
+            self.assertEqual(response.status_code, 200, getattr(response, "data", None))
+            counts.append(len(queries))
+
+        self.assertEqual(
+            len(set(counts)), 1,
+            f"Query count grows with the number of rows: {dict(zip(sizes, counts))}"
+        )
+
+
+class FakeRedisMixin:
+    """
+    Cambia el cliente de Redis de los modulos en `redis_modules`, y sus scripts
+    Lua, por uno de fakeredis vacio en cada test.
+    """
+    redis_modules = ()
+
+    def setUp(self):
+        super().setUp()
+        self.redis = fakeredis.FakeStrictRedis()
+        for module in self.redis_modules:
+            patchers = [mock.patch.object(module, "redis_client", self.redis)]
+            patchers += [
+                mock.patch.object(script, "registered_client", self.redis)
+                for script in vars(module).values()
+                if isinstance(script, Script)
+            ]
+            for patcher in patchers:
+                patcher.start()
+                self.addCleanup(patcher.stop)
+
+
+def create_author(username="editor"):
+    """
+    Usuario con rol de editor, que puede publicar posts.
+    """
+    return UserAccount.objects.create_user(
+        f"{username}@example.com", "password", username=username, first_name="Ed", last_name="Itor", role="editor"
+    )
+
+
+def create_post(author, slug, category=None, **fields):
+    """
+    Post publicado de `author`. Sin `category` usa la categoria "tech", que se crea
+    la primera vez.
+    """
+    if category is None:
+        category = Category.objects.get_or_create(slug="tech", defaults={"name": "Tech"})[0]
+    fields = {
+        "title": "Post", "description": "Description", "content": "<p>Content</p>", "keywords": "tech",
+        "status": "published", **fields,
+    }
+    return Post.objects.create(user=author, slug=slug, category=category, **fields)
+
+
+@mock.patch.object(response_cache, "store", lambda *args, **kwargs: None)
+@mock.patch.object(response_cache, "fetch", lambda *args, **kwargs: None)
+class PostQueryCountTest(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.author = create_author()
+        self.post_count = 0
+        self.post = self._create_posts(1)[0]
+
+    def _create_posts(self, count):
+        posts = []
+        for _ in range(count):
+            self.post_count += 1
+            posts.append(create_post(self.author, f"post-{self.post_count}", title=f"Post {self.post_count}"))
+        return posts
+
+    def _add_posts(self, size):
+        self._create_posts(size - Post.objects.count())
+
+    def _get(self, view, url, user=None):
+        request = self.factory.get(url, HTTP_API_KEY="test-key")
+        if user is not None:
+            force_authenticate(request, user=user)
+        with self.settings(VALID_API_KEYS=["test-key"]):
+            return view.as_view()(request)
+
+    def test_post_list(self):
+        self.assertConstantQueries(
+            self._add_posts, lambda: self._get(PostListView, "/api/blog/posts/?page_size=50")
+        )
+
+    def test_category_posts(self):
+        self.assertConstantQueries(
+            self._add_posts, lambda: self._get(CategoryDetailView, "/api/blog/category/posts/?slug=tech&page_size=50")
+        )
+
+    def test_author_posts(self):
+        self.assertConstantQueries(
+            self._add_posts, lambda: self._get(PostAuthorViews, "/api/blog/post/author/?page_size=50", self.author)
+        )
+
+    def test_categories_list(self):
+        def add_categories(size):
+            for i in range(Category.objects.count(), size):
+                Category.objects.create(name=f"Category {i}", slug=f"category-{i}")
+
+        self.assertConstantQueries(add_categories, lambda: self._get(CategoriesListView, "/api/blog/categories/list/"))
+
+    def test_post_detail_comments_and_likes(self):
+        def add_activity(size):
+            for i in range(self.post.post_comments.count(), size):
+                user = UserAccount.objects.create_user(
+                    f"reader{i}@example.com", "password", username=f"reader{i}", first_name="R", last_name="R"
+                )
+                Comment.objects.create(user=user, post=self.post, content="Nice")
+                PostLike.objects.create(user=user, post=self.post)
+
+        response = self._get(DetailPostView, f"/api/blog/post/get/?slug={self.post.slug}", self.author)
+        self.assertFalse(response.data["results"]["has_liked"])
+        self.assertConstantQueries(
+            add_activity, lambda: self._get(DetailPostView, f"/api/blog/post/get/?slug={self.post.slug}", self.author)
+        )
+
+    def test_post_counts_without_joins(self):
+        readers = [
+            UserAccount.objects.create_user(
+                f"counter{i}@example.com", "password", username=f"counter{i}", first_name="R", last_name="R"
+            )
+            for i in range(3)
+        ]
+        for reader in readers:
+            PostLike.objects.create(user=reader, post=self.post)
+        comment = Comment.objects.create(user=readers[0], post=self.post, content="Top")
+        Comment.objects.create(user=readers[1], post=self.post, content="Top")
+        Comment.objects.create(user=readers[2], post=self.post, parent=comment, content="Reply")
+
+        queryset = PostSerializer.setup_eager_loading(Post.objects.filter(pk=self.post.pk))
+        sql = str(queryset.query).upper()
+        self.assertNotIn("GROUP BY", sql)
+        self.assertNotIn("JOIN \"BLOG_COMMENT\"", sql)
+        self.assertNotIn("JOIN \"BLOG_POSTLIKE\"", sql)
+
+        post = queryset.get()
+        self.assertEqual((post.comments_total, post.likes_total), (2, 3))
+
+    def test_post_comments(self):
+        def add_comments(size):
+            for i in range(self.post.post_comments.count(), size):
+                comment = Comment.objects.create(user=self.author, post=self.post, content=f"Comment {i}")
+                reply = Comment.objects.create(user=self.author, post=self.post, parent=comment, content="Reply")
+                Comment.objects.create(user=self.author, post=self.post, parent=reply, content="Reply")
+
+        self.assertConstantQueries(
+            add_comments,
+            lambda: self._get(ListPostCommentsView, f"/api/blog/post/comments/?slug={self.post.slug}&page_size=50"),
+        )
+        response = self._get(ListPostCommentsView, f"/api/blog/post/comments/?slug={self.post.slug}&depth=2")
+        thread = response.data["results"][0]
+        self.assertEqual(thread["replies_count"], 1)
+        self.assertEqual(thread["replies"][0]["replies"][0]["depth"], 2)
+
+
+@override_settings(METRICS_ENABLED=True, VALID_API_KEYS=["test-key"])
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        create_post(create_author(), "metrics-post")
+        cache.clear()
+
+    def _sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_records_queries_and_cache_lookups(self):
+        endpoint = {"endpoint": "api/blog/post/", "method": "GET"}
+        requests = self._sample("http_request_duration_seconds_count", **endpoint)
+        queries = self._sample("http_request_sql_queries_sum", **endpoint)
+        misses = self._sample("cache_lookups_total", family="post_detail", result="miss")
+        hits = self._sample("cache_lookups_total", family="post_detail", result="hit")
+
+        client = Client(HTTP_API_KEY="test-key")
+        for _ in range(2):
+            response = client.get("/api/blog/post/", {"slug": "metrics-post"})
+            self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self._sample("http_request_duration_seconds_count", **endpoint), requests + 2)
+        self.assertGreater(self._sample("http_request_sql_queries_sum", **endpoint), queries)
+        self.assertEqual(self._sample("cache_lookups_total", family="post_detail", result="miss"), misses + 1)
+        self.assertEqual(self._sample("cache_lookups_total", family="post_detail", result="hit"), hits + 1)
+
+    def test_endpoint_requires_the_token(self):
+        factory = APIRequestFactory()
+        for token, authorization, status in (
+            ("", "", 403),
+            ("", "Bearer ", 403),
+            ("secret", "Bearer wrong", 403),
+            ("secret", "Bearer secret", 200),
+        ):
+            with self.settings(METRICS_TOKEN=token):
+                request = factory.get("/metrics/", HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(metrics.metrics_view(request).status_code, status)
+
+
+class CounterFlushTest(FakeRedisMixin, TestCase):
+    redis_modules = (counters, abuse)
+
+    def test_failed_flush_restores_and_stops(self):
+        for post_id in range(1, 4):
+            counters.increment(counters.POST, post_id, "views", post_id)
+
+        chunks = []
+        for chunk in counters.drain(counters.POST, chunk_size=1):
+            chunks.append(chunk)
+            # Lo devuelto durante el vaciado queda para la siguiente ejecucion
+            counters.restore(counters.POST, chunk)
+        self.assertEqual(len(chunks), 3)
+
+        pending = counters.get_pending(counters.POST, [1, 2, 3])
+        self.assertEqual({post_id: deltas["views"] for post_id, deltas in pending.items()}, {"1": 1, "2": 2, "3": 3})
+
+        with mock.patch.object(tasks, "_apply_counter_deltas", side_effect=DatabaseError):
+            tasks._flush_counters(counters.POST, None, None, "post_id")
+        self.assertEqual(self.redis.scard("analytics:post:dirty"), 3)
+        self.assertEqual(self.redis.scard("analytics:post:processing"), 0)
+
+    def test_deletes_subtract_from_pending_increments(self):
+        post = create_post(create_author(), "counted-post")
+        readers = [create_author(f"reader{i}") for i in range(2)]
+        comment = Comment.objects.create(user=readers[0], post=post, content="Top")
+        Comment.objects.create(user=readers[1], post=post, parent=comment, content="Reply")
+        counters.increment(counters.POST, post.id, "comments", 2)
+
+        factory = APIRequestFactory()
+        with self.settings(VALID_API_KEYS=["test-key"]):
+            for reader in readers:
+                request = factory.post("/api/blog/post/like/", {"slug": post.slug}, HTTP_API_KEY="test-key")
+                force_authenticate(request, user=reader)
+                self.assertEqual(PostLikeViews.as_view()(request).status_code, 200)
+
+            request = factory.delete(f"/api/blog/post/like/?slug={post.slug}", HTTP_API_KEY="test-key")
+            force_authenticate(request, user=readers[0])
+            self.assertEqual(PostLikeViews.as_view()(request).status_code, 200)
+            # Borrar el comentario se lleva su respuesta
+            request = factory.delete(f"/api/blog/post/comment/?comment_id={comment.id}", HTTP_API_KEY="test-key")
+            force_authenticate(request, user=readers[0])
+            self.assertEqual(PostCommentViews.as_view()(request).status_code, 200)
+
+        self.assertEqual(counters.get_pending(counters.POST, [post.id])[str(post.id)], {"comments": 0, "likes": 1})
+        tasks._flush_counters(counters.POST, PostAnalytics, Post, "post_id")
+        analytics = PostAnalytics.objects.get(post=post)
+        self.assertEqual((analytics.likes, analytics.comments), (1, 0))
+
+
+class DwellFlushTest(FakeRedisMixin, TestCase):
+    redis_modules = (dwell, post_slugs)
+
+    def setUp(self):
+        super().setUp()
+        self.post = create_post(create_author(), "dwell-post")
+        self.category = self.post.category
+
+    def _drain(self, kind):
+        merged = {}
+        for chunk in dwell.drain(kind):
+            merged.update(chunk)
+        return merged
+
+    def test_beacons_merge_with_welford(self):
+        for seconds, scroll in ((10, 50), (20, None), (60, 100)):
+            self.assertTrue(dwell.record(self.post.slug, seconds, scroll))
+
+        samples, mean, m2, scroll_samples, scroll = self._drain(dwell.POST)[str(self.post.id)]
+        self.assertEqual((samples, scroll_samples), (3, 2))
+        self.assertAlmostEqual(mean, 30)
+        self.assertAlmostEqual(m2, 20 ** 2 + 10 ** 2 + 30 ** 2)
+        self.assertAlmostEqual(scroll, 75)
+
+        category = self._drain(dwell.CATEGORY)[str(self.category.id)]
+        self.assertEqual(category[0], 3)
+        self.assertAlmostEqual(category[1], 30)
+
+    def test_combine_matches_whole_sample(self):
+        values = [3.0, 7.0, 8.0, 13.0, 21.0]
+        mean = sum(values) / len(values)
+        m2 = sum((value - mean) ** 2 for value in values)
+
+        def state(part):
+            part_mean = sum(part) / len(part)
+            return len(part), part_mean, sum((value - part_mean) ** 2 for value in part)
+
+        samples, combined_mean, combined_m2 = dwell.combine(*state(values[:2]), *state(values[2:]))
+        self.assertEqual(samples, 5)
+        self.assertAlmostEqual(combined_mean, mean)
+        self.assertAlmostEqual(combined_m2, m2)
+        self.assertEqual(dwell.combine(0, 0.0, 0.0, 0, 0.0, 0.0), (0, 0.0, 0.0))
+
+    def test_flush_merges_with_stored_analytics(self):
+        PostAnalytics.objects.filter(post=self.post).update(
+            avg_time_on_page=10, time_on_page_samples=2, time_on_page_m2=8,
+            avg_scroll_depth=40, scroll_depth_samples=2,
+        )
+        for seconds in (20, 30):
+            dwell.record(self.post.slug, seconds, 70)
+
+        tasks._flush_dwell(dwell.POST, PostAnalytics, Post, "post_id")
+
+        analytics = PostAnalytics.objects.get(post=self.post)
+        # Muestras 8, 12 (media 10, M2 8) mas 20 y 30
+        self.assertEqual(analytics.time_on_page_samples, 4)
+        self.assertAlmostEqual(analytics.avg_time_on_page, 17.5)
+        self.assertAlmostEqual(analytics.time_on_page_m2, sum((x - 17.5) ** 2 for x in (8, 12, 20, 30)))
+        self.assertEqual(analytics.scroll_depth_samples, 4)
+        self.assertAlmostEqual(analytics.avg_scroll_depth, 55)
+
+    def test_failed_flush_restores_and_stops(self):
+        dwell.record(self.post.slug, 15)
+        with mock.patch.object(tasks, "_apply_dwell", side_effect=DatabaseError):
+            tasks._flush_dwell(dwell.POST, PostAnalytics, Post, "post_id")
+
+        # Restaurado una sola vez: el acumulado no se duplica
+        self.assertEqual(self.redis.hget(f"dwell:post:{self.post.id}", "n"), b"1")
+        self.assertEqual(self.redis.smembers("dwell:post:dirty"), {str(self.post.id).encode()})
+
+
+class SignedUrlLifetimeTest(TestCase):
+    def test_cached_responses_do_not_outlive_signed_urls(self):
+        signer = mock.Mock()
+        with mock.patch.object(cloudfront_utils, "get_cloudfront_signer", return_value=signer):
+            # Ultimo segundo de la ventana: la URL con menos vigencia restante
+            now = (cloudfront_utils.current_bucket() + 1) * cloudfront_utils.SIGNED_URL_BUCKET_SECONDS - 1
+            cloudfront_utils._sign("media/cover.jpg", cloudfront_utils.current_bucket(now))
+
+        expires_at = signer.generate_presigned_url.call_args.kwargs["date_less_than"].timestamp()
+        self.assertGreaterEqual(expires_at - now, response_cache.RESPONSE_CACHE_TIMEOUT)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SignManyTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        cloudfront_utils._local_cache.clear()
+        self.signer = mock.Mock()
+        self.signer.generate_presigned_url.side_effect = lambda url, date_less_than: f"{url}?signed"
+        patcher = mock.patch.object(cloudfront_utils, "get_cloudfront_signer", return_value=self.signer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cloudfront_utils._local_cache.clear)
+
+    def _at(self, now):
+        return mock.patch.object(cloudfront_utils, "time", SimpleNamespace(time=lambda: now))
+
+    def test_signs_each_key_once_per_bucket(self):
+        with self._at(1000):
+            urls = cloudfront_utils.sign_many(["a.jpg", "b.jpg", "a.jpg", None, ""])
+            self.assertEqual(set(urls), {"a.jpg", "b.jpg"})
+            self.assertEqual(self.signer.generate_presigned_url.call_count, 2)
+
+            # Del LRU del proceso y, vacio este, del cache compartido
+            self.assertEqual(cloudfront_utils.sign_many(["a.jpg"]), {"a.jpg": urls["a.jpg"]})
+            cloudfront_utils._local_cache.clear()
+            self.assertEqual(cloudfront_utils.sign_many(["a.jpg", "b.jpg"]), urls)
+            self.assertEqual(self.signer.generate_presigned_url.call_count, 2)
+
+        with self._at(1000 + cloudfront_utils.SIGNED_URL_BUCKET_SECONDS):
+            cloudfront_utils.sign_many(["a.jpg"])
+        self.assertEqual(self.signer.generate_presigned_url.call_count, 3)
+
+    def test_lru_evicts_the_least_recently_used(self):
+        lru = cloudfront_utils.LRUCache(2)
+        lru.set("a", 1)
+        lru.set("b", 2)
+        lru.get("a")
+        lru.set("c", 3)
+        self.assertEqual((lru.get("a"), lru.get("b"), lru.get("c")), (1, None, 3))
+
+
+class EventStreamTest(FakeRedisMixin, TestCase):
+    redis_modules = (events,)
+
+    def setUp(self):
+        super().setUp()
+        events.ensure_group()
+        events.publish_view("post-1", "10.0.0.1")
+        events.publish(events.SHARE, "post-2", "10.0.0.2", platform="x")
+
+    def test_group_creation_is_idempotent(self):
+        events.ensure_group()
+        self.assertEqual(len(self.redis.xinfo_groups(events.STREAM_KEY)), 1)
+
+    def test_unacked_events_are_claimed_by_another_consumer(self):
+        batch = events.read_batch("worker-1")
+        self.assertEqual([fields["p"] for _, fields in batch], ["post-1", "post-2"])
+        self.assertEqual(batch[1][1]["platform"], "x")
+
+        # Aun no estan inactivos el tiempo suficiente para reclamarlos
+        self.assertEqual(events.read_batch("worker-2"), [])
+        with mock.patch.object(events, "CLAIM_IDLE_MS", 0):
+            claimed = events.read_batch("worker-2")
+        self.assertEqual([entry_id for entry_id, _ in claimed], [entry_id for entry_id, _ in batch])
+
+        events.ack([entry_id for entry_id, _ in claimed])
+        self.assertEqual(self.redis.xlen(events.STREAM_KEY), 0)
+        self.assertEqual(self.redis.xpending(events.STREAM_KEY, events.CONSUMER_GROUP)["pending"], 0)
+        self.assertEqual(events.read_batch("worker-1"), [])
+
+
+@mock.patch.object(unique_views, "MODE", unique_views.HLL)
+class ViewIngestionTest(FakeRedisMixin, TestCase):
+    redis_modules = (unique_views, counters, trending)
+
+    def setUp(self):
+        super().setUp()
+        self.post = create_post(create_author(), "viewed-post")
+
+    def _events(self, *ips):
+        return [{"t": "view", "p": str(self.post.id), "ip": ip, "ts": "1735689600"} for ip in ips]
+
+    def _views(self):
+        return PostInteraction.objects.filter(post=self.post, interaction_type="view").count()
+
+    def test_failed_write_keeps_visitors_new(self):
+        with mock.patch.object(PostInteraction.objects, "bulk_create", side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                tasks._ingest_view_events(self._events("10.0.0.1"))
+        self.assertEqual(unique_views.count(counters.POST, [self.post.id]), {str(self.post.id): 0})
+
+        # El reintento del evento todavia cuenta la vista
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks._ingest_view_events(self._events("10.0.0.1", "10.0.0.2"))
+        self.assertEqual(self._views(), 2)
+        self.assertEqual(unique_views.count(counters.POST, [self.post.id]), {str(self.post.id): 2})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            tasks._ingest_view_events(self._events("10.0.0.2", "10.0.0.3"))
+        self.assertEqual(self._views(), 3)
+
+
+class TrendingPaginationTest(FakeRedisMixin, TestCase):
+    redis_modules = (trending,)
+
+    def setUp(self):
+        super().setUp()
+        author = create_author()
+        self.posts = [
+            create_post(author, f"trending-{i}", title=f"Post {i}", status="draft" if i == 5 else "published")
+            for i in range(7)
+        ]
+        category = self.posts[0].category
+        # Ranking: 3, 5 (borrador, fuera del listado), 1, 4
+        trending.record(
+            (self.posts[i].id, category.id, score) for i, score in ((3, 9.0), (5, 8.0), (1, 5.0), (4, 2.0))
+        )
+        newest_first = sorted(self.posts, key=lambda post: (post.created_at, post.id), reverse=True)
+        self.expected = [self.posts[i].slug for i in (3, 1, 4)] + [
+            post.slug for post in newest_first if post.slug not in {"trending-1", "trending-3", "trending-4", "trending-5"}
+        ]
+
+    def _page(self, url):
+        paginator = TrendingPagination()
+        with CaptureQueriesContext(connection) as queries:
+            posts = paginator.paginate_queryset(Post.postobjects.all(), Request(APIRequestFactory().get(url)))
+        self.assertFalse(any("CASE" in query["sql"] for query in queries))
+        return [post.slug for post in posts], paginator
+
+    def _cursor_url(self, link):
+        return "/api/blog/posts/?" + urlparse(link).query
+
+    def test_walks_ranking_then_newest(self):
+        slugs, paginator = self._page("/api/blog/posts/?cursor=&page_size=2")
+        pages = [slugs]
+        while paginator.next:
+            slugs, paginator = self._page(self._cursor_url(paginator.next))
+            pages.append(slugs)
+        self.assertEqual(sum(pages, []), self.expected)
+
+        # De vuelta hacia atras desde la ultima pagina
+        back = [pages[-1]]
+        while paginator.previous:
+            slugs, paginator = self._page(self._cursor_url(paginator.previous))
+            back.insert(0, slugs)
+        self.assertEqual(back, pages)
+
+    def test_page_numbers(self):
+        slugs, paginator = self._page("/api/blog/posts/?p=2&page_size=2")
+        self.assertEqual(slugs, self.expected[2:4])
+        self.assertEqual(paginator.count, 6)
+
+    def test_ranking_unavailable(self):
+        with mock.patch.object(trending, "top_posts", side_effect=trending.redis.RedisError):
+            slugs, _ = self._page("/api/blog/posts/?cursor=&page_size=10")
+        newest_first = sorted(
+            (post for post in self.posts if post.status == "published"),
+            key=lambda post: (post.created_at, post.id), reverse=True,
+        )
+        self.assertEqual(slugs, [post.slug for post in newest_first])
+
+
+class TrendingScoresTest(FakeRedisMixin, TestCase):
+    redis_modules = (trending, post_slugs, content_similarity, cache_tags)
+
+    NOW = 1_700_000_000
+
+    def _members(self, key):
+        return [member.decode() for member in self.redis.zrevrange(key, 0, -1)]
+
+    def test_record_and_rebase_category_sets(self):
+        trending.record([("a", 1, 3.0), ("b", 2, 1.0), ("c", None, 2.0), ("d", 2, 0.001)], now=self.NOW)
+        self.assertEqual(self._members(trending.POSTS_KEY), ["a", "c", "b", "d"])
+        self.assertEqual(trending.top_posts(category_ids=[1, 2]), ["a", "b", "d"])
+        self.assertEqual(self.redis.smembers(trending.CATEGORY_IDS_KEY), {b"1", b"2"})
+
+        # Las categorias cambian entre leerlas y reescalar: se vuelve a intentar con las
+        # actuales. "d" queda debajo de MIN_SCORE
+        later = self.NOW + trending.TAU * (trending.REBASE_AFTER + 1)
+        trending.record([("e", 3, 0.5)], now=self.NOW)
+        stale = [{b"1", b"2"}, self.redis.smembers(trending.CATEGORY_IDS_KEY)]
+        with mock.patch.object(self.redis, "smembers", side_effect=stale):
+            trending.rebase(now=self.NOW + 1)
+        self.assertEqual(float(self.redis.get(trending.EPOCH_KEY)), self.NOW)
+        self.assertEqual(self._members(trending.POSTS_KEY), ["a", "c", "b", "e"])
+        self.assertEqual(trending.top_posts(category_ids=[2]), ["b"])
+
+        # Pasado REBASE_AFTER la epoca se mueve y todo lo que queda debajo de MIN_SCORE se descarta
+        trending.record([("a", 1, 1.0)], now=later)
+        trending.rebase(now=later)
+        self.assertEqual(float(self.redis.get(trending.EPOCH_KEY)), later)
+        self.assertEqual(self._members(trending.POSTS_KEY), ["a"])
+        self.assertAlmostEqual(trending.current_scores(now=later)["a"], 1.0)
+        self.assertEqual(self.redis.smembers(trending.CATEGORY_IDS_KEY), {b"1"})
+        self.assertFalse(self.redis.exists(trending._category_posts_key(2)))
+
+    def test_category_change_moves_the_score(self):
+        post = create_post(create_author(), "moved-post")
+        previous = post.category
+        trending.record([(post.id, previous.id, 4.0)], now=self.NOW)
+
+        post.category = Category.objects.create(name="Science", slug="science")
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+        self.assertEqual(trending.top_posts(category_ids=[previous.id]), [])
+        self.assertEqual(trending.top_posts(category_ids=[post.category_id]), [str(post.id)])
+        categories = trending.current_scores(trending.CATEGORIES_KEY, now=self.NOW)
+        self.assertAlmostEqual(categories[str(post.category_id)], 4.0)
+        self.assertAlmostEqual(categories[str(previous.id)], 0.0)
+
+
+class ContentSimilarityTest(FakeRedisMixin, TestCase):
+    redis_modules = (content_similarity,)
+
+    TEXTS = {
+        "a": "python django orm queries",
+        "b": "python django views templates",
+        "c": "gardening tomatoes compost",
+        "d": "tomatoes compost soil gardening",
+        "e": "django orm migrations python",
+    }
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(content_similarity, "_index", content_similarity._Index())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, post_id, text, status="published"):
+        return SimpleNamespace(pk=post_id, status=status, title=text, keywords="", description="", content="")
+
+    def _index(self, post_id, text, status="published"):
+        content_similarity.index_post(self._post(post_id, text, status))
+
+    def _assertSameIndex(self, index, expected):
+        self.assertEqual(sorted(index.rows), sorted(expected.rows))
+        np.testing.assert_array_equal(index.document_frequency, expected.document_frequency)
+        np.testing.assert_allclose(index.idf, expected.idf)
+        for post_id in expected.rows:
+            self.assertAlmostEqual(index.norms[index.rows[post_id]], expected.norms[expected.rows[post_id]], places=4)
+            self.assertEqual(index.similar(post_id, 3), expected.similar(post_id, 3))
+
+    def test_refresh_patches_changed_rows(self):
+        for post_id in "abcd":
+            self._index(post_id, self.TEXTS[post_id])
+        self.assertEqual(content_similarity.similar_post_ids("a", 1), ["b"])
+        loaded = content_similarity._index
+
+        # Cambiar, quitar y agregar posts: la copia parchada es igual a una recarga completa
+        self._index("b", "gardening soil compost")
+        self._index("c", self.TEXTS["c"], status="draft")
+        self._index("e", self.TEXTS["e"])
+        with mock.patch.object(content_similarity._Index, "load", side_effect=AssertionError):
+            self.assertEqual(content_similarity.similar_post_ids("a", 1), ["e"])
+        patched = content_similarity._index
+        self.assertIsNot(patched, loaded)
+        self.assertEqual(loaded.similar("a", 1), ["b"])
+
+        docs = {post_id.decode(): content_similarity._unpack(blob) for post_id, blob in self.redis.hgetall(
+            content_similarity.DOCS_KEY
+        ).items()}
+        self._assertSameIndex(patched, content_similarity._Index.load(patched.version, docs))
+
+    def test_rebuild_swaps_in_a_complete_copy(self):
+        for post_id in "ab":
+            self._index(post_id, self.TEXTS[post_id])
+        self.assertEqual(content_similarity.similar_post_ids("a", 1), ["b"])
+
+        def posts():
+            for post_id in "abd":
+                yield self._post(post_id, self.TEXTS[post_id])
+                # Mientras se arma la copia las consultas siguen con el indice anterior
+                self.assertEqual(self.redis.hlen(content_similarity.DOCS_KEY), 2)
+                if post_id == "a":
+                    self._index("a", self.TEXTS["a"], status="draft")
+                    self._index("e", self.TEXTS["e"])
+
+        self.assertEqual(content_similarity.rebuild(posts(), batch_size=1), 3)
+        # Los cambios hechos durante la reconstruccion se conservan
+        self.assertEqual(sorted(self.redis.hkeys(content_similarity.DOCS_KEY)), [b"b", b"d", b"e"])
+        self.assertEqual(self.redis.ttl(content_similarity.DOCS_KEY), -1)
+        self.assertEqual(content_similarity.similar_post_ids("b", 1), ["e"])
+        self.assertEqual(content_similarity.similar_post_ids("a", 1), [])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CacheTagsTest(FakeRedisMixin, TestCase):
+    redis_modules = (cache_tags,)
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.post = create_post(create_author(), "tagged-post")
+
+    def _store(self, key, *tags):
+        cache_tags.store(key, key, cache_tags.Dependencies(*tags), timeout=60)
+
+    def test_invalidation_drops_only_dependent_entries(self):
+        self._store("post_detail:a", cache_tags.post(self.post.id))
+        self._store("post_detail:b", cache_tags.post("other"))
+        self._store("post_list:1", cache_tags.POSTS, cache_tags.author(self.post.user_id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cache_tags.invalidate(cache_tags.post(self.post.id))
+        self.assertIsNone(cache_tags.fetch("post_detail:a"))
+        self.assertEqual(cache_tags.fetch("post_detail:b"), "post_detail:b")
+        self.assertEqual(cache_tags.fetch("post_list:1"), "post_list:1")
+
+    def test_saving_a_post_invalidates_its_tags_on_commit(self):
+        self._store("post_detail:a", cache_tags.post(self.post.id))
+        self._store("post_list:1", cache_tags.POSTS)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.post.title = "Retitled"
+            self.post.save()
+        # Hasta confirmar la transaccion las entradas siguen vigentes
+        self.assertEqual(cache_tags.fetch("post_detail:a"), "post_detail:a")
+
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache_tags.fetch("post_detail:a"))
+        self.assertIsNone(cache_tags.fetch("post_list:1"))
+
+    def test_nothing_is_cached_without_generations(self):
+        with self.assertLogs(cache_tags.logger, "WARNING"), mock.patch.object(self.redis, "mget", side_effect=redis.RedisError):
+            self._store("post_detail:a", cache_tags.post(self.post.id))
+        self.assertIsNone(cache.get("post_detail:a"))
+
+
+class HeadingsTest(TestCase):
+    def setUp(self):
+        self.post = create_post(create_author(), "headings-post")
+
+    def _headings(self):
+        return list(Heading.objects.filter(post=self.post).order_by("order").values_list("id", "level", "title"))
+
+    def test_extracts_headings_in_order(self):
+        content = '<h2 class="lead">Intro &amp; <em>setup</em></h2><p>Text</p><H3>Details</h3><h4> </h4>'
+        self.assertEqual(post_headings.extract_headings(content), [(2, "Intro & setup"), (3, "Details")])
+        self.assertEqual(post_headings.extract_headings("<p>No headings</p>"), [])
+
+    def test_content_hash_changes_with_the_content(self):
+        self.post.content = "<h2>New</h2>"
+        self.assertTrue(post_headings.refresh_content_hash(self.post))
+        self.assertFalse(post_headings.refresh_content_hash(self.post))
+
+    def test_sync_keeps_the_rows_of_unchanged_headings(self):
+        post_headings.sync_headings(self.post, [(2, "A"), (2, "B"), (3, "C")])
+        before = {title: heading_id for heading_id, _, title in self._headings()}
+
+        self.assertTrue(post_headings.sync_headings(self.post, [(2, "B"), (2, "A"), (3, "D")]))
+        after = self._headings()
+        self.assertEqual([(level, title) for _, level, title in after], [(2, "B"), (2, "A"), (3, "D")])
+        self.assertEqual([after[0][0], after[1][0]], [before["B"], before["A"]])
+        self.assertNotIn(before["C"], [heading_id for heading_id, _, _ in after])
+
+        # Sin cambios solo se leen los encabezados
+        with self.assertNumQueries(1):
+            self.assertFalse(post_headings.sync_headings(self.post, [(2, "B"), (2, "A"), (3, "D")]))
+
+
+class ImpressionSyncTest(FakeRedisMixin, TestCase):
+    redis_modules = (impressions,)
+
+    def setUp(self):
+        super().setUp()
+        author = create_author()
+        self.posts = [create_post(author, f"impressions-{i}") for i in range(3)]
+        self.ids = [str(post.id) for post in self.posts]
+
+    def _impressions(self):
+        return list(PostAnalytics.objects.filter(post__in=self.posts).order_by("post__slug").values_list("impressions", flat=True))
+
+    def test_deduplicates_per_client_window(self):
+        with mock.patch.object(impressions, "IMPRESSION_DEDUP_SECONDS", 60):
+            impressions.record(impressions.POST, ["a", "b", "a"], client="c1")
+            impressions.record(impressions.POST, ["a"], client="c1")
+            impressions.record(impressions.POST, ["a"], client="c2")
+        self.assertEqual(self.redis.hgetall("post:impressions"), {b"a": b"2", b"b": b"1"})
+        self.assertEqual(self.redis.ttl("post:impressions:seen:c1:a"), 60)
+
+    def test_iter_chunks_scans_the_processing_hash(self):
+        impressions.record(impressions.POST, self.ids)
+        self.assertTrue(impressions.begin_drain(impressions.POST))
+        chunks = list(impressions.iter_chunks(impressions.POST, chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+        self.assertEqual({key: 1 for chunk in chunks for key in chunk}, dict.fromkeys(self.ids, 1))
+
+    def test_impressions_recorded_during_a_sync_wait_for_the_next(self):
+        impressions.record(impressions.POST, self.ids)
+        impressions.record(impressions.POST, self.ids[:1])
+        ack = impressions.ack
+
+        def ack_and_record(kind, object_ids):
+            ack(kind, object_ids)
+            impressions.record(impressions.POST, self.ids[1:2])
+
+        with mock.patch.object(impressions, "ack", side_effect=ack_and_record):
+            tasks.sync_impressions_to_db()
+        self.assertEqual(self._impressions(), [2, 1, 1])
+        self.assertFalse(self.redis.exists("post:impressions:processing"))
+        self.assertEqual(self.redis.hgetall("post:impressions"), {self.ids[1].encode(): b"1"})
+
+        tasks.sync_impressions_to_db()
+        self.assertEqual(self._impressions(), [2, 2, 1])
+        self.assertFalse(self.redis.exists("post:impressions"))
+
+    def test_interrupted_drain_is_processed_first(self):
+        impressions.record(impressions.POST, self.ids[:1])
+        impressions.begin_drain(impressions.POST)
+        impressions.record(impressions.POST, self.ids[2:])
+
+        tasks.sync_impressions_to_db()
+        self.assertEqual(self._impressions(), [1, 0, 0])
+        self.assertEqual(self.redis.hgetall("post:impressions"), {self.ids[2].encode(): b"1"})
+
+
+class ImpressionsAfterResponseTest(FakeRedisMixin, TestCase):
+    redis_modules = (impressions,)
+
+    def test_records_when_the_response_is_closed(self):
+        response = impressions.record_ids_after_response(HttpResponse(), impressions.POST, ["a", "b"])
+        self.assertFalse(self.redis.exists("post:impressions"))
+
+        response.close()
+        self.assertEqual(self.redis.hgetall("post:impressions"), {b"a": b"1", b"b": b"1"})
+
+    def test_records_after_client_request(self):
+        post = create_post(create_author(), "impression-post")
+        with self.settings(VALID_API_KEYS=["test-key"]):
+            response = Client(HTTP_API_KEY="test-key").get("/api/blog/posts/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.redis.hget("post:impressions", str(post.id)), b"1")
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        author = create_author()
+        self.posts = [create_post(author, f"keyset-{i}", title=f"Post {i}") for i in range(5)]
+        # Misma fecha para todos: el orden lo decide el desempate por -id
+        Post.objects.update(created_at=self.posts[0].created_at)
+        self.expected = sorted((str(post.id) for post in self.posts), reverse=True)
+
+    def _page(self, query, ordering=("-created_at", "-id")):
+        paginator = KeysetPagination(ordering)
+        request = Request(APIRequestFactory().get(f"/api/blog/posts/?{query}"))
+        posts = paginator.paginate_queryset(Post.postobjects.select_related("post_analytics"), request)
+        return [str(post.id) for post in posts], paginator
+
+    def _cursor(self, link):
+        return urlparse(link).query
+
+    def _walk(self, ordering):
+        ids, paginator = self._page("page_size=2", ordering)
+        pages = [ids]
+        while paginator.next:
+            ids, paginator = self._page(self._cursor(paginator.next), ordering)
+            pages.append(ids)
+
+        back = [pages[-1]]
+        while paginator.previous:
+            ids, paginator = self._page(self._cursor(paginator.previous), ordering)
+            back.insert(0, ids)
+        self.assertEqual(back, pages)
+        return pages
+
+    def test_first_page_returns_cursor_links(self):
+        ids, paginator = self._page("page_size=2")
+        self.assertEqual(ids, self.expected[:2])
+        self.assertIsNone(paginator.count)
+        self.assertIsNone(paginator.previous)
+        self.assertIn("cursor=", paginator.next)
+        self.assertNotIn("p=", paginator.next)
+
+        # `p` sigue disponible, con su COUNT
+        ids, paginator = self._page("p=2&page_size=2")
+        self.assertEqual(ids, self.expected[2:4])
+        self.assertEqual(paginator.count, 5)
+
+    def test_cursor_encoding(self):
+        _, paginator = self._page("page_size=2")
+        cursor = urlparse(paginator.next).query.split("cursor=")[1].split("&")[0]
+        self.assertNotIn("=", cursor)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        self.assertEqual(payload["p"][1], self.expected[1])
+        self.assertFalse(payload["r"])
+        self.assertEqual(paginator._decode_cursor(cursor), (payload["p"], False))
+
+    def test_ties_are_broken_by_id(self):
+        self.assertEqual(self._walk(("-created_at", "-id")), [self.expected[:2], self.expected[2:4], self.expected[4:]])
+
+    def test_most_viewed_pages_over_analytics(self):
+        views = [5, 9, 5, 1, 9]
+        for post, count in zip(self.posts, views):
+            PostAnalytics.objects.filter(post=post).update(views=count)
+        expected = [str(post.id) for post, _ in sorted(zip(self.posts, views), key=lambda item: (-item[1], item[0].id))]
+
+        ordering = POST_SORTINGS["most_viewed"]
+        self.assertEqual(self._walk(ordering), [expected[:2], expected[2:4], expected[4:]])
+        # Las vistas de otra tabla se exigen no nulas: INNER JOIN, que deja usar su indice
+        with CaptureQueriesContext(connection) as queries:
+            self._page("page_size=2", ordering)
+        self.assertIn('INNER JOIN "blog_postanalytics"', queries[0]["sql"])
+
+    def test_tampered_cursor(self):
+        def encode(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+        created_at = self.posts[0].created_at.isoformat()
+        for cursor in (
+            "not-base64!",
+            encode(["a", "b"]),
+            encode({"p": [created_at]}),
+            encode({"p": [created_at, {"id": 1}]}),
+            encode({"p": ["yesterday", self.expected[0]]}),
+            encode({"p": [created_at, "not-a-uuid"]}),
+        ):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self._page(f"cursor={cursor}")
+
+
+@skipUnless(post_search.is_supported(), "Full-text search requires PostgreSQL")
+class PostSearchTest(FakeRedisMixin, TestCase):
+    redis_modules = (cache_tags, impressions, response_cache)
+
+    def setUp(self):
+        super().setUp()
+        author = create_author()
+        self.in_title = create_post(author, "search-title", title="Deploying Django")
+        self.in_content = create_post(author, "search-content", title="Release notes", content="<p>Upgraded Django</p>")
+        create_post(author, "search-other", title="Gardening")
+
+    def _search(self, query):
+        with self.settings(VALID_API_KEYS=["test-key"]):
+            response = Client(HTTP_API_KEY="test-key").get(f"/api/blog/posts/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def _similar(self, queryset, text):
+        # pg_trgm no siempre esta disponible: los parecidos son los posts "search-*"
+        return queryset.filter(slug__startswith="search-").annotate(
+            search_rank=Value(0.5, output_field=FloatField()),
+            search_headline=F("description"),
+        )
+
+    def test_content_ranks_below_the_title(self):
+        results = post_search.search_posts(Post.postobjects.all(), "django").order_by(*post_search.SEARCH_ORDERING)
+        self.assertEqual([post.id for post in results], [self.in_title.id, self.in_content.id])
+
+    def test_falls_back_only_when_the_search_is_empty(self):
+        with mock.patch.object(post_search, "similar_posts", side_effect=self._similar) as similar:
+            with CaptureQueriesContext(connection) as queries:
+                data = self._search("search=django")
+            self.assertEqual(len(data["results"]), 2)
+            similar.assert_not_called()
+            # Una sola consulta de texto completo: la de la pagina
+            self.assertEqual(sum("@@" in query["sql"] for query in queries), 1)
+
+            data = self._search("search=djnago&page_size=2&p=2")
+        self.assertEqual(similar.call_count, 1)
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(len(data["results"]), 1)
+
+
+@skipUnless(MigrationLoader.migrations_module("blog")[0], "Blog migrations are disabled")
+class MigrationsTest(TestCase):
+    def test_blog_models_have_migrations(self):
+        try:
+            call_command("makemigrations", "blog", check=True, dry_run=True, interactive=False, stdout=io.StringIO())
+        except SystemExit:
+            self.fail("Blog models changed without a migration, run makemigrations blog")
+
+
+class PartitionMonthsTest(TestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(partitions.add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(partitions.add_months(date(2024, 1, 1), -13), date(2022, 12, 1))
+        self.assertEqual(partitions.month_start(datetime(2024, 3, 31, 23, 30, tzinfo=dt_timezone.utc)), date(2024, 3, 1))
+        self.assertEqual(partitions.partition_name("blog_postview", date(2024, 3, 1)), "blog_postview_p202403")
+
+
+@skipUnless(partitions.is_supported(), "Partitioned tables require PostgreSQL")
+class PartitionMaintenanceTest(TestCase):
+    NOW = datetime(2025, 3, 15, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.post = create_post(create_author(), "partitioned-post")
+        for month in (1, 2, 3):
+            interaction = PostInteraction.objects.create(post=self.post, interaction_type="like")
+            PostInteraction.objects.filter(id=interaction.id).update(
+                timestamp=datetime(2025, month, 10, tzinfo=dt_timezone.utc)
+            )
+
+    def _interactions(self):
+        return sorted(PostInteraction.objects.values_list("timestamp__month", flat=True))
+
+    def test_convert_and_maintain(self):
+        table = PostInteraction._meta.db_table
+        self.assertFalse(partitions.is_partitioned(table))
+        # Verificar ya las claves foraneas diferidas de setUp, que en produccion
+        # estan confirmadas: con verificaciones pendientes no se puede borrar la tabla vieja
+        connection.check_constraints()
+
+        # Enero a marzo con filas, mas un mes adelante
+        self.assertEqual(partitions.convert(PostInteraction, months_ahead=1, now=self.NOW), 4)
+        self.assertTrue(partitions.is_partitioned(table))
+        self.assertEqual(
+            set(partitions.partitions(table)), {date(2025, month, 1) for month in (1, 2, 3, 4)}
+        )
+        self.assertEqual(self._interactions(), [1, 2, 3])
+        # La tabla sigue funcionando con sus claves foraneas y el ORM
+        PostInteraction.objects.create(post=self.post, interaction_type="share")
+
+        # En mayo, conservando dos meses completos: se crean mayo y junio y se separan enero y febrero
+        created, detached = partitions.maintain(
+            PostInteraction, now=datetime(2025, 5, 2, tzinfo=dt_timezone.utc), months_ahead=1, retention_months=2
+        )
+        self.assertEqual(created, [f"{table}_p202505", f"{table}_p202506"])
+        self.assertEqual(detached, [f"{table}_p202501", f"{table}_p202502"])
+        self.assertEqual(
+            set(partitions.partitions(table)), {date(2025, month, 1) for month in (3, 4, 5, 6)}
+        )
+        self.assertNotIn(1, self._interactions())
+
+        # Idempotente
+        self.assertEqual(
+            partitions.maintain(
+                PostInteraction, now=datetime(2025, 5, 2, tzinfo=dt_timezone.utc), months_ahead=1, retention_months=2
+            ),
+            ([], []),
+        )
+
+
+class RollupTest(TestCase):
+    DAY = datetime(2025, 3, 10, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        self.author, other = create_author(), create_author("other")
+        self.posts = [
+            create_post(user, f"rollup-{i}", title=f"Post {i}")
+            for i, user in enumerate((self.author, self.author, other))
+        ]
+
+    def _interact(self, post, interaction_type, hour, minute=0):
+        interaction = PostInteraction.objects.create(post=post, interaction_type=interaction_type)
+        PostInteraction.objects.filter(id=interaction.id).update(timestamp=self.DAY.replace(hour=hour, minute=minute))
+
+    def test_hours_and_days(self):
+        first, second, other = self.posts
+        self._interact(first, "view", 9)
+        self._interact(first, "view", 9, 30)
+        self._interact(first, "like", 10)
+        self._interact(second, "share", 9)
+        self._interact(other, "view", 9)
+
+        for _ in range(2):
+            # Repetir la pasada sobrescribe los conteos, no los suma
+            self.assertEqual(rollups.rollup_hours(self.DAY), 4)
+        self.assertEqual(PostHourlyRollup.objects.count(), 4)
+
+        nine = self.DAY.replace(hour=9)
+        self.assertEqual(
+            list(PostHourlyRollup.objects.filter(post=first, hour=nine).values_list("views", "likes", "score")),
+            [(2, 0, 2.0)],
+        )
+        # El autor suma sus dos posts en cada hora; el otro autor queda aparte
+        self.assertEqual(
+            list(AuthorHourlyRollup.objects.filter(user=self.author, hour=nine).values_list("views", "shares", "score")),
+            [(2, 1, 2.0 + trending.INTERACTION_WEIGHTS["share"])],
+        )
+        self.assertEqual(AuthorHourlyRollup.objects.get(user=other.user, hour=nine).views, 1)
+
+        # Un evento nuevo en una hora ya consolidada actualiza la fila
+        self._interact(first, "like", 10, 45)
+        rollups.rollup_hours(self.DAY.replace(hour=10))
+        self.assertEqual(PostHourlyRollup.objects.get(post=first, hour=self.DAY.replace(hour=10)).likes, 2)
+
+        for _ in range(2):
+            self.assertEqual(rollups.rollup_days(self.DAY), 3)
+        day = self.DAY.date()
+        self.assertEqual(
+            list(PostDailyRollup.objects.filter(post=first, date=day).values_list("views", "likes")), [(2, 2)]
+        )
+        self.assertEqual(
+            list(AuthorDailyRollup.objects.filter(user=self.author, date=day).values_list("views", "likes", "shares")),
+            [(2, 2, 1)],
+        )
+        self.assertEqual(AuthorDailyRollup.objects.count(), 2)
+
+
+@mock.patch.object(abuse, "LIMITS", {"like": {"ip": (10, 60)}})
+class AbuseCheckTest(FakeRedisMixin, TestCase):
+    redis_modules = (abuse,)
+
+    def _hits(self, count, now):
+        return [abuse._hit_script(keys=["abuse:like:ip:10.0.0.1"], args=[now, 60])[0] for _ in range(count)]
+
+    def _check(self, now, mode):
+        request = APIRequestFactory().post("/api/blog/post/like/", REMOTE_ADDR="10.0.0.1")
+        # Solo el reloj del modulo: fakeredis sigue venciendo las claves con la hora real
+        with mock.patch.object(abuse, "time", SimpleNamespace(time=lambda: now)):
+            return abuse.check(request, "like", mode=mode)
+
+    def test_estimate_weights_previous_window(self):
+        # Ventanas de 60 s: 650 cae en la ventana 10 y 675 en la 11, con un cuarto ya transcurrido
+        self.assertEqual([float(estimate) for estimate in self._hits(8, 650)], list(range(1, 9)))
+        self.assertEqual(self.redis.ttl("abuse:like:ip:10.0.0.1:10"), 120)
+        self.assertEqual([float(estimate) for estimate in self._hits(2, 675)], [1 + 8 * 0.75, 2 + 8 * 0.75])
+        # Una ventana despues la anterior ya no pesa
+        self.assertEqual(float(self._hits(1, 780)[0]), 1)
+
+    def test_shadow_logs_without_blocking(self):
+        self._hits(8, 650)
+        for _ in range(4):
+            self.assertIsNone(self._check(675, abuse.SHADOW))
+        with self.assertLogs(abuse.logger, "WARNING") as logs:
+            self.assertIsNone(self._check(675, abuse.SHADOW))
+        self.assertIn("ip 10.0.0.1 over 10/60s", logs.output[0])
+
+    def test_enforce_returns_window(self):
+        self._hits(8, 650)
+        for _ in range(4):
+            self.assertIsNone(self._check(675, abuse.ENFORCE))
+        with self.assertLogs(abuse.logger, "WARNING"):
+            self.assertEqual(self._check(675, abuse.ENFORCE), 60)
+        self.assertIsNone(self._check(675, abuse.OFF))
+
+    def test_redis_errors_let_requests_through(self):
+        with mock.patch.object(abuse, "_hit_script", side_effect=abuse.redis.RedisError):
+            with self.assertLogs(abuse.logger, "WARNING"):
+                self.assertIsNone(self._check(675, abuse.ENFORCE))
+
+
+class ClientEventParseTest(TestCase):
+    def test_duplicates_and_invalid_events_are_rejected(self):
+        batch = [
+            {"type": "impression", "slug": "first"},
+            {"type": "impression", "target": "post", "slug": "first"},
+            {"type": "click", "target": "category", "slug": "tech"},
+            {"type": "share", "slug": "first", "platform": "X"},
+            {"type": "share", "slug": "first", "platform": "x"},
+            {"type": "share", "slug": "first"},
+            {"type": "view", "slug": "first"},
+            # Vista de una categoria, tipo desconocido, slug vacio o muy largo, plataforma invalida
+            {"type": "view", "target": "category", "slug": "tech"},
+            {"type": "scroll", "slug": "first"},
+            {"type": "click", "slug": ""},
+            {"type": "click", "slug": "x" * (client_events.MAX_SLUG_LENGTH + 1)},
+            {"type": "share", "slug": "first", "platform": "myspace"},
+            "first",
+        ]
+        valid, rejected = client_events.parse(batch)
+        self.assertEqual(
+            valid,
+            [
+                ("impression", "post", "first", ""),
+                ("click", "category", "tech", ""),
+                ("share", "post", "first", "x"),
+                ("share", "post", "first", "other"),
+                ("view", "post", "first", ""),
+            ],
+        )
+        # Los repetidos cuentan como descartados: aceptados + descartados = eventos enviados
+        self.assertEqual(rejected, 8)
+        self.assertEqual(len(valid) + rejected, len(batch))
+
+    def test_invalid_batches(self):
+        self.assertEqual(client_events.parse([]), ([], 0))
+        for batch in (None, {"type": "view", "slug": "first"}, "first"):
+            with self.assertRaises(ValueError):
+                client_events.parse(batch)
+        with mock.patch.object(client_events, "MAX_EVENTS", 2):
+            self.assertEqual(client_events.parse([{}, {}]), ([], 2))
+            with self.assertRaises(ValueError):
+                client_events.parse([{}, {}, {}])
+
+
+class RelatedPostsTest(FakeRedisMixin, TestCase):
+    redis_modules = (recommendations,)
+
+    def test_matrix_sums_repeated_interactions_across_chunks(self):
+        interactions = [
+            (1, None, "a", "view", 1.0),
+            (None, "10.0.0.1", "b", "like", 1.0),
+            (1, None, "a", "view", 1.0),
+            (1, None, "b", "share", 0.5),
+            # Sin puntaje: no ocupa fila ni columna
+            (2, None, "c", "unknown", 1.0),
+        ]
+        matrix, post_ids = recommendations.interaction_matrix(iter(interactions), chunk_size=2)
+        self.assertEqual(post_ids, ["a", "b"])
+        expected = [
+            [2 * trending.interaction_score("view"), trending.interaction_score("share", 0.5)],
+            [0, trending.interaction_score("like")],
+        ]
+        np.testing.assert_array_equal(matrix.toarray(), expected)
+
+        matrix, post_ids = recommendations.interaction_matrix(iter([]))
+        self.assertEqual((matrix.shape, post_ids), ((0, 0), []))
+
+    def test_stores_neighbours_by_similarity(self):
+        interactions = [
+            (user_id, None, post_id, "like", 1.0)
+            for user_id, post_ids in ((1, "abc"), (2, "ab"), (3, "d"))
+            for post_id in post_ids
+        ]
+        matrix, post_ids = recommendations.interaction_matrix(iter(interactions))
+        neighbours = recommendations.top_neighbours(matrix, top_k=2, block_size=3)
+
+        self.assertEqual(recommendations.store(post_ids, neighbours), 3)
+        self.assertEqual(recommendations.related_post_ids("a"), ["b", "c"])
+        self.assertEqual(recommendations.related_post_ids("c"), ["a", "b"])
+        # "d" no comparte lectores con ningun otro post
+        self.assertEqual(recommendations.related_post_ids("d"), [])
+
+
+class PostSlugsTest(FakeRedisMixin, TestCase):
+    redis_modules = (post_slugs, content_similarity, cache_tags)
+
+    def test_unknown_slugs_are_cached_until_published(self):
+        post = create_post(create_author(), "known")
+        self.assertEqual(post_slugs.resolve(["known", "unknown"]), {"known": (str(post.id), str(post.category_id))})
+        self.assertEqual(post_slugs.resolve_categories(["tech", "nope"]), {"tech": str(post.category_id)})
+
+        # Ni los slugs encontrados ni los desconocidos vuelven a consultar la base de datos
+        with self.assertNumQueries(0):
+            self.assertEqual(list(post_slugs.resolve(["known", "unknown"])), ["known"])
+            self.assertEqual(list(post_slugs.resolve_categories(["tech", "nope"])), ["tech"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            published = create_post(post.user, "unknown")
+        self.assertEqual(post_slugs.resolve(["unknown"]), {"unknown": (str(published.id), str(post.category_id))})
+
+        # Vencido el plazo, el slug desconocido se vuelve a buscar
+        later = self.redis.zscore(post_slugs._missing_key(post_slugs.CATEGORY_SLUGS_KEY), "nope") + 1
+        with mock.patch.object(post_slugs, "time", SimpleNamespace(time=lambda: later)):
+            with self.assertNumQueries(1):
+                self.assertEqual(post_slugs.resolve_categories(["nope"]), {})
+
+
+class RepliesCountTest(TestCase):
+    def test_counts_active_replies_only(self):
+        author = create_author()
+        post = create_post(author, "thread-post")
+        parent = Comment.objects.create(user=author, post=post, content="Top")
+
+        def reply(**fields):
+            return Comment.objects.create(user=author, post=post, parent=parent, content="Reply", **fields)
+
+        def replies_count():
+            return Comment.objects.get(pk=parent.pk).replies_count
+
+        first, second = reply(), reply()
+        reply(is_active=False)
+        self.assertEqual(replies_count(), 2)
+
+        first.is_active = False
+        first.save()
+        self.assertEqual(replies_count(), 1)
+        # Guardar otra vez sin cambiar el estado no vuelve a restar
+        Comment.objects.get(pk=first.pk).save()
+        self.assertEqual(replies_count(), 1)
+
+        first.is_active = True
+        first.save()
+        second.delete()
+        self.assertEqual(replies_count(), 1)
+
+        # La reconstruccion de las rutas llega al mismo conteo
+        threads.rebuild_paths(Comment)
+        self.assertEqual(replies_count(), 1)
@@ -0,0 +1,146 @@
+"""
+Hilos de comentarios con ruta materializada.
+
+Cada comentario guarda en `path` la ruta desde el comentario raiz: un segmento de
+ancho fijo por nivel, formado por la fecha de creacion en base 36 y parte de su id.
+Ordenar por `path` recorre los hilos en profundidad y en orden cronologico, y un
+subarbol completo es un rango de `path` (prefijo), asi que cualquier hilo, o los
+primeros N niveles de la discusion de un post, se obtienen con una sola consulta.
+"""
+import datetime
+import string
+
+from django.db.models import Count, Q
+
+DIGITS = string.digits + string.ascii_lowercase
+
+TIME_WIDTH = 10
+ID_WIDTH = 4
+SEGMENT_LENGTH = TIME_WIDTH + ID_WIDTH
+
+# 18 niveles caben en el max_length=255 de Comment.path
+MAX_DEPTH = 17
+
+EPOCH = datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _base36(number, width):
+    digits = []
+    while number:
+        number, remainder = divmod(number, 36)
+        digits.append(DIGITS[remainder])
+    return "".join(reversed(digits)).rjust(width, "0")
+
+
+def segment(created_at, comment_id):
+    microseconds = int((created_at - EPOCH).total_seconds() * 1_000_000)
+    return _base36(max(microseconds, 0), TIME_WIDTH) + comment_id.hex[:ID_WIDTH]
+
+
+def make_segment(comment):
+    return segment(comment.created_at, comment.id)
+
+
+def assign_path(comment):
+    """
+    Calcula `path` y `depth` de un comentario nuevo a partir de su padre.
+    """
+    if comment.parent_id is None:
+        comment.depth = 0
+        comment.path = make_segment(comment)
+        return
+
+    parent = comment.parent
+    if parent.depth >= MAX_DEPTH:
+        raise ValueError(f"Comments can't be nested more than {MAX_DEPTH} levels deep")
+    comment.depth = parent.depth + 1
+    comment.path = parent.path + make_segment(comment)
+
+
+def parse_depth(value, default):
+    """
+    Niveles de respuestas pedidos en la peticion, entre 0 y MAX_DEPTH.
+    """
+    try:
+        depth = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(max(depth, 0), MAX_DEPTH)
+
+
+def parent_path(path):
+    return path[:-SEGMENT_LENGTH]
+
+
+def post_thread(queryset, post, depth):
+    """
+    Comentarios de un post hasta `depth` niveles por debajo de los principales,
+    ordenados por ruta. Los principales se incluyen aunque esten inactivos.
+    """
+    return queryset.filter(post=post, depth__lte=depth).filter(
+        Q(depth=0) | Q(is_active=True)
+    ).order_by("path")
+
+
+def comment_thread(queryset, comment, depth):
+    """
+    Respuestas activas de `comment` hasta `depth` niveles, ordenadas por ruta.
+    """
+    return queryset.filter(
+        post_id=comment.post_id,
+        path__startswith=comment.path,
+        depth__gt=comment.depth,
+        depth__lte=comment.depth + depth,
+        is_active=True,
+    ).order_by("path")
+
+
+def build_tree(comments, serialized, root_depth):
+    """
+    Anida los comentarios serializados (en el mismo orden que `comments`, por ruta)
+    en listas `replies` y devuelve los de profundidad `root_depth`. Las respuestas
+    de un comentario que no esta en la lista (p. ej. inactivo) se omiten.
+    """
+    nodes = {}
+    roots = []
+    for comment, data in zip(comments, serialized):
+        data = dict(data)
+        data["replies"] = []
+        nodes[comment.path] = data
+        if comment.depth == root_depth:
+            roots.append(data)
+        else:
+            parent = nodes.get(parent_path(comment.path))
+            if parent is not None:
+                parent["replies"].append(data)
+    return roots
+
+
+def rebuild_paths(comment_model):
+    """
+    Recalcula path, depth y replies_count de todos los comentarios, de padres a hijos.
+    Util para comentarios creados antes de que existiera la ruta materializada.
+    """
+    pending = list(comment_model.objects.filter(parent__isnull=True))
+    updated = 0
+    while pending:
+        for comment in pending:
+            assign_path(comment)
+        comment_model.objects.bulk_update(pending, ["path", "depth"], batch_size=500)
+        updated += len(pending)
+        parents = {comment.id: comment for comment in pending}
+        pending = list(comment_model.objects.filter(parent_id__in=list(parents)))
+        for comment in pending:
+            comment.parent = parents[comment.parent_id]
+
+    counts = dict(
+        comment_model.objects.filter(is_active=True, parent__isnull=False)
+        .values_list("parent_id")
+        .annotate(total=Count("id"))
+        .values_list("parent_id", "total")
+    )
+    comments = list(comment_model.objects.only("id", "replies_count"))
+    for comment in comments:
+        comment.replies_count = counts.get(comment.id, 0)
+    comment_model.objects.bulk_update(comments, ["replies_count"], batch_size=500)
+    return updated
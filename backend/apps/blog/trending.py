@@ -0,0 +1,284 @@
+"""
+Ranking de tendencias con puntajes de decaimiento exponencial en Redis.
+
+Cada interaccion suma `peso * e^((t - epoca) / tau)` (decaimiento hacia adelante)
+en sorted sets: el de todos los posts, `trending:posts`, el de los posts de cada
+categoria, `trending:category:<id>:posts`, y el de las categorias,
+`trending:categories`. Si un post cambia de categoria su puntaje pasa al set de
+la nueva. Como todos los puntajes comparten el mismo factor de
+decaimiento, el orden no cambia con el tiempo y el top N se lee con un
+ZREVRANGE en O(log n + N), sin recalcular ni ordenar la tabla de posts. El
+orden por tendencia de los listados (pagination.TrendingPagination) recorre el
+ranking por tramos y solo trae de la base de datos los posts de cada tramo. El
+puntaje real es `guardado * e^(-(ahora - epoca) / tau)`.
+
+Para que los puntajes no crezcan sin limite, la tarea snapshot_trending_scores
+cambia periodicamente la epoca (reescalando los sets), descarta los puntajes
+despreciables y guarda los puntajes actuales en PostAnalytics / CategoryAnalytics.
+"""
+import heapq
+import logging
+import math
+import time
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+PREFIX = "trending"
+POSTS_KEY = f"{PREFIX}:posts"
+CATEGORIES_KEY = f"{PREFIX}:categories"
+EPOCH_KEY = f"{PREFIX}:epoch"
+# Categorias con set de posts, para reescalarlos sin SCAN
+CATEGORY_IDS_KEY = f"{PREFIX}:category_ids"
+
+# Vida media de los puntajes: una interaccion vale la mitad despues de este tiempo
+HALF_LIFE = getattr(settings, "BLOG_TRENDING_HALF_LIFE", 60 * 60 * 24)
+TAU = HALF_LIFE / math.log(2)
+
+# Peso de cada tipo de interaccion, multiplicado por PostInteraction.weight
+INTERACTION_WEIGHTS = {
+    "view": 1.0,
+    "like": 3.0,
+    "comment": 4.0,
+    "share": 6.0,
+}
+
+# La epoca se mueve cuando los factores pasan de e^REBASE_AFTER
+REBASE_AFTER = 20
+# Puntajes actuales por debajo de este valor se descartan
+MIN_SCORE = 0.01
+
+# Posts del ranking que se consideran al ordenar un listado por tendencia;
+# los demas van despues, del mas nuevo al mas viejo
+CANDIDATES = 500
+
+
+def _category_posts_key(category_id):
+    return f"{PREFIX}:category:{category_id}:posts"
+
+
+# KEYS[1] = epoca, KEYS[2] = posts, KEYS[3] = categorias, KEYS[4] = ids de categorias,
+# KEYS[5..] = sets de posts de las categorias del lote
+# ARGV[1] = ahora, ARGV[2] = tau, ARGV[3..] = (post_id, category_id, peso, indice en KEYS
+# del set de la categoria o 0)
+_record_script = redis_client.register_script("""
+local now = tonumber(ARGV[1])
+local tau = tonumber(ARGV[2])
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    epoch = now
+    redis.call('SET', KEYS[1], epoch)
+end
+local factor = math.exp((now - epoch) / tau)
+for i = 3, #ARGV, 4 do
+    local post_id = ARGV[i]
+    local category_id = ARGV[i + 1]
+    local score = tonumber(ARGV[i + 2]) * factor
+    local category_key = tonumber(ARGV[i + 3])
+    redis.call('ZINCRBY', KEYS[2], score, post_id)
+    if category_key > 0 then
+        redis.call('ZINCRBY', KEYS[category_key], score, post_id)
+        redis.call('ZINCRBY', KEYS[3], score, category_id)
+        redis.call('SADD', KEYS[4], category_id)
+    end
+end
+return #ARGV
+""")
+
+# Mueve la epoca a `ahora` reescalando todos los sets y descarta los puntajes despreciables.
+# KEYS[1..4] como en _record_script, KEYS[5..] = sets de posts de las categorias ARGV[6..]
+# ARGV[1] = ahora, ARGV[2] = tau, ARGV[3] = puntaje minimo, ARGV[4] = REBASE_AFTER,
+# ARGV[5] = numero de categorias. Si las categorias ya no son las de KEYS[4] devuelve -1
+# sin tocar nada, para que se vuelva a intentar con las actuales
+_rebase_script = redis_client.register_script("""
+local now = tonumber(ARGV[1])
+local tau = tonumber(ARGV[2])
+local min_score = tonumber(ARGV[3])
+local epoch = tonumber(redis.call('GET', KEYS[1]))
+if not epoch then
+    return 0
+end
+if redis.call('SCARD', KEYS[4]) ~= tonumber(ARGV[5]) then
+    return -1
+end
+for i = 6, #ARGV do
+    if redis.call('SISMEMBER', KEYS[4], ARGV[i]) == 0 then
+        return -1
+    end
+end
+local elapsed = (now - epoch) / tau
+local factor = 1
+if elapsed > tonumber(ARGV[4]) then
+    factor = math.exp(-elapsed)
+    redis.call('SET', KEYS[1], now)
+    elapsed = 0
+end
+local threshold = min_score * math.exp(elapsed)
+for index = 2, #KEYS do
+    if index ~= 4 then
+        local key = KEYS[index]
+        if factor ~= 1 then
+            redis.call('ZUNIONSTORE', key, 1, key, 'WEIGHTS', factor)
+        end
+        redis.call('ZREMRANGEBYSCORE', key, '-inf', '(' .. threshold)
+        if index > 4 and redis.call('EXISTS', key) == 0 then
+            redis.call('SREM', KEYS[4], ARGV[index + 1])
+        end
+    end
+end
+return #KEYS - 2
+""")
+
+# Pasa el puntaje de un post del set de su categoria anterior al de la nueva.
+# KEYS[1] = set de la categoria anterior, KEYS[2] = set de la nueva, KEYS[3] = categorias,
+# KEYS[4] = ids de categorias. ARGV[1] = post_id, ARGV[2] = categoria anterior, ARGV[3] = nueva
+_move_script = redis_client.register_script("""
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZINCRBY', KEYS[3], -score, ARGV[2])
+if ARGV[3] ~= '' then
+    redis.call('ZINCRBY', KEYS[2], score, ARGV[1])
+    redis.call('ZINCRBY', KEYS[3], score, ARGV[3])
+    redis.call('SADD', KEYS[4], ARGV[3])
+end
+return 1
+""")
+
+# Intentos de rebase si cambian las categorias entre leerlas y reescalar
+REBASE_ATTEMPTS = 3
+
+
+def _keys():
+    return [EPOCH_KEY, POSTS_KEY, CATEGORIES_KEY, CATEGORY_IDS_KEY]
+
+
+def interaction_score(interaction_type, weight=1.0):
+    return INTERACTION_WEIGHTS.get(interaction_type, 0) * (weight if weight is not None else 1.0)
+
+
+def record(events, now=None):
+    """
+    Suma interacciones al ranking en una sola llamada a Redis: [(post_id, category_id, score)].
+    """
+    keys = _keys()
+    # Redis exige declarar en KEYS todas las claves que toca el script
+    category_keys = {}
+    args = []
+    for post_id, category_id, score in events:
+        if not score:
+            continue
+        category_key = 0
+        if category_id:
+            category_key = category_keys.get(category_id)
+            if category_key is None:
+                keys.append(_category_posts_key(category_id))
+                category_key = category_keys[category_id] = len(keys)
+        args.extend([str(post_id), str(category_id) if category_id else "", score, category_key])
+    if not args:
+        return
+
+    try:
+        _record_script(keys=keys, args=[now or time.time(), TAU, *args])
+    except redis.RedisError as e:
+        # Perder una interaccion del ranking es preferible a fallar la peticion
+        logger.error(f"Could not record trending scores: {str(e)}")
+
+
+def record_on_commit(events):
+    """
+    Suma las interacciones cuando se confirma la transaccion que las guardo.
+    """
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: record(events))
+
+
+def rebase(now=None):
+    """
+    Mueve la epoca si hace falta y descarta los puntajes despreciables.
+    """
+    now = now or time.time()
+    for _ in range(REBASE_ATTEMPTS):
+        category_ids = [category_id.decode() for category_id in redis_client.smembers(CATEGORY_IDS_KEY)]
+        rebased = _rebase_script(
+            keys=[*_keys(), *[_category_posts_key(category_id) for category_id in category_ids]],
+            args=[now, TAU, MIN_SCORE, REBASE_AFTER, len(category_ids), *category_ids],
+        )
+        if rebased != -1:
+            return
+    logger.warning("Could not rebase trending scores: the categories kept changing")
+
+
+def move_post(post_id, previous_category_id, category_id):
+    """
+    Pasa el puntaje de un post que cambio de categoria al set de la nueva.
+    """
+    try:
+        _move_script(
+            keys=[
+                _category_posts_key(previous_category_id),
+                _category_posts_key(category_id),
+                CATEGORIES_KEY,
+                CATEGORY_IDS_KEY,
+            ],
+            args=[str(post_id), str(previous_category_id), str(category_id) if category_id else ""],
+        )
+    except redis.RedisError as e:
+        logger.error(f"Could not move trending score of post {post_id}: {str(e)}")
+
+
+def _decay_factor(now=None):
+    epoch = redis_client.get(EPOCH_KEY)
+    if epoch is None:
+        return 0.0
+    return math.exp(-((now or time.time()) - float(epoch)) / TAU)
+
+
+def top_posts(limit=CANDIDATES, category_ids=None, start=0):
+    """
+    Ids de los posts con mayor puntaje, de mayor a menor, desde la posicion `start`
+    del ranking. Con `category_ids` solo se consideran los posts de esas categorias
+    (p. ej. un subarbol).
+    """
+    stop = start + limit - 1
+    if category_ids is None:
+        return [post_id.decode() for post_id in redis_client.zrevrange(POSTS_KEY, start, stop)]
+
+    pipe = redis_client.pipeline(transaction=False)
+    for category_id in category_ids:
+        pipe.zrevrange(_category_posts_key(category_id), 0, stop, withscores=True)
+    ranked = heapq.merge(*pipe.execute(), key=lambda item: item[1], reverse=True)
+    return [post_id.decode() for post_id, _ in ranked][start:stop + 1]
+
+
+def current_scores(key=POSTS_KEY, now=None):
+    """
+    Puntajes actuales (ya decaidos) de todos los miembros de un set: {"<id>": puntaje}.
+    """
+    factor = _decay_factor(now)
+    return {
+        member.decode(): score * factor
+        for member, score in redis_client.zrange(key, 0, -1, withscores=True)
+    }
+
+
+def is_empty():
+    return not redis_client.exists(POSTS_KEY)
+
+
+def restore(post_scores, now=None):
+    """
+    Vuelve a cargar el ranking desde los puntajes guardados en la base de datos:
+    [(post_id, category_id, puntaje actual)]. La epoca pasa a ser `now`.
+    """
+    now = now or time.time()
+    redis_client.set(EPOCH_KEY, now)
+    record(post_scores, now=now)
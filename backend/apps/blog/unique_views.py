@@ -0,0 +1,135 @@
+"""
+Conteo de visitantes unicos por post y por categoria.
+
+En modo "hll" (por defecto) cada objeto tiene un HyperLogLog total,
+`uv:<kind>:<id>`, y uno por dia, `uv:<kind>:<id>:<YYYYMMDD>`, de modo que la
+memoria y las escrituras por objeto son constantes sin importar el trafico
+(~12KB por HyperLogLog, error estandar ~0.81%). Un set diario con los objetos
+visitados permite consolidar los conteos diarios en la base de datos sin SCAN.
+
+El modo "exact" mantiene las tablas PostView / CategoryView, util para auditorias.
+"""
+import datetime
+
+import redis
+from django.conf import settings
+
+redis_client = redis.StrictRedis(host=settings.REDIS_HOST, port=6379, db=0)
+
+HLL = "hll"
+EXACT = "exact"
+
+MODE = getattr(settings, "BLOG_UNIQUE_VIEWS_MODE", HLL)
+
+# Los HyperLogLog diarios se conservan hasta que se consolidan en la base de datos
+DAY_KEY_TTL = 60 * 60 * 24 * 3
+
+# KEYS[1] = clave temporal, KEYS[i + 1] = HyperLogLog total de la visita i, ARGV[i] = visitante.
+# Prueba cada visitante en una copia del HyperLogLog, sin modificarlo
+_is_new_script = redis_client.register_script("""
+local new = {}
+for i = 2, #KEYS do
+    redis.call('DEL', KEYS[1])
+    redis.call('PFMERGE', KEYS[1], KEYS[i])
+    new[i - 1] = redis.call('PFADD', KEYS[1], ARGV[i - 1])
+end
+redis.call('DEL', KEYS[1])
+return new
+""")
+
+
+def is_exact():
+    return MODE == EXACT
+
+
+def visitor_id(user_id, ip_address):
+    """
+    Identifica al visitante: el usuario si esta autenticado o su IP.
+    """
+    return f"u:{user_id}" if user_id else f"ip:{ip_address}"
+
+
+def _total_key(kind, object_id):
+    return f"uv:{kind}:{object_id}"
+
+
+def _day_key(kind, object_id, day):
+    return f"uv:{kind}:{object_id}:{day:%Y%m%d}"
+
+
+def _active_key(kind, day):
+    return f"uv:{kind}:active:{day:%Y%m%d}"
+
+
+def _scratch_key(kind):
+    return f"uv:{kind}:scratch"
+
+
+def is_new(kind, visits):
+    """
+    Indica, por cada visita [(object_id, visitor, day)], si el visitante es nuevo
+    para el objeto, sin registrarla. Sirve para registrar las visitas con `add`
+    solo despues de guardar en la base de datos lo que depende de ellas.
+    """
+    if not visits:
+        return []
+
+    keys = [_total_key(kind, str(object_id)) for object_id, _, _ in visits]
+    visitors = [visitor for _, visitor, _ in visits]
+    return [bool(new) for new in _is_new_script(keys=[_scratch_key(kind), *keys], args=visitors)]
+
+
+def add(kind, visits):
+    """
+    Registra visitas [(object_id, visitor, day)] en una sola llamada a Redis.
+
+    Devuelve, por cada visita, True si el visitante es nuevo para el objeto.
+    """
+    if not visits:
+        return []
+
+    pipe = redis_client.pipeline(transaction=False)
+    for object_id, visitor, day in visits:
+        object_id = str(object_id)
+        day_key = _day_key(kind, object_id, day)
+        active_key = _active_key(kind, day)
+        pipe.pfadd(_total_key(kind, object_id), visitor)
+        pipe.pfadd(day_key, visitor)
+        pipe.expire(day_key, DAY_KEY_TTL)
+        pipe.sadd(active_key, object_id)
+        pipe.expire(active_key, DAY_KEY_TTL)
+    results = pipe.execute()
+
+    return [bool(results[index * 5]) for index in range(len(visits))]
+
+
+def count(kind, object_ids):
+    """
+    Visitantes unicos estimados de cada objeto: {"<id>": n}.
+    """
+    object_ids = [str(object_id) for object_id in object_ids]
+    pipe = redis_client.pipeline(transaction=False)
+    for object_id in object_ids:
+        pipe.pfcount(_total_key(kind, object_id))
+    return dict(zip(object_ids, pipe.execute()))
+
+
+def day_counts(kind, day):
+    """
+    Visitantes unicos estimados de un dia para cada objeto visitado ese dia.
+    """
+    object_ids = [object_id.decode() for object_id in redis_client.smembers(_active_key(kind, day))]
+    if not object_ids:
+        return {}
+
+    pipe = redis_client.pipeline(transaction=False)
+    for object_id in object_ids:
+        pipe.pfcount(_day_key(kind, object_id, day))
+    return dict(zip(object_ids, pipe.execute()))
+
+
+def rollup_days(today, days=2):
+    """
+    Dias a consolidar: hoy (parcial) y los anteriores.
+    """
+    return [today - datetime.timedelta(days=offset) for offset in range(days)]
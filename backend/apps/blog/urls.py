@@ -3,7 +3,11 @@ from django.urls import path
 from .views import (
     PostListView, 
     PostDetailView, 
+    PostDwellBeaconView,
+    ClientEventBatchView,
     PostHeadingsView, 
+    RelatedPostsView,
+    SimilarPostsView,
     IncrementPostClickView,
     CategoryListView,
     CategoryDetailView,
@@ -17,6 +21,7 @@ from .views import (
     PostLikeViews,
     PostShareView,
     PostAuthorViews,
+    AuthorAnalyticsView,
     DetailPostView,
     CategoriesListView,
     DetailCategoryView
@@ -28,6 +33,10 @@ urlpatterns = [
     path('posts/', PostListView.as_view(), name='post-list'),
     path('post/', PostDetailView.as_view(), name='post-detail'),
     path('post/headings/', PostHeadingsView.as_view(), name='post-headings'),
+    path('post/beacon/', PostDwellBeaconView.as_view(), name='post-beacon'),
+    path('events/', ClientEventBatchView.as_view(), name='client-events'),
+    path('post/related/', RelatedPostsView.as_view(), name='post-related'),
+    path('post/similar/', SimilarPostsView.as_view(), name='post-similar'),
     path('post/increment_click/', IncrementPostClickView.as_view(), name='increment-post-click'),
     path('category/', DetailCategoryView.as_view(), name='category-detail'),
     path('categories/', CategoryListView.as_view(), name='category-list'),
@@ -41,5 +50,6 @@ urlpatterns = [
     path('post/like/', PostLikeViews.as_view()),
     path('post/share/', PostShareView.as_view()),
     path('post/author/', PostAuthorViews.as_view()),
+    path('post/author/analytics/', AuthorAnalyticsView.as_view(), name='author-analytics'),
     path('post/get/', DetailPostView.as_view()),
 ]
\ No newline at end of file
@@ -1,26 +1,28 @@
 from rest_framework_api.views import StandardAPIView
 from rest_framework.exceptions import NotFound, APIException, ValidationError
 from rest_framework import permissions, status
+from rest_framework.response import Response
 from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django.core.cache import cache
-from django.db.models import Q, F, Prefetch, Value
+from django.db import transaction
+from django.db.models import Q, F, Value
 from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
 import redis
 from pprint import pprint
-from bs4 import BeautifulSoup
 from apps.authentication.models import UserAccount
 
 from core.permissions import HasValidAPIKey
+from . import abuse, cache_tags, category_tree, client_events, content_similarity, counters, dwell, events, headings as post_headings, impressions, recommendations, response_cache, rollups, threads, search as post_search
+from .pagination import POST_SORTINGS, KeysetPagination, TrendingPagination, get_post_ordering
 from .models import (
     Post, 
     Heading, 
     PostAnalytics, 
     Category, 
     CategoryAnalytics, 
-    PostView, 
     PostInteraction, 
     Comment,
     PostLike,
@@ -46,7 +48,7 @@ class CategoriesListView(StandardAPIView):
 
     def get(self,request):
 
-        categories = Category.objects.all()
+        categories = CategoryListSerializer.setup_eager_loading(Category.objects.all())
 
         serialized_categories = CategoryListSerializer(categories, many=True).data
 
@@ -90,7 +92,7 @@ class DetailPostView(StandardAPIView):
             raise ValueError("Slug parameter must be provided")
 
         try:
-            post = Post.objects.get(slug=slug)
+            post = PostSerializer.setup_eager_loading(Post.objects.all(), request).get(slug=slug)
         except Post.DoesNotExist:
             raise NotFound(detail=f"No post found for {slug}")
         
@@ -110,14 +112,23 @@ class PostAuthorViews(StandardAPIView):
         if user.role == 'customer':
             return self.error("You do not have permission to create posts")
         
-        posts = Post.objects.filter(user=user)
+        sorting = request.query_params.get("sorting", None)
+
+        posts = PostListSerializer.setup_eager_loading(Post.objects.filter(user=user))
 
         if not posts.exists():
             raise NotFound(detail="No posts found.")
-        
-        serialized_posts = PostListSerializer(posts, many=True).data
 
-        return self.paginate(request, serialized_posts)
+        # Ordenamiento y paginacion en la base de datos; por tendencia, siguiendo el ranking
+        if sorting == "trending":
+            paginator = TrendingPagination()
+        else:
+            paginator = KeysetPagination(get_post_ordering(sorting))
+        page_posts = paginator.paginate_queryset(posts, request)
+
+        serialized_posts = PostListSerializer(page_posts, many=True).data
+
+        return paginator.get_paginated_response(serialized_posts)
 
     def post(self, request):
         """
@@ -163,43 +174,34 @@ class PostAuthorViews(StandardAPIView):
             )
         
         try:
-            post = Post.objects.create(
-                user=user,
-                title=title,
-                description=description,
-                content=content,
-                keywords=keywords,
-                slug=slug,
-                category=category,
-                status=post_status
-            )
-
-            if thumbnail_key:
-                thumbnail = Media.objects.create(
-                    order=thumbnail_order,
-                    name=thumbnail_name,
-                    size=thumbnail_size,
-                    type=thumbnail_type,
-                    key=thumbnail_key,
-                    media_type=thumbnail_media_type
+            # Post, thumbnail y encabezados se guardan juntos o no se guarda nada
+            with transaction.atomic():
+                post = Post(
+                    user=user,
+                    title=title,
+                    description=description,
+                    content=content,
+                    keywords=keywords,
+                    slug=slug,
+                    category=category,
+                    status=post_status
                 )
 
-                post.thumbnail = thumbnail
+                if thumbnail_key:
+                    post.thumbnail = Media.objects.create(
+                        order=thumbnail_order,
+                        name=thumbnail_name,
+                        size=thumbnail_size,
+                        type=thumbnail_type,
+                        key=thumbnail_key,
+                        media_type=thumbnail_media_type
+                    )
+
+                post_headings.refresh_content_hash(post)
                 post.save()
 
-            # Procesar encabezados dinámicamente desde el contenido HTML
-            soup = BeautifulSoup(content, "html.parser")
-            headings = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])
-            
-            for order, heading in enumerate(headings, start=1):
-                level = int(heading.name[1])  # Extract the level from 'h1', 'h2', etc.
-                Heading.objects.create(
-                    post=post,
-                    title=heading.get_text(strip=True),
-                    slug=slugify(heading.get_text(strip=True)),
-                    level=level,
-                    order=order,
-                )
+                # Procesar encabezados desde el contenido HTML
+                post_headings.sync_headings(post, post_headings.extract_headings(content))
 
         except Exception as e:
             return self.error(f"An error occurred: {str(e)}")
@@ -258,37 +260,26 @@ class PostAuthorViews(StandardAPIView):
         post.slug = slug
         post.category=category
 
-        if thumbnail_key:
-            thumbnail = Media.objects.create(
-                order=thumbnail_order,
-                name=thumbnail_name,
-                size=thumbnail_size,
-                type=thumbnail_type,
-                key=thumbnail_key,
-                media_type=thumbnail_media_type
-            )
-
-            post.thumbnail = thumbnail
-
-        # Procesar encabezados dinámicamente desde el contenido HTML
-        soup = BeautifulSoup(content, "html.parser")
-        headings = soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])
+        # Post, thumbnail y encabezados se guardan juntos o no se guarda nada
+        with transaction.atomic():
+            if thumbnail_key:
+                post.thumbnail = Media.objects.create(
+                    order=thumbnail_order,
+                    name=thumbnail_name,
+                    size=thumbnail_size,
+                    type=thumbnail_type,
+                    key=thumbnail_key,
+                    media_type=thumbnail_media_type
+                )
 
-        # Borrar los headings actuales del post
-        Heading.objects.filter(post=post).delete()
-        
-        for order, heading in enumerate(headings, start=1):
-            level = int(heading.name[1])  # Extract the level from 'h1', 'h2', etc.
-            Heading.objects.create(
-                post=post,
-                title=heading.get_text(strip=True),
-                slug=slugify(heading.get_text(strip=True)),
-                level=level,
-                order=order,
-            )
+            # Solo se vuelven a procesar los encabezados si el contenido cambio
+            content_changed = post_headings.refresh_content_hash(post)
+            post.save()
 
-        post.save()
+            if content_changed:
+                post_headings.sync_headings(post, post_headings.extract_headings(content))
 
+        post = PostSerializer.setup_eager_loading(Post.objects.all(), request).get(pk=post.pk)
         serialized_post = PostSerializer(post, context={'request': request}).data
 
         return self.response(serialized_post)
@@ -311,31 +302,56 @@ class PostAuthorViews(StandardAPIView):
         except Post.DoesNotExist:
             raise NotFound(f"Post {post_slug} does not exist.")
         
+        # Los signals del post invalidan los listados y el detalle cacheados
         post.delete()
-
-        # Invalidar caché relacionado con este post
-        self._invalidate_post_list_cache()
-        self._invalidate_post_detail_cache(post_slug)
         
         return self.response(f"Post with slug {post_slug} deleted successully.")
 
-    def _invalidate_post_list_cache(self):
-        """
-        Invalida las claves de caché relacionadas con la lista de posts.
-        """
-        # Obtén todas las claves de caché activas relacionadas con los posts
-        cache_keys = cache.keys("post_list:*")  # Asume que todas las claves inician con 'post_list:'
 
-        # Eliminar todas las claves relacionadas
-        for key in cache_keys:
-            cache.delete(key)
-    
-    def _invalidate_post_detail_cache(self, slug):
+class AuthorAnalyticsView(StandardAPIView):
+    permission_classes = [HasValidAPIKey, permissions.IsAuthenticated]
+
+    def get(self, request):
         """
-        Invalida el cache del post.
+        Series de tiempo (por hora, dia o semana) de las vistas, likes, comentarios
+        y shares de un post del autor o de todos sus posts
         """
-        cache_key = f"post_detail:{slug}"
-        cache.delete(cache_key)
+        user = request.user
+        if user.role == 'customer':
+            return self.error("You do not have permission to view post analytics")
+
+        interval = request.query_params.get("interval", "day")
+        if interval not in rollups.INTERVALS:
+            return self.error(f"interval must be one of: {', '.join(rollups.INTERVALS)}")
+
+        try:
+            start, end = rollups.parse_range(
+                interval, request.query_params.get("start"), request.query_params.get("end")
+            )
+        except ValueError as e:
+            return self.error(str(e))
+
+        post = None
+        slug = request.query_params.get("slug", None)
+        if slug:
+            post = Post.objects.filter(slug=slug, user=user).only("id", "title", "slug").first()
+            if post is None:
+                raise NotFound(detail=f"Post {slug} does not exist.")
+
+        series = rollups.time_series(interval, start, end, post=post, user=user)
+        totals = {
+            field: sum(point[field] for point in series)
+            for field in (*rollups.COUNT_FIELDS.values(), "score")
+        }
+
+        return self.response({
+            "interval": interval,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "post": {"id": str(post.id), "slug": post.slug, "title": post.title} if post else None,
+            "totals": totals,
+            "series": series,
+        })
 
 
 class PostListView(StandardAPIView):
@@ -350,21 +366,20 @@ class PostListView(StandardAPIView):
             author = request.query_params.get("author", None)
             is_featured = request.query_params.get("is_featured", None)
             categories = request.query_params.getlist("categories", [])
-            page = request.query_params.get("p", "1")
-
-            # Construir clave de cache para resultados paginados
-            cache_key = f"post_list:{search}:{sorting}:{ordering}:{author}:{categories}:{is_featured}:{page}"
-            cached_posts = cache.get(cache_key)
-            if cached_posts:
-                # Serializar los datos del caché
-                serialized_posts = PostListSerializer(cached_posts, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for post in cached_posts:
-                    redis_client.incr(f"post:impressions:{post.id}")  # Usar `post.id`
-                return self.paginate(request, serialized_posts)
+            trending_category_ids = None
+
+            # Servir la pagina ya serializada desde el cache, si existe
+            cached = response_cache.fetch(response_cache.POST_LIST, request)
+            if cached:
+                response, post_ids = cached
+                # Registrar impresiones de los posts de la pagina, tras enviar la respuesta
+                return impressions.record_ids_after_response(response, impressions.POST, post_ids, request)
+
+            # Generaciones de las etiquetas leidas antes de consultar la base de datos
+            dependencies = cache_tags.Dependencies(cache_tags.POSTS, cache_tags.CATEGORIES)
 
             # Consulta inicial optimizada con nombres de anotación únicos
-            posts = Post.postobjects.all().select_related("category").annotate(
+            posts = PostListSerializer.setup_eager_loading(Post.postobjects.all()).annotate(
                 analytics_views=Coalesce(F("post_analytics__views"), Value(0)),
                 analytics_likes=Coalesce(F("post_analytics__likes"), Value(0)),
                 analytics_comments=Coalesce(F("post_analytics__comments"), Value(0)),
@@ -379,17 +394,7 @@ class PostListView(StandardAPIView):
             if not posts.exists():
                 raise NotFound(detail=f"No posts found for author: {author}")
             
-            # Filtrar por busqueda
-            if search:
-                posts = posts.filter(
-                    Q(title__icontains=search) |
-                    Q(description__icontains=search) |
-                    Q(content__icontains=search) |
-                    Q(keywords__icontains=search) |
-                    Q(category__name__icontains=search)
-                )
-            
-            # Filtrar por categoria
+            # Filtrar por categoria, incluyendo los posts de sus subcategorias
             if categories:
                 category_queries = Q()
                 for category in categories:
@@ -397,15 +402,21 @@ class PostListView(StandardAPIView):
                     try:
                         uuid.UUID(category)
                         uuid_query = (
-                            Q(category__id=category)
+                            Q(id=category)
                         )
                         category_queries |= uuid_query
                     except ValueError:
                         slug_query = (
-                            Q(category__slug=category)
+                            Q(slug=category)
                         )
                         category_queries |= slug_query
-                posts = posts.filter(category_queries)
+                category_paths = list(Category.objects.filter(category_queries).values_list("path", flat=True))
+                posts = posts.filter(category_tree.subtree_filter(category_paths))
+                if sorting == "trending":
+                    # Ranking de los posts de las categorias pedidas y sus subcategorias
+                    trending_category_ids = Category.objects.filter(
+                        category_tree.subtree_filter(category_paths, field="path")
+                    ).values_list("id", flat=True)
             
             # Filtrar por posts destacados
             if is_featured:
@@ -413,32 +424,48 @@ class PostListView(StandardAPIView):
                 is_featured = is_featured.lower() in ['true', '1', 'yes']
                 posts = posts.filter(featured=is_featured)
             
-            # Ordenamiento
-            if sorting:
-                if sorting == "newest":
-                    posts = posts.order_by("-created_at")
-                elif sorting == 'az':
-                    posts = posts.order_by("title")
-                elif sorting == 'za':
-                    posts = posts.order_by("-title")
-                elif sorting == "recently_updated":
-                    posts = posts.order_by("-updated_at")
-                elif sorting == "most_viewed":
-                    posts = posts.order_by("-analytics_views") 
+            # Filtrar por busqueda de texto completo, despues del resto de filtros
+            # para que el respaldo por trigramas se decida sobre los posts candidatos
+            if search:
+                candidates = posts
+                posts = post_search.search_posts(posts, search)
+            
+            # Ordenamiento y paginacion en la base de datos: solo se obtiene la pagina pedida.
+            # Las busquedas se ordenan por relevancia salvo que se pida otro `sorting`
+            if search and sorting not in POST_SORTINGS:
+                ordering = post_search.SEARCH_ORDERING
+            else:
+                ordering = get_post_ordering(sorting)
+            def get_paginator():
+                if sorting == "trending":
+                    return TrendingPagination(trending_category_ids)
+                return KeysetPagination(ordering)
 
-            # if ordering:
+            paginator = get_paginator()
+            try:
+                page_posts = paginator.paginate_queryset(posts, request)
+            except NotFound:
+                # `?p=N` de una busqueda sin resultados: las paginas son las del respaldo
+                if not (search and paginator.count == 0):
+                    raise
+                page_posts = []
+            if search and not page_posts and post_search.is_supported():
+                # Sin resultados (p. ej. por una errata): la misma pagina de los posts parecidos
+                paginator = get_paginator()
+                page_posts = paginator.paginate_queryset(post_search.similar_posts(candidates, search), request)
 
-            # Guardar los objetos en el caché
-            cache.set(cache_key, posts, timeout=60 * 5)
+            # if ordering:
 
             # Serializar los datos para la respuesta
-            serialized_posts = PostListSerializer(posts, many=True).data
+            serialized_posts = PostListSerializer(page_posts, many=True).data
+            response = paginator.get_paginated_response(serialized_posts)
 
-            # Incrementar impresiones en Redis
-            for post in posts:
-                redis_client.incr(f"post:impressions:{post.id}")  # Usar `post.id`
+            # Guardar la pagina serializada en el caché, dependiente tambien de sus autores
+            dependencies.add(*[cache_tags.author(post.user_id) for post in page_posts])
+            response_cache.store(response_cache.POST_LIST, request, response, dependencies)
 
-            return self.paginate(request, serialized_posts)
+            # Registrar impresiones de los posts de la pagina, tras enviar la respuesta
+            return impressions.record_after_response(response, impressions.POST, request)
         except NotFound as e:
             return self.response([], status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
@@ -459,25 +486,29 @@ class PostDetailView(StandardAPIView):
         try:
             # Verificar si los datos están en caché
             cache_key = f"post_detail:{slug}"
-            cached_post = cache.get(cache_key)
+            cached_post = cache_tags.fetch(cache_key)
             if cached_post:
                 serialized_post = PostSerializer(cached_post, context={'request': request}).data
-                self._register_view_interaction(cached_post, ip_address, user)
+                self._register_view_interaction(request, cached_post, ip_address, user)
                 return self.response(serialized_post)
 
-            # Si no está en caché, obtener el post de la base de datos
+            # Si no está en caché, obtener el post de la base de datos. `has_liked`
+            # depende del usuario y no se anota en el objeto que se guarda en caché
             try:
-                post = Post.postobjects.get(slug=slug)
+                post = PostSerializer.setup_eager_loading(Post.postobjects.all()).get(slug=slug)
             except Post.DoesNotExist:
                 raise NotFound(f"Post {slug} does not exist.")
 
             serialized_post = PostSerializer(post, context={'request': request}).data
 
-            # Guardar en el caché
-            cache.set(cache_key, post, timeout=60 * 5)
+            # Guardar en el caché; se invalida al cambiar el post, su categoria o sus comentarios
+            dependencies = cache_tags.Dependencies(
+                cache_tags.post(post.id), cache_tags.category(post.category_id), cache_tags.thread(post.id)
+            )
+            cache_tags.store(cache_key, post, dependencies, timeout=60 * 5)
 
             # Registrar interaccion
-            self._register_view_interaction(post, ip_address, user)
+            self._register_view_interaction(request, post, ip_address, user)
             
 
         except Post.DoesNotExist:
@@ -487,29 +518,143 @@ class PostDetailView(StandardAPIView):
 
         return self.response(serialized_post)
 
-    def _register_view_interaction(self, post, ip_address, user):
+    def _register_view_interaction(self, request, post, ip_address, user):
         """
-        Registra la interacción de tipo 'view', maneja incrementos de vistas únicas 
-        y totales, y actualiza PostAnalytics.
+        Publica la vista en el stream de eventos. La tarea consume_post_events
+        registra en bloque las vistas unicas, sus PostInteraction y el contador
+        de vistas, fuera del camino de la peticion.
         """
-        # Verifica si esta IP y usuario ya registraron una vista única
-        if not PostView.objects.filter(post=post, ip_address=ip_address, user=user).exists():
-            # Crea un registro de vista unica
-            PostView.objects.create(post=post, ip_address=ip_address, user=user)
+        # El trafico abusivo sigue viendo el post, pero sus vistas no se cuentan
+        if abuse.check(request, "view") is not None:
+            return
+        events.publish_view(post.id, ip_address, user)
+        
 
-            try:
-                PostInteraction.objects.create(
-                    user=user,
-                    post=post,
-                    interaction_type="view",
-                    ip_address=ip_address,
-                )
-            except Exception as e:
-                raise ValueError(f"Error creeating PostInteraction: {e}")
+class PostDwellBeaconView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+
+    def post(self, request):
+        """
+        Beacon que envia el cliente al salir de un post: segundos que estuvo
+        visible y porcentaje de scroll. Se acumula en Redis y se vuelca a las
+        analiticas en flush_analytics_counters, sin escribir en la base de datos
+        """
+        # Los beacons de trafico abusivo se descartan sin avisar al cliente
+        if abuse.check(request, "beacon") is not None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        slug = request.data.get("slug", None)
+        beacon = dwell.parse_beacon(request.data.get("seconds"), request.data.get("scroll_depth"))
+        if not slug or beacon is None:
+            return self.error("A valid slug and a number of seconds must be provided")
+
+        dwell.record(slug, *beacon)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ClientEventBatchView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+
+    def post(self, request):
+        """
+        Recibe un lote de eventos del cliente (impresiones, clicks, vistas y
+        shares de posts y categorias) y los encola para las analiticas en una
+        sola llamada a Redis. Responde 202: los eventos se procesan despues
+        """
+        abuse.enforce(request, "events")
+
+        try:
+            batch, rejected = client_events.parse(request.data.get("events"))
+        except ValueError as e:
+            return self.error(str(e))
+
+        try:
+            accepted = client_events.enqueue(request, batch)
+        except redis.RedisError as e:
+            # 503 para que el cliente reintente el lote mas tarde
+            return self.error(
+                f"An error ocurred while recording events: {str(e)}",
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+            )
+
+        return self.response(
+            {"accepted": accepted, "rejected": rejected + len(batch) - accepted},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class RelatedPostsView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+
+    def get(self, request):
+        """
+        Posts relacionados con un post, segun las interacciones de los usuarios
+        """
+        slug = request.query_params.get("slug")
+
+        if not slug:
+            raise NotFound(detail="A valid slug must be provided")
+
+        post = Post.postobjects.filter(slug=slug).values("id", "category_id").first()
+        if post is None:
+            raise NotFound(detail=f"Post {slug} does not exist.")
+
+        # Vecinos precalculados por build_related_posts, en un solo GET a Redis
+        related_ids = recommendations.related_post_ids(post["id"])
+        posts = PostListSerializer.setup_eager_loading(Post.postobjects.all())
+
+        if not related_ids:
+            # Sin interacciones suficientes (p. ej. un post nuevo): posts de contenido parecido
+            related_ids = content_similarity.similar_post_ids(post["id"], recommendations.TOP_K)
+
+        if related_ids:
+            rank = {related_id: index for index, related_id in enumerate(related_ids)}
+            related_posts = sorted(posts.filter(id__in=related_ids), key=lambda related: rank[str(related.id)])
+        else:
+            # Sin interacciones ni contenido parecido: los posts mas recientes de la misma categoria
+            related_posts = list(
+                posts.filter(category_id=post["category_id"]).exclude(id=post["id"])
+                .order_by("-created_at")[:recommendations.TOP_K]
+            )
+
+        serialized_posts = PostListSerializer(related_posts, many=True).data
+
+        return self.response(serialized_posts)
+
+
+class SimilarPostsView(StandardAPIView):
+    permission_classes = [HasValidAPIKey]
+
+    def get(self, request):
+        """
+        Posts con contenido parecido al de un post ("mas como este")
+        """
+        slug = request.query_params.get("slug")
+
+        if not slug:
+            raise NotFound(detail="A valid slug must be provided")
+
+        try:
+            limit = min(max(int(request.query_params.get("limit", content_similarity.TOP_K)), 1), 50)
+        except ValueError:
+            limit = content_similarity.TOP_K
+
+        post_id = Post.postobjects.filter(slug=slug).values_list("id", flat=True).first()
+        if post_id is None:
+            raise NotFound(detail=f"Post {slug} does not exist.")
+
+        similar_ids = content_similarity.similar_post_ids(post_id, limit)
+        rank = {similar_id: index for index, similar_id in enumerate(similar_ids)}
+        similar_posts = sorted(
+            PostListSerializer.setup_eager_loading(Post.postobjects.filter(id__in=similar_ids)),
+            key=lambda similar: rank[str(similar.id)],
+        )
+
+        serialized_posts = PostListSerializer(similar_posts, many=True).data
+
+        return self.response(serialized_posts)
 
-            analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-            analytics.increment_metric('views')
-        
 
 class PostHeadingsView(StandardAPIView):
     permission_classes = [HasValidAPIKey]
@@ -536,14 +681,17 @@ class IncrementPostClickView(StandardAPIView):
             raise NotFound(detail="The requested post does not exist")
         
         try:
-            post_analytics, created = PostAnalytics.objects.get_or_create(post=post)
-            post_analytics.increment_click()
+            counters.increment(counters.POST, post.id, "clicks")
         except Exception as e:
             raise APIException(detail=f"An error ocurred while updating post analytics: {str(e)}")
 
+        # Clicks persistidos mas los pendientes de volcar desde Redis
+        clicks = PostAnalytics.objects.filter(post=post).values_list("clicks", flat=True).first() or 0
+        pending = counters.get_pending(counters.POST, [post.id])
+
         return self.response({
             "message": "Click incremented successfully",
-            "clicks": post_analytics.clicks
+            "clicks": clicks + counters.get_pending_metric(pending, post.id, "clicks")
         })
 
 
@@ -558,29 +706,32 @@ class CategoryListView(StandardAPIView):
             ordering = request.query_params.get("ordering", None)
             sorting = request.query_params.get("sorting", None)
             search = request.query_params.get("search", "").strip()
-            page = request.query_params.get("p", "1")
-
-            # Construir clave de cache para resultados paginados
-            cache_key = f"category_list:{page}:{ordering}:{sorting}:{search}:{parent_slug}"
-            cached_categories = cache.get(cache_key)
-            if cached_categories:
-                # Serializar los datos del caché
-                serialized_categories = CategoryListSerializer(cached_categories, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for category in cached_categories:
-                    redis_client.incr(f"category:impressions:{category.id}")  # Usar `post.id`
-                return self.paginate(request, serialized_categories)
+            # Incluir todo el subarbol en lugar de un solo nivel
+            descendants = request.query_params.get("descendants", "").lower() in ['true', '1', 'yes']
+
+            # Servir la pagina ya serializada desde el cache, si existe
+            cached = response_cache.fetch(response_cache.CATEGORY_LIST, request)
+            if cached:
+                response, category_ids = cached
+                # Registrar impresiones de las categorias de la pagina, tras enviar la respuesta
+                return impressions.record_ids_after_response(response, impressions.CATEGORY, category_ids, request)
+
+            # Los conteos de posts de cada categoria cambian con los posts
+            dependencies = cache_tags.Dependencies(cache_tags.CATEGORIES, cache_tags.POSTS)
 
             # Consulta inicial optimizada
-            if parent_slug:
-                categories = Category.objects.filter(parent__slug=parent_slug).prefetch_related(
-                    Prefetch("category_analytics", to_attr="analytics_cache")
-                )
+            if parent_slug and descendants:
+                # Todas las subcategorias, en orden de arbol
+                parent = Category.objects.filter(slug=parent_slug).first()
+                categories = parent.get_descendants() if parent else Category.objects.none()
+            elif parent_slug:
+                categories = Category.objects.filter(parent__slug=parent_slug)
+            elif descendants:
+                categories = Category.objects.order_by("path")
             else:
                 # Si no especificamos un parent_slug buscamos las categorias padre
-                categories = Category.objects.filter(parent__isnull=True).prefetch_related(
-                    Prefetch("category_analytics", to_attr="analytics_cache")
-                )
+                categories = Category.objects.filter(parent__isnull=True)
+            categories = CategoryListSerializer.setup_eager_loading(categories)
 
             if not categories.exists():
                 raise NotFound(detail="No categories found.")
@@ -601,7 +752,7 @@ class CategoryListView(StandardAPIView):
                 elif sorting == 'recently_updated':
                     categories = categories.order_by("-updated_at")
                 elif sorting == 'most_viewed':
-                    categories = categories.annotate(popularity=F("analytics_cache__views")).order_by("-popularity")
+                    categories = categories.annotate(popularity=F("category_analytics__views")).order_by("-popularity")
 
             if ordering:
                 if ordering == 'az':
@@ -609,17 +760,15 @@ class CategoryListView(StandardAPIView):
                 if ordering == 'za':
                     posts = posts.order_by("-name")
 
-            # Guardar los objetos en el caché
-            cache.set(cache_key, categories, timeout=60 * 5)
-
             # Serializacion
             serialized_categories = CategoryListSerializer(categories, many=True).data
+            response = self.paginate(request, serialized_categories)
 
-            # Incrementar impresiones en Redis
-            for category in categories:
-                redis_client.incr(f"category:impressions:{category.id}")
+            # Guardar la pagina serializada en el caché
+            response_cache.store(response_cache.CATEGORY_LIST, request, response, dependencies)
 
-            return self.paginate(request, serialized_categories)
+            # Registrar impresiones de las categorias de la pagina, tras enviar la respuesta
+            return impressions.record_after_response(response, impressions.CATEGORY, request)
         except Exception as e:
                 raise APIException(detail=f"An unexpected error occurred: {str(e)}")
 
@@ -632,44 +781,53 @@ class CategoryDetailView(StandardAPIView):
         try:
             # Obtener parametros
             slug = request.query_params.get("slug", None)
-            page = request.query_params.get("p", "1")
+            sorting = request.query_params.get("sorting", None)
 
             if not slug:
                 return self.error("Missing slug parameter")
             
-            # Construir cache
-            cache_key = f"category_posts:{slug}:{page}"
-            cached_posts = cache.get(cache_key)
-            if cached_posts:
-                # Serializar los datos del caché
-                serialized_posts = PostListSerializer(cached_posts, many=True).data
-                # Incrementar impresiones en Redis para los posts del caché
-                for post in cached_posts:
-                    redis_client.incr(f"post:impressions:{post.id}")  # Usar `post.id`
-                return self.paginate(request, serialized_posts)
+            # Servir la pagina ya serializada desde el cache, si existe
+            cached = response_cache.fetch(response_cache.CATEGORY_POSTS, request)
+            if cached:
+                response, post_ids = cached
+                # Registrar impresiones de los posts de la pagina, tras enviar la respuesta
+                return impressions.record_ids_after_response(response, impressions.POST, post_ids, request)
+
+            dependencies = cache_tags.Dependencies(cache_tags.POSTS, cache_tags.CATEGORIES)
 
             # Obtener la categoria por slug
             category = get_object_or_404(Category, slug=slug)
 
-            # Obtener los posts que pertenecen a esta categoria
-            posts = Post.postobjects.filter(category=category).select_related("category").prefetch_related(
-                Prefetch("post_analytics", to_attr="analytics_cache")
+            # Obtener los posts que pertenecen a esta categoria o a sus subcategorias
+            posts = PostListSerializer.setup_eager_loading(
+                Post.postobjects.filter(category__path__startswith=category.path)
             )
             
             if not posts.exists():
                 raise NotFound(detail=f"No posts found for category '{category.name}'")
-            
-            # Guardar los objetos en el caché
-            cache.set(cache_key, posts, timeout=60 * 5)
+
+            # Ordenamiento y paginacion en la base de datos; por tendencia, siguiendo el
+            # ranking de la categoria y sus subcategorias
+            if sorting == "trending":
+                paginator = TrendingPagination(
+                    category.get_descendants(include_self=True).values_list("id", flat=True)
+                )
+            else:
+                paginator = KeysetPagination(get_post_ordering(sorting))
+            page_posts = paginator.paginate_queryset(posts, request)
 
             # Serializar los posts
-            serialized_posts = PostListSerializer(posts, many=True).data
+            serialized_posts = PostListSerializer(page_posts, many=True).data
+            response = paginator.get_paginated_response(serialized_posts)
 
-            # Incrementar impresiones en Redis
-            for post in posts:
-                redis_client.incr(f"post:impressions:{post.id}")
+            # Guardar la pagina serializada en el caché, dependiente tambien de sus autores
+            dependencies.add(*[cache_tags.author(post.user_id) for post in page_posts])
+            response_cache.store(response_cache.CATEGORY_POSTS, request, response, dependencies)
 
-            return self.paginate(request, serialized_posts)
+            # Registrar impresiones de los posts de la pagina, tras enviar la respuesta
+            return impressions.record_after_response(response, impressions.POST, request)
+        except NotFound:
+            raise
         except Exception as e:
             raise APIException(detail=f"An unexpected error occurred: {str(e)}")
 
@@ -689,14 +847,17 @@ class IncrementCategoryClickView(StandardAPIView):
             raise NotFound(detail="The requested category does not exist")
         
         try:
-            category_analytics, created = CategoryAnalytics.objects.get_or_create(category=category)
-            category_analytics.increment_click()
+            counters.increment(counters.CATEGORY, category.id, "clicks")
         except Exception as e:
             raise APIException(detail=f"An error ocurred while updating category analytics: {str(e)}")
 
+        # Clicks persistidos mas los pendientes de volcar desde Redis
+        clicks = CategoryAnalytics.objects.filter(category=category).values_list("clicks", flat=True).first() or 0
+        pending = counters.get_pending(counters.CATEGORY, [category.id])
+
         return self.response({
             "message": "Click incremented successfully",
-            "clicks": category_analytics.clicks
+            "clicks": clicks + counters.get_pending_metric(pending, category.id, "clicks")
         })
 
 
@@ -707,34 +868,39 @@ class ListPostCommentsView(StandardAPIView):
 
         post_slug = request.query_params.get("slug", None)
         page = request.query_params.get("p", "1")
+        # Niveles de respuestas a incluir en `replies` de cada comentario principal
+        depth = threads.parse_depth(request.query_params.get("depth"), default=0)
 
         if not post_slug:
             raise NotFound(detail="A valid post slug must be provided")
         
         # Definir clave cache
-        cache_key = f"post_comments:{post_slug}:{page}"
-        cached_comments = cache.get(cache_key)
-        if cached_comments:
+        cache_key = f"post_comments:{post_slug}:{page}:{depth}"
+        cached_comments = cache_tags.fetch(cache_key)
+        if cached_comments is not None:
             return self.paginate(request, cached_comments)
         
         try:
             post = Post.objects.get(slug=post_slug)
         except Post.DoesNotExist:
             raise ValueError(f"Post: {post_slug} does not exist")
-        
-        # Obtener solo los comentarios principales
-        comments = Comment.objects.filter(post=post, parent=None)
-
-        serialized_comments = CommentSerializer(comments, many=True).data
 
-        # Guardar clave en el índice
-        cache_index_key = f"post_comments_cache_keys:{post_slug}"
-        cache_keys = cache.get(cache_index_key, [])
-        cache_keys.append(cache_key)
-        cache.set(cache_index_key, cache_keys, timeout=60 * 5)
+        # Cualquier comentario nuevo, editado o borrado del post invalida el hilo
+        dependencies = cache_tags.Dependencies(cache_tags.thread(post.id))
+        
+        # Obtener los comentarios principales y sus respuestas hasta `depth` niveles
+        # en una sola consulta por rango de ruta, y armar el arbol
+        comments = list(threads.post_thread(
+            CommentSerializer.setup_eager_loading(Comment.objects.all()), post, depth
+        ))
+        serialized_comments = threads.build_tree(
+            comments, CommentSerializer(comments, many=True).data, root_depth=0
+        )
+        # Comentarios principales del mas reciente al mas antiguo
+        serialized_comments.reverse()
 
         # Almacenar los datos en caché
-        cache.set(cache_key, serialized_comments, timeout=60 * 5)
+        cache_tags.store(cache_key, serialized_comments, dependencies, timeout=60 * 5)
 
         return self.paginate(request, serialized_comments)
 
@@ -746,6 +912,8 @@ class PostCommentViews(StandardAPIView):
         """
         Crear un comentario para un post
         """
+        abuse.enforce(request, "comment")
+
         # Obtener parametros
         post_slug = request.data.get("slug", None)
         user = request.user
@@ -760,16 +928,13 @@ class PostCommentViews(StandardAPIView):
         except Post.DoesNotExist:
             raise NotFound(detail=f"Post: {post_slug} does not exist")
         
-        # Crear comentario
+        # Crear comentario; los signals del comentario invalidan el hilo cacheado
         comment = Comment.objects.create(
             user=user,
             post=post,
             content=content,
         )
 
-        # Invalidar el cache de comentarios para el post
-        self._invalidate_post_comments_cache(post_slug)
-
         # Actualizar interaccion de post
         self._register_comment_interaction(comment, post, ip_address, user)
 
@@ -794,12 +959,6 @@ class PostCommentViews(StandardAPIView):
         comment.content = content
         comment.save()
 
-        # Invalidar el cache de comentarios para el post
-        self._invalidate_post_comments_cache(comment.post.slug)
-
-        if comment.parent and comment.parent.replies.exists():
-            self._invalidate_comment_replies_cache(comment.parent.id)
-
         return self.response("Comment content updated successfully")
     
     def delete(self, request):
@@ -817,21 +976,15 @@ class PostCommentViews(StandardAPIView):
             raise NotFound(detail=f"Comment with id: {comment_id} does not exist")
         
         post = comment.post
-        post_analytics, _ = PostAnalytics.objects.get_or_create(post=post)
 
-        if comment.parent and comment.parent.replies.exists():
-            self._invalidate_comment_replies_cache(comment.parent.id)
+        # Las respuestas se borran en cascada: restar todo el subarbol activo
+        removed = Comment.objects.filter(post=post, path__startswith=comment.path, is_active=True).count()
 
         comment.delete()
 
-        # Actualizar metricas
-        comments_count = Comment.objects.filter(post=post, is_active=True).count()
-
-        post_analytics.comments = comments_count
-        post_analytics.save()
-
-        # Invalidar el cache de comentarios para el post
-        self._invalidate_post_comments_cache(post.slug)
+        # Actualizar metricas con un delta negativo, que se suma a los incrementos pendientes
+        if removed:
+            counters.increment(counters.POST, post.id, "comments", -removed)
 
         return self.response("Comment deleted successfully")
     
@@ -845,35 +998,7 @@ class PostCommentViews(StandardAPIView):
             ip_address=ip_address
         )
 
-        analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        analytics.increment_metric("comments")
-
-    def _invalidate_post_comments_cache(self, post_slug):
-        """
-        Invalida todas las claves de caché relacionadas con los comentarios de un post.
-        """
-        # definir clave cache
-        cache_index_key = f"post_comments_cache_keys:{post_slug}"
-        cache_keys = cache.get(cache_index_key, [])
-
-        # Eliminar cada clave almacenada en el indice
-        for key in cache_keys:
-            cache.delete(key)
-
-        # Limpiar el indice de claves
-        cache.delete(cache_index_key)
-
-    def _invalidate_comment_replies_cache(self, comment_id):
-        """
-        Invalida todas las claves de caché relacionadas con las respuestas de un comentario.
-        """
-        cache_index_key = f"comment_replies_cache_keys:{comment_id}"
-        cache_keys = cache.get(cache_index_key, [])
-
-        for key in cache_keys:
-            cache.delete(key)
-
-        cache.delete(cache_index_key)
+        counters.increment(counters.POST, post.id, "comments")
 
 
 class ListCommentRepliesView(StandardAPIView):
@@ -883,14 +1008,16 @@ class ListCommentRepliesView(StandardAPIView):
 
         comment_id = request.query_params.get("comment_id")
         page = request.query_params.get("p", "1")
+        # Niveles de respuestas a devolver; con 1 solo las respuestas directas
+        depth = threads.parse_depth(request.query_params.get("depth"), default=1)
 
         if not comment_id:
             raise NotFound(detail="A valid comment_id must be provided")
         
         # Definir la clave cache
-        cache_key = f"comment_replies:{comment_id}:{page}"
-        cached_replies = cache.get(cache_key)
-        if cached_replies:
+        cache_key = f"comment_replies:{comment_id}:{page}:{depth}"
+        cached_replies = cache_tags.fetch(cache_key)
+        if cached_replies is not None:
             return self.paginate(request, cached_replies)
         
         # Obtener el comentario padre
@@ -898,36 +1025,31 @@ class ListCommentRepliesView(StandardAPIView):
             parent_comment = Comment.objects.get(id=comment_id)
         except Comment.DoesNotExist:
             raise NotFound(detail=f"Comment with id: {comment_id} does not exist")
-        
-        # Filtrar las respuestas activas del comentario padre
-        replies = parent_comment.replies.filter(is_active=True).order_by("-created_at")
 
-        # Serializar respuesta
-        serialized_replies = CommentSerializer(replies, many=True).data
-
-        # Registrar la clave en el índice de caché
-        self._register_comment_reply_cache_key(comment_id, cache_key)
+        dependencies = cache_tags.Dependencies(cache_tags.thread(parent_comment.post_id))
+        
+        # Respuestas activas del comentario hasta `depth` niveles, en una sola consulta
+        replies = list(threads.comment_thread(
+            CommentSerializer.setup_eager_loading(Comment.objects.all()), parent_comment, depth
+        ))
+
+        # Serializar respuesta como arbol, respuestas directas de la mas reciente a la mas antigua
+        serialized_replies = threads.build_tree(
+            replies, CommentSerializer(replies, many=True).data, root_depth=parent_comment.depth + 1
+        )
+        serialized_replies.reverse()
 
         # Guardar las respuestas en el caché
-        cache.set(cache_key, serialized_replies, timeout=60 * 5)
+        cache_tags.store(cache_key, serialized_replies, dependencies, timeout=60 * 5)
 
         return self.paginate(request, serialized_replies)
-    
-    def _register_comment_reply_cache_key(self, comment_id, cache_key):
-        """
-        Registrar claves de caché relacionadas con las respuestas de un comentario.
-        """
-        cache_index_key = f"comment_replies_cache_keys:{comment_id}"
-        cache_keys = cache.get(cache_index_key, [])
-        if cache_key not in cache_keys:
-            cache_keys.append(cache_key)
-        cache.set(cache_index_key, cache_keys, timeout=60 * 5)
 
     
 class CommentReplyViews(StandardAPIView):
     permission_classes = [HasValidAPIKey, permissions.IsAuthenticated]
 
     def post(self, request):
+        abuse.enforce(request, "comment")
 
         # Obtener parametros
         comment_id = request.data.get("comment_id")
@@ -940,20 +1062,21 @@ class CommentReplyViews(StandardAPIView):
 
         # Obtener el comentario padre
         try:
-            parent_comment = Comment.objects.get(id=comment_id)
+            parent_comment = Comment.objects.select_related("post").get(id=comment_id)
         except Comment.DoesNotExist:
             raise NotFound(detail=f"Comment with id: {comment_id} does not exist")
         
         # Crear el reply
-        comment = Comment.objects.create(
-            user=user,
-            post=parent_comment.post,
-            parent=parent_comment,
-            content=content,
-        )
-
-        # Invalidar caché de respuestas
-        self._invalidate_comment_replies_cache(comment_id)
+        try:
+            comment = Comment.objects.create(
+                user=user,
+                post=parent_comment.post,
+                parent=parent_comment,
+                content=content,
+            )
+        except ValueError as e:
+            # Se supero la profundidad maxima de los hilos
+            return self.error(str(e))
 
         # Actualiizar metricas
         self._register_comment_interaction(comment, comment.post, ip_address, user)
@@ -970,20 +1093,7 @@ class CommentReplyViews(StandardAPIView):
             ip_address=ip_address
         )
 
-        analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        analytics.increment_metric("comments")
-
-    def _invalidate_comment_replies_cache(self, comment_id):
-        """
-        Invalida todas las claves de caché relacionadas con las respuestas de un comentario.
-        """
-        cache_index_key = f"comment_replies_cache_keys:{comment_id}"
-        cache_keys = cache.get(cache_index_key, [])
-
-        for key in cache_keys:
-            cache.delete(key)
-
-        cache.delete(cache_index_key)
+        counters.increment(counters.POST, post.id, "comments")
 
 
 class PostLikeViews(StandardAPIView):
@@ -993,6 +1103,8 @@ class PostLikeViews(StandardAPIView):
         """
         Crear un 'like' para un post.
         """
+        abuse.enforce(request, "like")
+
         post_slug = request.data.get("slug", None)
         user = request.user
 
@@ -1022,8 +1134,7 @@ class PostLikeViews(StandardAPIView):
         )
 
         # Incrementar métricas
-        analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        analytics.increment_metric("likes")
+        counters.increment(counters.POST, post.id, "likes")
 
         return self.response(f"You have liked the post: {post.title}")
     
@@ -1051,10 +1162,8 @@ class PostLikeViews(StandardAPIView):
         # Eliminar 'like'
         like.delete()
 
-        # Actualizar métricas
-        analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        analytics.likes = PostLike.objects.filter(post=post).count()
-        analytics.save()
+        # Actualizar métricas con un delta negativo, que se suma a los incrementos pendientes
+        counters.increment(counters.POST, post.id, "likes", -1)
 
         return self.response(f"You have unliked the post: {post.title}")
 
@@ -1066,6 +1175,8 @@ class PostShareView(StandardAPIView):
         """
         Maneja la acción de compartir un post.
         """
+        abuse.enforce(request, "share")
+
         # Obtener parámetros
         post_slug = request.data.get("slug", None)
         platform = request.data.get("platform", "other").lower()
@@ -1101,8 +1212,7 @@ class PostShareView(StandardAPIView):
         )
 
         # Actualizar métricas
-        analytics, _ = PostAnalytics.objects.get_or_create(post=post)
-        analytics.increment_metric("shares")
+        counters.increment(counters.POST, post.id, "shares")
 
         return self.response(f"Post '{post.title}' shared successfully on {platform.capitalize()}")
 
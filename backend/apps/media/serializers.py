@@ -1,29 +1,67 @@
-import datetime
-from django.conf import settings
-from django.utils import timezone
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models
 #Hacer el llamado a cloudfront de AWS para retornar la url del media
 #que si podemos usar para ver el archivo de medios
 from rest_framework import serializers
-from botocore.signers import CloudFrontSigner
-from utils.s3_utils import rsa_signer
+from utils.cloudfront_utils import sign_many, sign_url
 from .models import Media
 
+
+def resolve_media(instance, path):
+    """
+    Recorre una ruta con puntos (ej. "category.thumbnail") y devuelve el media
+    al final de la misma, o None si algun eslabon no existe.
+    """
+    obj = instance
+    for attr in path.split("."):
+        try:
+            obj = getattr(obj, attr)
+        except ObjectDoesNotExist:
+            return None
+        if obj is None:
+            return None
+    return obj
+
+
+class SignedMediaListSerializer(serializers.ListSerializer):
+    """
+    Firma en bloque las URLs de todos los medios de una lista antes de serializarla.
+    El serializer hijo indica en `media_fields` las rutas hacia sus medios.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        items = list(iterable)
+
+        media_fields = getattr(self.child, "media_fields", ())
+        keys = set()
+        for item in items:
+            for path in media_fields:
+                media = resolve_media(item, path)
+                if media is not None and media.key:
+                    keys.add(media.key)
+
+        if keys:
+            # El contexto es compartido con los serializers anidados (MediaSerializer)
+            self.context.setdefault("signed_urls", {}).update(sign_many(keys))
+
+        return super().to_representation(items)
+
+
 class MediaSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()
 
     class Meta:
         model = Media
         fields = "__all__"
-        
+
     def get_url(self, obj):
         if not obj.key:
             return None
 
-        cloudfront_key_id = settings.AWS_CLOUDFRONT_KEY_ID
-        obj_url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{obj.key}"
-        
-        cloudfront_signer = CloudFrontSigner(cloudfront_key_id, rsa_signer)
-        expire_date = timezone.now() + datetime.timedelta(seconds=60)
-       
-        signed_url = cloudfront_signer.generate_presigned_url(obj_url, date_less_than=expire_date)
-        return signed_url
\ No newline at end of file
+        # Usar las URLs firmadas en bloque por el serializer de la lista, si existen
+        signed_urls = self.context.get("signed_urls")
+        if signed_urls and obj.key in signed_urls:
+            return signed_urls[obj.key]
+
+        return sign_url(obj.key)
@@ -0,0 +1,7 @@
+"""
+Benchmarks de los endpoints del blog y de la autenticacion.
+
+Corren en una sola maquina: fakeredis en lugar de Redis, SQLite o un
+PostgreSQL local (BENCHMARK_DATABASE_URL) y settings ficticios de
+CloudFront/S3 (ver benchmarks.settings). Uso en benchmarks.__main__.
+"""
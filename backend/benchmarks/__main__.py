@@ -0,0 +1,91 @@
+"""
+Uso (desde backend/):
+
+    python -m benchmarks run --sizes small,medium --output benchmark.json
+    python -m benchmarks compare main.json benchmark.json --threshold 20
+
+`compare` termina con codigo 1 si encuentra regresiones.
+"""
+import argparse
+import os
+import sys
+
+
+def _run(options):
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    django.setup()
+
+    from django.conf import settings
+
+    from . import report, runner
+    from .scenarios import SCENARIOS, SCENARIOS_BY_NAME
+
+    sizes = options.sizes.split(",")
+    unknown = [size for size in sizes if size not in runner.SIZES]
+    if unknown:
+        sys.exit(f"Unknown sizes: {', '.join(unknown)} (choose from {', '.join(runner.SIZES)})")
+    scenarios = SCENARIOS
+    if options.scenarios:
+        names = options.scenarios.split(",")
+        unknown = [name for name in names if name not in SCENARIOS_BY_NAME]
+        if unknown:
+            sys.exit(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS_BY_NAME)})")
+        scenarios = [SCENARIOS_BY_NAME[name] for name in names]
+
+    config = {
+        "sizes": {size: runner.SIZES[size] for size in sizes},
+        "scenarios": [scenario.name for scenario in scenarios],
+        "iterations": options.iterations,
+        "warmup": options.warmup,
+        "targets": options.targets,
+        "seed": options.seed,
+    }
+    results = runner.run(
+        sizes, scenarios, options.iterations, options.warmup, options.targets, options.seed,
+        options.workers, settings.VALID_API_KEYS[0], lambda line: print(line, file=sys.stderr),
+    )
+    report.write(report.build(config, results), options.output)
+    print(f"Report written to {options.output}", file=sys.stderr)
+
+
+def _compare(options):
+    from . import report
+
+    regressions = report.compare(report.load(options.base), report.load(options.head), options.threshold)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("\nNo regressions")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Blog and auth API benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Seed each dataset size, measure the endpoints and write a JSON report")
+    run.add_argument("--sizes", default="small,medium", help="Comma separated: small, medium, large")
+    run.add_argument("--scenarios", help="Comma separated scenario names (default: all)")
+    run.add_argument("--iterations", type=int, default=100, help="Measured requests per scenario")
+    run.add_argument("--warmup", type=int, default=10, help="Unmeasured requests before each scenario")
+    run.add_argument("--targets", type=int, default=20, help="Most viewed posts the requests cycle through")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="generate_dataset workers")
+    run.add_argument("--output", default="benchmark.json")
+    run.set_defaults(handler=_run)
+
+    compare = commands.add_parser("compare", help="Compare two reports")
+    compare.add_argument("base")
+    compare.add_argument("head")
+    compare.add_argument("--threshold", type=float, default=20, help="Allowed p95 increase, in percent")
+    compare.set_defaults(handler=_compare)
+
+    options = parser.parse_args(argv)
+    if getattr(options, "iterations", 1) < 1 or getattr(options, "targets", 1) < 1:
+        parser.error("--iterations and --targets must be positive")
+    options.handler(options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Reporte JSON del benchmark y comparacion entre dos reportes (p. ej. el de main
+y el de una rama).
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone as dt_timezone
+
+import django
+from django.db import connection
+
+REPORT_VERSION = 1
+
+
+def _git(*args):
+    try:
+        return subprocess.run(
+            ["git", *args], capture_output=True, text=True, check=True, cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """
+    Commit, version de las dependencias y maquina en las que se corrio.
+    """
+    status = _git("status", "--porcelain")
+    return {
+        "commit": _git("rev-parse", "HEAD"),
+        "branch": _git("rev-parse", "--abbrev-ref", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "created_at": datetime.now(dt_timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def build(config, results):
+    return {"version": REPORT_VERSION, "environment": environment(), "config": config, "results": results}
+
+
+def write(report, path):
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+        report_file.write("\n")
+
+
+def load(path):
+    with open(path) as report_file:
+        return json.load(report_file)
+
+
+# (etiqueta, metrica, clave) de las columnas de la comparacion
+COLUMNS = (
+    ("p50 ms", "latency_ms", "p50"),
+    ("p95 ms", "latency_ms", "p95"),
+    ("sql", "sql_queries", "mean"),
+    ("redis", "redis_round_trips", "mean"),
+)
+
+
+def _change(before, after):
+    if not before:
+        return None
+    return (after - before) / before * 100
+
+
+def compare(base, head, threshold, out=sys.stdout):
+    """
+    Imprime, por tamano y escenario, la latencia (p50 y p95), las consultas SQL
+    y los viajes a Redis de los dos reportes. Devuelve las regresiones: el p95
+    sube mas de `threshold` por ciento, o sube el numero medio de consultas o de
+    viajes a Redis (que no dependen del ruido de la maquina).
+    """
+    regressions = []
+    for size, head_size in head["results"].items():
+        base_size = base["results"].get(size)
+        if base_size is None:
+            continue
+        out.write(f"\n{size}\n")
+        for name, after in head_size["scenarios"].items():
+            before = base_size["scenarios"].get(name)
+            if before is None:
+                continue
+
+            cells = []
+            for label, metric, key in COLUMNS:
+                old, new = before[metric][key], after[metric][key]
+                change = _change(old, new)
+                cells.append(f"{label} {old:g} -> {new:g}" + (f" ({change:+.0f}%)" if change is not None else ""))
+
+            p95_change = _change(before["latency_ms"]["p95"], after["latency_ms"]["p95"])
+            if p95_change is not None and p95_change > threshold:
+                regressions.append(f"{size} {name}: p95 {p95_change:+.0f}%")
+            for metric in ("sql_queries", "redis_round_trips"):
+                if after[metric]["mean"] > before[metric]["mean"]:
+                    regressions.append(
+                        f"{size} {name}: {metric} {before[metric]['mean']:g} -> {after[metric]['mean']:g}"
+                    )
+
+            out.write(f"  {name:<22} " + " | ".join(cells) + "\n")
+    return regressions
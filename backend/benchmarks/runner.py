@@ -0,0 +1,241 @@
+"""
+Corrida del benchmark: por cada tamano crea una base de pruebas, la llena con
+generate_dataset, mide cada escenario y destruye la base.
+
+De cada peticion se mide la latencia (con el cliente de pruebas de Django, sin
+red), las consultas SQL y su tiempo (connection.execute_wrapper) y los viajes a
+Redis (cada envio de la conexion: un comando, un pipeline o un script Lua cuentan
+uno). Las peticiones se hacen una tras otra, con un solo cliente.
+"""
+import contextlib
+import io
+import time
+from unittest import mock
+from urllib.parse import urlencode
+
+import numpy as np
+from django.contrib.postgres.indexes import PostgresIndex
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models.signals import pre_migrate
+from django_redis import get_redis_connection
+from redis.connection import AbstractConnection
+from rest_framework.test import APIClient
+
+from apps.blog import cache_tags, response_cache
+from .scenarios import Fixture
+
+# Tamanos de los datos: opciones de generate_dataset
+SIZES = {
+    "small": {
+        "users": 200, "categories": 10, "posts": 200,
+        "comments": 2000, "likes": 4000, "views": 10000, "shares": 500,
+    },
+    "medium": {
+        "users": 2000, "categories": 30, "posts": 2000,
+        "comments": 20000, "likes": 40000, "views": 100000, "shares": 5000,
+    },
+    "large": {
+        "users": 10000, "categories": 50, "posts": 10000,
+        "comments": 50000, "likes": 100000, "views": 500000, "shares": 10000,
+    },
+}
+
+# Fecha final fija para que la misma semilla genere siempre los mismos datos
+DATASET_END = "2025-01-01"
+
+WARM = "warm"
+COLD = "cold"
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Probe:
+    """
+    Contadores de la peticion en curso. Se instala una vez y el runner lo
+    reinicia antes de cada peticion.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.redis_round_trips = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+
+def _count_round_trips(probe):
+    send_packed_command = AbstractConnection.send_packed_command
+
+    def counted(self, command, check_health=True):
+        probe.redis_round_trips += 1
+        return send_packed_command(self, command, check_health)
+
+    return mock.patch.object(AbstractConnection, "send_packed_command", counted)
+
+
+def _prepare_schema(sender, using, **kwargs):
+    """
+    Antes de crear las tablas de la base de pruebas: los indices GIN de Post
+    solo existen en PostgreSQL y los de trigramas necesitan la extension pg_trgm,
+    que en produccion crea la migracion blog 0002 (aqui las tablas se crean sin
+    migraciones). Si no estan disponibles se omiten; solo sirven a la busqueda,
+    que no se mide.
+    """
+    if sender.label != "blog":
+        return
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cursor.fetchone() is not None:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+                return
+        keep = lambda index: "gin_trgm_ops" not in (index.opclasses or ())  # noqa: E731
+    else:
+        keep = lambda index: not isinstance(index, PostgresIndex)  # noqa: E731
+
+    for model in sender.get_models():
+        model._meta.indexes = [index for index in model._meta.indexes if keep(index)]
+
+
+def _partition_event_tables():
+    """
+    En PostgreSQL particiona las tablas de eventos como la migracion blog 0009
+    (aqui las tablas se crean sin migraciones), para medir el mismo esquema que
+    en produccion.
+    """
+    if connection.vendor == "postgresql":
+        call_command("partition_event_tables", stdout=io.StringIO())
+
+
+def _seed(size, seed, workers):
+    started = time.perf_counter()
+    call_command(
+        "generate_dataset", **SIZES[size], seed=seed, end=DATASET_END, workers=workers, stdout=io.StringIO()
+    )
+    return {**SIZES[size], "seconds": round(time.perf_counter() - started, 2)}
+
+
+def _summary(latencies, queries, sql_seconds, round_trips, sizes, statuses):
+    latencies = np.array(latencies) * 1000
+    total = latencies.sum() / 1000
+    return {
+        "requests": len(latencies),
+        "errors": sum(1 for status in statuses if status >= 400),
+        "status_codes": {str(status): statuses.count(status) for status in sorted(set(statuses))},
+        "latency_ms": {
+            "mean": round(float(latencies.mean()), 3),
+            **{
+                f"p{percentile}": round(float(value), 3)
+                for percentile, value in zip(PERCENTILES, np.percentile(latencies, PERCENTILES))
+            },
+            "max": round(float(latencies.max()), 3),
+        },
+        "throughput_rps": round(len(latencies) / total, 1) if total else None,
+        "sql_queries": {"mean": round(float(np.mean(queries)), 2), "max": int(np.max(queries))},
+        "sql_time_ms": {"mean": round(float(np.mean(sql_seconds)) * 1000, 3)},
+        "redis_round_trips": {"mean": round(float(np.mean(round_trips)), 2), "max": int(np.max(round_trips))},
+        "response_bytes": {"mean": round(float(np.mean(sizes)), 1)},
+    }
+
+
+def _call(client, method, path, data):
+    if method == "get":
+        return client.get(path, data)
+    if method == "post":
+        return client.post(path, data, format="json")
+    return getattr(client, method)(f"{path}?{urlencode(data)}" if data else path)
+
+
+def measure(scenario, fixture, probe, iterations, warmup, cache):
+    """
+    Corre `warmup` peticiones sin medir y `iterations` medidas. Con el cache
+    frio la lectura del cache de respuestas siempre falla (la escritura si se hace,
+    como en un fallo real); con el caliente, el calentamiento recorre antes todos
+    los posts de la corrida.
+    """
+    credentials = {"HTTP_API_KEY": fixture.api_key}
+    if scenario.authenticated:
+        credentials["HTTP_AUTHORIZATION"] = f"JWT {fixture.token}"
+    client = APIClient()
+    client.credentials(**credentials)
+    if cache == WARM:
+        warmup = max(warmup, len(fixture.slugs))
+
+    latencies, queries, sql_seconds, round_trips, sizes, statuses = [], [], [], [], [], []
+    with contextlib.ExitStack() as stack:
+        if cache == COLD:
+            for module in (response_cache, cache_tags):
+                stack.enter_context(mock.patch.object(module, "fetch", lambda *args, **kwargs: None))
+        for i in range(warmup + iterations):
+            method, path, data = scenario.request(fixture, i)
+            if scenario.prepare is not None:
+                scenario.prepare(fixture, i)
+
+            probe.reset()
+            started = time.perf_counter()
+            response = _call(client, method, path, data)
+            elapsed = time.perf_counter() - started
+            if i < warmup:
+                continue
+
+            latencies.append(elapsed)
+            queries.append(probe.queries)
+            sql_seconds.append(probe.sql_seconds)
+            round_trips.append(probe.redis_round_trips)
+            sizes.append(len(response.content))
+            statuses.append(response.status_code)
+
+    return _summary(latencies, queries, sql_seconds, round_trips, sizes, statuses)
+
+
+def run(sizes, scenarios, iterations, warmup, targets, seed, workers, api_key, log):
+    """
+    Devuelve {tamano: {"dataset": {...}, "scenarios": {"nombre[cache]": {...}}}}.
+    """
+    pre_migrate.connect(_prepare_schema, dispatch_uid="benchmarks_prepare_schema")
+    probe = Probe()
+    results = {}
+
+    with _count_round_trips(probe):
+        for size in sizes:
+            old_name = connection.settings_dict["NAME"]
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                _partition_event_tables()
+                get_redis_connection("default").flushall()
+                log(f"[{size}] seeding")
+                dataset = _seed(size, seed, workers)
+
+                fixture = Fixture(targets, api_key)
+                measured = {}
+                with connection.execute_wrapper(probe):
+                    for scenario in scenarios:
+                        for cache in (WARM, COLD) if scenario.cacheable else (None,):
+                            name = f"{scenario.name}[{cache}]" if cache else scenario.name
+                            measured[name] = measure(scenario, fixture, probe, iterations, warmup, cache)
+                            log(_line(size, name, measured[name]))
+                results[size] = {"dataset": dataset, "scenarios": measured}
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    return results
+
+
+def _line(size, name, summary):
+    latency = summary["latency_ms"]
+    return (
+        f"[{size}] {name:<22} p50 {latency['p50']:>8.2f} ms  p95 {latency['p95']:>8.2f} ms  "
+        f"{summary['throughput_rps'] or 0:>7.1f} req/s  sql {summary['sql_queries']['mean']:>5.1f}  "
+        f"redis {summary['redis_round_trips']['mean']:>4.1f}  errors {summary['errors']}"
+    )
@@ -0,0 +1,98 @@
+"""
+Escenarios del benchmark: una peticion por endpoint.
+
+Cada escenario arma su peticion a partir de los datos de la corrida (Fixture)
+y del numero de iteracion, de modo que las peticiones recorren los mismos posts
+en el mismo orden en cada corrida. `prepare` deja el estado que necesita la
+peticion (p. ej. quitar el like antes de volver a darlo) y no se mide.
+"""
+import pyotp
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.authentication.models import UserAccount
+from apps.blog.models import Post, PostLike
+
+READER_EMAIL = "benchmark-reader@example.com"
+
+
+class Fixture:
+    """
+    Datos de la corrida: los posts mas vistos (los que recibe la mayor parte
+    del trafico con la popularidad de Zipf) y un lector con OTP configurado.
+    """
+
+    def __init__(self, targets, api_key):
+        self.api_key = api_key
+        self.slugs = list(
+            Post.postobjects.order_by("-post_analytics__views", "id").values_list("slug", flat=True)[:targets]
+        )
+        if not self.slugs:
+            raise ValueError("The dataset has no published posts")
+        self.posts = dict(Post.objects.filter(slug__in=self.slugs).values_list("slug", "id"))
+
+        self.reader = UserAccount.objects.create_user(
+            READER_EMAIL, "benchmark", username="benchmark-reader", first_name="Bench", last_name="Reader"
+        )
+        # create_user deja la cuenta pendiente de activacion
+        self.reader.is_active = True
+        self.reader.otp_base32 = pyotp.random_base32()
+        self.reader.save(update_fields=["is_active", "otp_base32"])
+        self.token = str(AccessToken.for_user(self.reader))
+
+    def slug(self, i):
+        return self.slugs[i % len(self.slugs)]
+
+
+class Scenario:
+    """
+    `request(fixture, i)` devuelve (metodo, ruta, datos); los datos van en la
+    query string en GET y DELETE y como JSON en POST. `cacheable` indica que el
+    endpoint usa el cache de respuestas y se mide con el cache caliente y frio.
+    """
+
+    def __init__(self, name, request, prepare=None, authenticated=False, cacheable=False):
+        self.name = name
+        self.request = request
+        self.prepare = prepare
+        self.authenticated = authenticated
+        self.cacheable = cacheable
+
+
+def _unlike(fixture, i):
+    PostLike.objects.filter(user=fixture.reader, post_id=fixture.posts[fixture.slug(i)]).delete()
+
+
+def _like(fixture, i):
+    PostLike.objects.get_or_create(user=fixture.reader, post_id=fixture.posts[fixture.slug(i)])
+
+
+def _otp_login(fixture, i):
+    otp = pyotp.TOTP(fixture.reader.otp_base32).now()
+    return "post", "/api/authentication/otp_login/", {"email": fixture.reader.email, "otp": otp}
+
+
+SCENARIOS = [
+    Scenario("post_list", lambda fixture, i: ("get", "/api/blog/posts/", {}), cacheable=True),
+    Scenario("post_detail", lambda fixture, i: ("get", "/api/blog/post/", {"slug": fixture.slug(i)}), cacheable=True),
+    Scenario("category_list", lambda fixture, i: ("get", "/api/blog/categories/", {}), cacheable=True),
+    Scenario(
+        "post_comments",
+        lambda fixture, i: ("get", "/api/blog/post/comments/", {"slug": fixture.slug(i)}),
+        cacheable=True,
+    ),
+    Scenario(
+        "post_like",
+        lambda fixture, i: ("post", "/api/blog/post/like/", {"slug": fixture.slug(i)}),
+        prepare=_unlike,
+        authenticated=True,
+    ),
+    Scenario(
+        "post_unlike",
+        lambda fixture, i: ("delete", "/api/blog/post/like/", {"slug": fixture.slug(i)}),
+        prepare=_like,
+        authenticated=True,
+    ),
+    Scenario("otp_login", _otp_login),
+]
+
+SCENARIOS_BY_NAME = {scenario.name: scenario for scenario in SCENARIOS}
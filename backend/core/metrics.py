@@ -0,0 +1,222 @@
+"""
+Metricas de rendimiento por peticion, exportadas en formato Prometheus.
+
+RequestMetricsMiddleware (core.middleware) abre un RequestMetrics por peticion
+en una ContextVar; mientras esta abierto se acumulan las consultas SQL y su
+tiempo (connection.execute_wrapper), los comandos de Redis y su tiempo, el
+tiempo de los serializers de DRF y los aciertos y fallos de cache de cada
+familia de claves (post_list, post_detail, category_list, post_comments, ...).
+Al terminar la peticion se observan en histogramas con el endpoint (la ruta de
+la URL, no la URL con sus parametros) y el metodo como etiquetas.
+
+Fuera de una peticion medida (METRICS_ENABLED apagado, tareas de Celery,
+comandos) los ganchos solo leen la ContextVar y no hacen nada mas.
+
+Con varios procesos (uvicorn --workers, gunicorn) hay que definir
+PROMETHEUS_MULTIPROC_DIR para que el endpoint junte los valores de todos.
+"""
+import hmac
+import os
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Ruta del endpoint de Prometheus (ver core.urls)
+PATH = "metrics/"
+
+LABELS = ("endpoint", "method")
+
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Request latency", LABELS, buckets=SECONDS_BUCKETS
+)
+REQUESTS = Counter(
+    "http_requests", "Requests by response status", (*LABELS, "status")
+)
+SQL_QUERIES = Histogram(
+    "http_request_sql_queries", "SQL queries per request", LABELS, buckets=COUNT_BUCKETS
+)
+SQL_SECONDS = Histogram(
+    "http_request_sql_seconds", "Time spent in SQL queries per request", LABELS, buckets=SECONDS_BUCKETS
+)
+REDIS_COMMANDS = Histogram(
+    "http_request_redis_commands", "Redis commands per request", LABELS, buckets=COUNT_BUCKETS
+)
+REDIS_SECONDS = Histogram(
+    "http_request_redis_seconds", "Time spent waiting on Redis per request", LABELS, buckets=SECONDS_BUCKETS
+)
+SERIALIZER_SECONDS = Histogram(
+    "http_request_serializer_seconds", "Time spent in DRF serializers per request", LABELS,
+    buckets=SECONDS_BUCKETS,
+)
+RESPONSE_BYTES = Histogram(
+    "http_response_size_bytes", "Response body size", LABELS, buckets=SIZE_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups", "Cache lookups by key family and result", ("family", "result")
+)
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Contadores de la peticion en curso.
+    """
+
+    __slots__ = (
+        "sql_queries", "sql_seconds", "redis_commands", "redis_seconds",
+        "serializer_seconds", "serializer_depth",
+    )
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.redis_commands = 0
+        self.redis_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.serializer_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # Envoltura de connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.sql_queries += 1
+
+
+def start():
+    """
+    Abre las metricas de una peticion. Devuelve (metricas, token para `finish`).
+    """
+    request_metrics = RequestMetrics()
+    return request_metrics, _current.set(request_metrics)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+# Series ya resueltas por (endpoint, metodo): `labels()` toma un lock en cada llamada
+_series = {}
+
+
+def _series_for(endpoint, method):
+    series = _series.get((endpoint, method))
+    if series is None:
+        series = _series[(endpoint, method)] = tuple(
+            histogram.labels(endpoint, method) for histogram in (
+                REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, REDIS_COMMANDS, REDIS_SECONDS,
+                SERIALIZER_SECONDS, RESPONSE_BYTES,
+            )
+        )
+    return series
+
+
+def observe(request_metrics, endpoint, method, status, seconds, response_bytes):
+    request_seconds, sql_queries, sql_seconds, redis_commands, redis_seconds, serializer_seconds, size = (
+        _series_for(endpoint, method)
+    )
+    request_seconds.observe(seconds)
+    sql_queries.observe(request_metrics.sql_queries)
+    sql_seconds.observe(request_metrics.sql_seconds)
+    redis_commands.observe(request_metrics.redis_commands)
+    redis_seconds.observe(request_metrics.redis_seconds)
+    serializer_seconds.observe(request_metrics.serializer_seconds)
+    if response_bytes is not None:
+        size.observe(response_bytes)
+    REQUESTS.labels(endpoint, method, str(status)).inc()
+
+
+def record_cache_lookup(family, hit):
+    """
+    Cuenta un acierto o un fallo del cache de la familia de claves `family`.
+    """
+    if _current.get() is not None:
+        CACHE_LOOKUPS.labels(family, "hit" if hit else "miss").inc()
+
+
+def _timed_redis(function, commands):
+    def timed(self, *args, **kwargs):
+        request_metrics = _current.get()
+        if request_metrics is None:
+            return function(self, *args, **kwargs)
+        count = commands(self)
+        started = time.perf_counter()
+        try:
+            return function(self, *args, **kwargs)
+        finally:
+            request_metrics.redis_seconds += time.perf_counter() - started
+            request_metrics.redis_commands += count
+
+    timed.metrics_instrumented = True
+    return timed
+
+
+def _timed_serializer(data):
+    def timed(self):
+        request_metrics = _current.get()
+        if request_metrics is None:
+            return data(self)
+        # Los serializers anidados o de listas se cuentan una vez, en el de afuera
+        request_metrics.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data(self)
+        finally:
+            request_metrics.serializer_depth -= 1
+            if not request_metrics.serializer_depth:
+                request_metrics.serializer_seconds += time.perf_counter() - started
+
+    timed.metrics_instrumented = True
+    return timed
+
+
+def instrument():
+    """
+    Engancha la medicion de Redis (clientes y pipelines de redis-py, que tambien
+    usa django_redis) y de los serializers de DRF. Idempotente.
+    """
+    from redis.client import Pipeline, Redis
+    from rest_framework.serializers import BaseSerializer
+
+    if getattr(Redis.execute_command, "metrics_instrumented", False):
+        return
+
+    Redis.execute_command = _timed_redis(Redis.execute_command, lambda client: 1)
+    # Un pipeline es un solo viaje con todos los comandos encolados
+    Pipeline.execute = _timed_redis(Pipeline.execute, lambda pipe: len(pipe.command_stack))
+    BaseSerializer.data = property(_timed_serializer(BaseSerializer.data.fget))
+
+
+def metrics_view(request):
+    """
+    Endpoint de Prometheus. Exige `Authorization: Bearer <METRICS_TOKEN>`; sin
+    token configurado no responde a nadie.
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    authorization = request.headers.get("Authorization", "")
+    if not token or not hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode()):
+        return HttpResponseForbidden()
+
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from core import metrics
+
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class RequestMetricsMiddleware:
+    """
+    Mide cada peticion y la observa en las metricas de Prometheus (ver core.metrics).
+
+    Con METRICS_ENABLED apagado Django descarta el middleware al arrancar y no
+    agrega nada a las peticiones. Debe ir primero en MIDDLEWARE para que la
+    latencia incluya al resto de los middlewares.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "METRICS_ENABLED", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        metrics.instrument()
+
+    def __call__(self, request):
+        # Las lecturas de Prometheus no se miden
+        if request.path == f"/{metrics.PATH}":
+            return self.get_response(request)
+
+        request_metrics, token = metrics.start()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(request_metrics):
+                response = self.get_response(request)
+        finally:
+            metrics.finish(token)
+        seconds = time.perf_counter() - started
+
+        match = request.resolver_match
+        endpoint = match.route if match is not None else "unmatched"
+        response_bytes = None if response.streaming else len(response.content)
+        # Metodos desconocidos en una sola etiqueta, para no multiplicar las series
+        method = request.method if request.method in METHODS else "OTHER"
+        metrics.observe(request_metrics, endpoint, method, response.status_code, seconds, response_bytes)
+        return response
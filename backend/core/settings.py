@@ -13,6 +13,7 @@ import os
 import environ
 from pathlib import Path
 from datetime import timedelta
+from django.core.exceptions import ImproperlyConfigured
 
 from tutorial.settings import INSTALLED_APPS
 
@@ -48,6 +49,7 @@ DJANGO_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 PROJECT_APPS = [
@@ -89,6 +91,8 @@ AXES_COOLOFF_TIME= lambda request: timedelta(minutes=3)
 AXES_LOCK_OUT_AT_FAILURE = True #in minutes
 
 MIDDLEWARE = [
+    # Metricas por peticion; se desactiva sola si METRICS_ENABLED esta apagado
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -275,6 +279,44 @@ CACHES = {
     }
 }
 
+# Ventana (en segundos) en la que un mismo cliente solo suma una impresion por post/categoria.
+# 0 desactiva la deduplicacion
+BLOG_IMPRESSION_DEDUP_SECONDS = 60 * 30
+
+# Configuracion de PostgreSQL para la busqueda de texto completo de posts
+BLOG_SEARCH_CONFIG = "english"
+
+# Conteo de visitantes unicos: "hll" (HyperLogLog en Redis) o "exact" (tablas PostView/CategoryView)
+BLOG_UNIQUE_VIEWS_MODE = "hll"
+
+# Segundos que se guardan en cache las paginas ya serializadas de los listados del blog
+BLOG_RESPONSE_CACHE_TIMEOUT = 60 * 5
+
+# Vida media (en segundos) de los puntajes del ranking de tendencias
+BLOG_TRENDING_HALF_LIFE = 60 * 60 * 24
+
+# Particiones mensuales de PostInteraction / PostView (solo PostgreSQL): meses
+# futuros creados de antemano, meses de eventos conservados ademas del actual y si
+# las particiones separadas se borran (si no, quedan como tablas para archivarlas)
+BLOG_EVENTS_PARTITION_MONTHS_AHEAD = 3
+BLOG_EVENTS_RETENTION_MONTHS = 13
+BLOG_EVENTS_DROP_DETACHED = False
+
+# Dias que se conservan los conteos por hora de cada post
+BLOG_HOURLY_ROLLUP_RETENTION_DAYS = 90
+
+# Deteccion de abuso en vistas, likes, comentarios y shares: "off", "shadow" (solo
+# registra en el log) o "enforce" (responde 429). Los limites por accion se pueden
+# cambiar con BLOG_ABUSE_LIMITS (ver apps/blog/abuse.py)
+BLOG_ABUSE_MODE = env.str("BLOG_ABUSE_MODE", default="shadow")
+
+# Metricas de rendimiento por peticion en /metrics/ para Prometheus (ver core/metrics.py).
+# El endpoint exige `Authorization: Bearer <METRICS_TOKEN>`: sin token no se pueden activar
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=False)
+METRICS_TOKEN = env.str("METRICS_TOKEN", default="")
+if METRICS_ENABLED and not METRICS_TOKEN:
+    raise ImproperlyConfigured("METRICS_TOKEN must be set when METRICS_ENABLED is on")
+
 CHANNELS_ALLOWED_ORIGINS = "http://localhost:3000"
 
 CELERY_ACCEPT_CONTENT = ["json"]
@@ -300,7 +342,53 @@ CELERY_IMPORTS = (
 # para migrar las base de datos de celery beat, usar en una line de comandos bash:
 # python manage.py migrate django_celery_beat
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
-CELERY_BEAT_SCHEDULE = {}
+CELERY_BEAT_SCHEDULE = {
+    # Volcar a la base de datos los contadores de analiticas acumulados en Redis
+    "flush-analytics-counters": {
+        "task": "apps.blog.tasks.flush_analytics_counters",
+        "schedule": 60.0,
+    },
+    # Registrar en bloque las vistas publicadas en el stream de eventos del blog
+    "consume-post-events": {
+        "task": "apps.blog.tasks.consume_post_events",
+        "schedule": 5.0,
+    },
+    # Consolidar en la base de datos los visitantes unicos diarios (HyperLogLog)
+    "rollup-unique-views": {
+        "task": "apps.blog.tasks.rollup_unique_views",
+        "schedule": 60.0 * 60,
+    },
+    # Acumular conteos y analiticas a lo largo del arbol de categorias
+    "rollup-category-tree": {
+        "task": "apps.blog.tasks.rollup_category_tree",
+        "schedule": 60.0 * 10,
+    },
+    # Guardar los puntajes del ranking de tendencias y moverlo a una epoca nueva
+    "snapshot-trending-scores": {
+        "task": "apps.blog.tasks.snapshot_trending_scores",
+        "schedule": 60.0 * 10,
+    },
+    # Consolidar las interacciones de los posts por hora y por dia
+    "rollup-post-stats": {
+        "task": "apps.blog.tasks.rollup_post_stats",
+        "schedule": 60.0 * 15,
+    },
+    # Crear las particiones futuras de las tablas de eventos y separar las viejas
+    "maintain-event-partitions": {
+        "task": "apps.blog.tasks.maintain_event_partitions",
+        "schedule": 60.0 * 60 * 24,
+    },
+    # Recalcular los posts relacionados (filtrado colaborativo)
+    "build-related-posts": {
+        "task": "apps.blog.tasks.build_related_posts",
+        "schedule": 60.0 * 60 * 24,
+    },
+    # Reconstruir el indice de similitud de contenido, por si algun cambio no llego a Redis
+    "rebuild-content-index": {
+        "task": "apps.blog.tasks.rebuild_content_index",
+        "schedule": 60.0 * 60 * 24,
+    },
+}
 
 
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
@@ -310,6 +398,9 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 AWS_CLOUDFRONT_DOMAIN=env("AWS_CLOUDFRONT_DOMAIN")
 AWS_CLOUDFRONT_KEY_ID=env.str("AWS_CLOUDFRONT_KEY_ID").strip()
 AWS_CLOUDFRONT_KEY=env.str("AWS_CLOUDFRONT_KEY", multiline=True).encode('ascii').strip()
+CLOUDFRONT_SIGNED_URL_BUCKET_SECONDS = 60 # Las URLs firmadas expiran en ventanas fijas de 60s y se reutilizan dentro de cada ventana
+CLOUDFRONT_SIGNED_URL_LRU_SIZE = 2048 # URLs firmadas guardadas en memoria por proceso
+CLOUDFRONT_SIGNED_URL_TTL = BLOG_RESPONSE_CACHE_TIMEOUT # Vigencia minima de cada URL firmada: los caches de respuestas del blog guardan cuerpos con URLs firmadas hasta 5 minutos
 
 #Configuraciones de AWS
 AWS_ACCESS_KEY_ID = env("AWS_ACCESS_KEY_ID")
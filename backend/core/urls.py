@@ -19,6 +19,8 @@ from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core import metrics
+
 urlpatterns = [
     path('api/authentication/', include("apps.authentication.urls")),
     path('api/profile/', include("apps.user_profile.urls")),
@@ -31,3 +33,7 @@ urlpatterns = [
     # path("auth/", include("djoser.social.urls")),
     path('admin/', admin.site.urls),
 ] + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+
+# Metricas de Prometheus (ver core.metrics), solo donde estan activadas
+if settings.METRICS_ENABLED:
+    urlpatterns.append(path(metrics.PATH, metrics.metrics_view))
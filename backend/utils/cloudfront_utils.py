@@ -0,0 +1,133 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from botocore.signers import CloudFrontSigner
+
+from utils.s3_utils import rsa_signer
+
+logger = logging.getLogger(__name__)
+
+# Signed URLs expire on fixed bucket boundaries, so every request made inside the same
+# bucket produces the same URL and can reuse it from the caches below.
+SIGNED_URL_BUCKET_SECONDS = getattr(settings, "CLOUDFRONT_SIGNED_URL_BUCKET_SECONDS", 60)
+# Minimum lifetime left on a URL when it is handed out. Responses cached with signed URLs
+# in them must not outlive their URLs, so this has to cover the longest of those caches.
+SIGNED_URL_TTL = getattr(settings, "CLOUDFRONT_SIGNED_URL_TTL", SIGNED_URL_BUCKET_SECONDS)
+SIGNED_URL_LRU_SIZE = getattr(settings, "CLOUDFRONT_SIGNED_URL_LRU_SIZE", 2048)
+SIGNED_URL_CACHE_PREFIX = "cloudfront_url"
+
+
+class LRUCache:
+    """A small thread-safe, bounded LRU mapping."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return None
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local_cache = LRUCache(SIGNED_URL_LRU_SIZE)
+
+
+@lru_cache(maxsize=None)
+def get_cloudfront_signer():
+    """Return the process-wide CloudFront signer."""
+    return CloudFrontSigner(settings.AWS_CLOUDFRONT_KEY_ID, rsa_signer)
+
+
+def current_bucket(now=None):
+    """Return the index of the expiry bucket that contains ``now``."""
+    now = time.time() if now is None else now
+    return int(now) // SIGNED_URL_BUCKET_SECONDS
+
+
+def _cache_key(key, bucket):
+    return f"{SIGNED_URL_CACHE_PREFIX}:{bucket}:{key}"
+
+
+def _sign(key, bucket):
+    # The URL stays valid for at least SIGNED_URL_TTL after the current bucket ends
+    expires_at = (bucket + 1) * SIGNED_URL_BUCKET_SECONDS + SIGNED_URL_TTL
+    obj_url = f"https://{settings.AWS_CLOUDFRONT_DOMAIN}/{key}"
+    return get_cloudfront_signer().generate_presigned_url(
+        obj_url, date_less_than=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+    )
+
+
+def sign_many(keys):
+    """
+    Return a dict mapping every media key in ``keys`` to a signed CloudFront URL.
+
+    URLs are looked up in the in-process LRU first, then in the shared Redis cache
+    with a single round trip, and only the remaining keys are signed with RSA.
+
+    :param keys: An iterable of S3 object keys.
+    :return: A dict of ``{key: signed_url}``.
+    """
+    bucket = current_bucket()
+    signed = {}
+    missing = []
+    for key in set(filter(None, keys)):
+        url = _local_cache.get((key, bucket))
+        if url is None:
+            missing.append(key)
+        else:
+            signed[key] = url
+
+    if not missing:
+        return signed
+
+    try:
+        shared = cache.get_many([_cache_key(key, bucket) for key in missing])
+    except Exception:
+        logger.exception("Couldn't read signed URLs from the shared cache.")
+        shared = {}
+
+    to_store = {}
+    for key in missing:
+        url = shared.get(_cache_key(key, bucket))
+        if url is None:
+            url = _sign(key, bucket)
+            to_store[_cache_key(key, bucket)] = url
+        _local_cache.set((key, bucket), url)
+        signed[key] = url
+
+    if to_store:
+        try:
+            cache.set_many(to_store, timeout=2 * SIGNED_URL_BUCKET_SECONDS)
+        except Exception:
+            logger.exception("Couldn't store signed URLs in the shared cache.")
+
+    return signed
+
+
+def sign_url(key):
+    """Return a signed CloudFront URL for a single media key."""
+    if not key:
+        return None
+    return sign_many([key]).get(key)
@@ -1,4 +1,5 @@
 import logging
+from functools import lru_cache
 
 from django.conf import settings
 from botocore.exceptions import ClientError
@@ -33,13 +34,22 @@ def generate_presigned_url(s3_client, client_method, method_parameters, expires_
     return url
 
 
-def rsa_signer(message):
-    # Load the private key from the string in Django settings
-    private_key = serialization.load_pem_private_key(
+@lru_cache(maxsize=None)
+def load_cloudfront_private_key():
+    """
+    Load the CloudFront private key from Django settings.
+
+    Parsing the PEM is expensive, so the key is loaded once per process and reused.
+    """
+    return serialization.load_pem_private_key(
         settings.AWS_CLOUDFRONT_KEY,  # Directly use the key from settings
         password=None,  # No password is assumed; adjust if your key is password-protected
         backend=default_backend()
     )
+
+
+def rsa_signer(message):
+    private_key = load_cloudfront_private_key()
     # Sign the message
     signature = private_key.sign(
         message,